@@ -1,21 +1,31 @@
-import json
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import pandas as pd
-import sqlite3
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from tkinter import ttk, messagebox, filedialog
+from instrumentacion import METRICAS, configurar_desde_entorno
+from recetario_core import Recetario, despensa_desde_texto, escribir_lista_compras_csv
+from tareas import EjecutorTareas
 
 class RecetarioInteligente:
+    # Recetas que se piden en cada página de resultados
+    TAMANO_PAGINA = 200
+
     def __init__(self):
-        # Configuración de base de datos SQLite
-        self.conn = sqlite3.connect('recetario.db')
-        self.crear_esquema_base_datos()
-        
         # Inicializar ventana principal
         self.root = tk.Tk()
         self.root.title("Recetario Inteligente")
         self.root.geometry("800x600")
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+        
+        # Métricas de latencia: RECETARIO_METRICAS indica dónde guardarlas al cerrar
+        self.ruta_metricas = configurar_desde_entorno()
+        
+        # Consultas y cálculos en segundo plano, con su propia conexión SQLite
+        self.tareas = EjecutorTareas(self.root, lambda: Recetario('recetario.db'), self.mostrar_ocupado)
+        
+        # Gráficos nutricionales con caché (se crean en el hilo de trabajo al primer uso)
+        self._graficos = None
+        
+        # Índice de nombres para autocompletar; se construye en segundo plano y se consulta desde Tk
+        self.autocompletado = None
         
         # Variables de control
         self.ingredientes_var = tk.StringVar()
@@ -23,58 +33,28 @@ class RecetarioInteligente:
         
         # Configurar interfaz
         self.configurar_interfaz()
-    def calcular_valor_nutricional_receta(self, receta_id):
-            """Calcular valor nutricional total de una receta"""
-            cursor = self.conn.cursor()
-            
-            # Consulta para obtener ingredientes y sus cantidades en la receta
-            cursor.execute('''
-            SELECT i.nombre, ri.cantidad, 
-                i.calorias, i.proteinas, i.carbohidratos, i.grasas, i.fibra, i.sodio
-            FROM receta_ingredientes ri
-            JOIN ingredientes i ON ri.ingrediente_id = i.id
-            WHERE ri.receta_id = ?
-            ''', (receta_id,))
-            
-            ingredientes = cursor.fetchall()
-            
-            # Calcular valores nutricionales totales
-            totales = {
-                'calorias': 0,
-                'proteinas': 0,
-                'carbohidratos': 0,
-                'grasas': 0,
-                'fibra': 0,
-                'sodio': 0
-            }
-            
-            desglose_ingredientes = []
-            
-            for nombre, cantidad, cal, prot, carb, gras, fib, sod in ingredientes:
-                # Calcular valores proporcionales a la cantidad
-                factor = cantidad / 100  # Asumiendo que los valores nutricionales son por 100g
-                
-                desglose = {
-                    'nombre': nombre,
-                    'calorias': cal * factor,
-                    'proteinas': prot * factor,
-                    'carbohidratos': carb * factor,
-                    'grasas': gras * factor,
-                    'fibra': fib * factor,
-                    'sodio': sod * factor
-                }
-                
-                desglose_ingredientes.append(desglose)
-                
-                # Sumar a totales
-                for key in totales:
-                    totales[key] += desglose[key]
-            
-            return totales, desglose_ingredientes
+    @property
+    def graficos(self):
+        """Renderizador de gráficos; solo se usa desde el hilo de trabajo (matplotlib se importa al necesitarlo)"""
+        if self._graficos is None:
+            from graficos import RenderizadorGraficos
+            self._graficos = RenderizadorGraficos()
+        return self._graficos
     def visualizar_analisis_nutricional(self, receta_id):
+            """Calcular y dibujar en segundo plano el análisis nutricional de una receta y mostrarlo"""
+            def analizar(recetario):
+                totales, desglose = recetario.calcular_valor_nutricional_receta(receta_id)
+                grafico = self.graficos.renderizar(receta_id, totales, desglose, 'Contribución Calórica por Ingrediente')
+                return totales, desglose, grafico
+            
+            self.tareas.enviar(
+                analizar,
+                al_terminar=lambda resultado: self.mostrar_analisis_nutricional(*resultado),
+                al_fallar=self.mostrar_error
+            )
+    def mostrar_analisis_nutricional(self, totales, desglose, grafico):
             """Crear ventana de análisis nutricional con gráficos"""
-            # Obtener valores nutricionales
-            totales, desglose = self.calcular_valor_nutricional_receta(receta_id)
+            from graficos import mostrar_en
             
             # Crear ventana de análisis
             ventana_analisis = tk.Toplevel(self.root)
@@ -89,35 +69,8 @@ class RecetarioInteligente:
             for key, valor in totales.items():
                 ttk.Label(frame_totales, text=f"{key.capitalize()}: {valor:.2f}").pack(side='left', padx=5)
             
-            # Crear figura para gráficos
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-            
-            # Gráfico de pastel de macronutrientes
-            macronutrientes = [
-                totales['proteinas'], 
-                totales['carbohidratos'], 
-                totales['grasas']
-            ]
-            labels = ['Proteínas', 'Carbohidratos', 'Grasas']
-            ax1.pie(macronutrientes, labels=labels, autopct='%1.1f%%', startangle=90)
-            ax1.set_title('Distribución de Macronutrientes')
-            
-            # Gráfico de barras de ingredientes
-            ingredientes = [ing['nombre'] for ing in desglose]
-            calorias = [ing['calorias'] for ing in desglose]
-            ax2.bar(ingredientes, calorias)
-            ax2.set_title('Contribución Calórica por Ingrediente')
-            ax2.set_xlabel('Ingredientes')
-            ax2.set_ylabel('Calorías')
-            plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
-            
-            # Ajustar layout
-            plt.tight_layout()
-            
-            # Incrustar gráfico en Tkinter
-            canvas = FigureCanvasTkAgg(fig, master=ventana_analisis)
-            canvas_widget = canvas.get_tk_widget()
-            canvas_widget.pack(fill='both', expand=True)
+            # Gráfico ya dibujado en segundo plano; su imagen se libera al cerrar la ventana
+            mostrar_en(ventana_analisis, grafico).pack(padx=10)
             
             # Tabla de desglose de ingredientes
             columns = ('Ingrediente', 'Calorías', 'Proteínas', 'Carbohidratos', 'Grasas', 'Fibra', 'Sodio')
@@ -140,58 +93,81 @@ class RecetarioInteligente:
                 ))
             
             tabla.pack(padx=10, pady=10, fill='x')    
-    def crear_esquema_base_datos(self):
-        """Crear esquema de base de datos SQLite"""
-        cursor = self.conn.cursor()
-        
-        # Tabla de ingredientes
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ingredientes (
-            id INTEGER PRIMARY KEY,
-            nombre TEXT UNIQUE,
-            calorias REAL,
-            proteinas REAL,
-            carbohidratos REAL,
-            grasas REAL,
-            fibra REAL,
-            sodio REAL
-        )''')
-        
-        # Tabla de recetas
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recetas (
-            id INTEGER PRIMARY KEY,
-            nombre TEXT UNIQUE,
-            tipo_dieta TEXT,
-            instrucciones TEXT
-        )''')
-        
-        # Tabla de ingredientes por receta
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS receta_ingredientes (
-            receta_id INTEGER,
-            ingrediente_id INTEGER,
-            cantidad REAL,
-            FOREIGN KEY(receta_id) REFERENCES recetas(id),
-            FOREIGN KEY(ingrediente_id) REFERENCES ingredientes(id)
-        )''')
-        
-        self.conn.commit()
     def mostrar_recetas(self):
-        """Modificar método para agregar botón de análisis nutricional"""
-        ingredientes = {ing.strip() for ing in self.ingredientes_var.get().split(',')}
+        """Iniciar una búsqueda nueva; una búsqueda nueva descarta la anterior"""
+        # Se aceptan cantidades ("arroz:500"); para buscar solo cuentan los nombres
+        try:
+            ingredientes = set(despensa_desde_texto(self.ingredientes_var.get()))
+        except ValueError:
+            messagebox.showerror("Error", "Las cantidades de la despensa deben ser números")
+            return
         dieta = self.dieta_var.get()
 
-        # Limpiar frame anterior
-        for widget in self.resultados_frame.winfo_children():
-            widget.destroy()
+        # Reutilizar la tabla: solo se vacían sus filas
+        self.tabla_recetas.delete(*self.tabla_recetas.get_children())
+        self.mensaje_resultados.pack_forget()
+        self.busqueda = (ingredientes, dieta)
+        self.ultimo_id = None
+        self.hay_mas = False
+        self.cargar_pagina()
+    def cargar_pagina(self):
+        """Pedir en segundo plano la siguiente página de la búsqueda actual"""
+        ingredientes, dieta = self.busqueda
+        ultimo_id = self.ultimo_id
+        self.cargando = True
 
-        recetas = self.encontrar_recetas(dict.fromkeys(ingredientes), dieta)
+        self.tareas.enviar(
+            lambda recetario: recetario.buscar_pagina(ingredientes, dieta, ultimo_id, self.TAMANO_PAGINA),
+            clave='busqueda',
+            al_terminar=self.mostrar_resultados,
+            al_fallar=self.mostrar_error
+        )
+    def mostrar_resultados(self, pagina):
+        """Añadir una página de recetas a la tabla de resultados"""
+        recetas, self.hay_mas = pagina
+        self.cargando = False
 
-        if not recetas:
-            ttk.Label(self.resultados_frame, text="No se encontraron recetas").pack()
+        if not recetas and self.ultimo_id is None:
+            self.mensaje_resultados.pack(before=self.tabla_recetas)
             return
 
+        for receta_id, nombre, instrucciones_preview, truncada in recetas:
+            # Vista previa de las instrucciones; el texto completo se carga con doble clic
+            if truncada:
+                instrucciones_preview += '...'
+            self.tabla_recetas.insert('', 'end', values=(nombre, instrucciones_preview, 'Ver Análisis'), tags=(str(receta_id),))
+
+        if recetas:
+            self.ultimo_id = recetas[-1][0]
+    def al_desplazar_resultados(self, primero, ultimo):
+        """Actualizar la scrollbar y cargar más filas al acercarse al final"""
+        self.scrollbar_recetas.set(primero, ultimo)
+        if float(ultimo) > 0.9 and self.hay_mas and not self.cargando:
+            self.cargar_pagina()
+    def crear_tabla_resultados(self):
+        """Crear una sola vez la tabla de recetas, que se reutiliza en cada búsqueda"""
+        self.busqueda = (set(), "Todos")
+        self.ultimo_id = None
+        self.hay_mas = False
+        self.cargando = False
+
+        self.mensaje_resultados = ttk.Label(self.resultados_frame, text="No se encontraron recetas")
+
+        # Botón de análisis nutricional de la receta seleccionada
+        ttk.Button(
+            self.resultados_frame,
+            text="Ver Análisis Nutricional",
+            command=self.analizar_receta_seleccionada
+        ).pack(side='bottom', pady=5)
+
+        # Lista de compras de las recetas seleccionadas, escalada por porciones
+        compras_frame = ttk.Frame(self.resultados_frame)
+        compras_frame.pack(side='bottom', pady=5)
+        ttk.Label(compras_frame, text="Porciones:").pack(side='left')
+        self.porciones_var = tk.StringVar(value="1")
+        ttk.Spinbox(compras_frame, from_=0.5, to=100, increment=0.5, textvariable=self.porciones_var, width=5).pack(side='left', padx=5)
+        ttk.Button(compras_frame, text="Lista de Compras", command=self.lista_compras_seleccion).pack(side='left')
+
         # Crear tabla de recetas con scrollbar
         columns = ('Nombre', 'Instrucciones', 'Análisis')
         tabla = ttk.Treeview(self.resultados_frame, columns=columns, show='headings')
@@ -204,28 +180,27 @@ class RecetarioInteligente:
         for col in columns:
             tabla.heading(col, text=col)
         
-        # Añadir scrollbar vertical
-        scrollbar = ttk.Scrollbar(self.resultados_frame, orient="vertical", command=tabla.yview)
-        tabla.configure(yscroll=scrollbar.set)
-        
-        for receta in recetas:
-            # Limitar las instrucciones a 200 caracteres para vista previa
-            instrucciones_preview = receta[2][:200] + '...' if len(receta[2]) > 200 else receta[2]
-            tabla.insert('', 'end', values=(receta[1], instrucciones_preview, 'Ver Análisis'), tags=(str(receta[0]),))
+        # Añadir scrollbar vertical; al acercarse al final se piden más filas
+        self.scrollbar_recetas = ttk.Scrollbar(self.resultados_frame, orient="vertical", command=tabla.yview)
+        tabla.configure(yscroll=self.al_desplazar_resultados)
         
         # Configurar evento de doble clic
         tabla.bind('<Double-1>', self.on_tabla_doble_clic)
         
         # Mostrar tabla y scrollbar
         tabla.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
-
-        # Botón de análisis nutricional
-        ttk.Button(
-            self.resultados_frame,
-            text="Ver Análisis Nutricional",
-            command=lambda: self.visualizar_analisis_nutricional(receta[0])
-        ).pack(pady=5)
+        self.scrollbar_recetas.pack(side='right', fill='y')
+        self.tabla_recetas = tabla
+    def analizar_receta_seleccionada(self):
+        """Abrir el análisis nutricional de la receta seleccionada en la tabla"""
+        seleccion = self.tabla_recetas.selection()
+        if not seleccion:
+            messagebox.showinfo("Análisis Nutricional", "Seleccione una receta de la tabla")
+            return
+        
+        tags = self.tabla_recetas.item(seleccion[0])['tags']
+        if tags:
+            self.visualizar_analisis_nutricional(int(tags[0]))
     def on_tabla_doble_clic(self, event):
         """Manejar doble clic en la tabla de recetas para mostrar instrucciones completas"""
         tabla = event.widget
@@ -245,9 +220,15 @@ class RecetarioInteligente:
         receta_id = int(receta_id)
         
         # Obtener instrucciones completas de la base de datos
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT nombre, instrucciones FROM recetas WHERE id = ?', (receta_id,))
-        receta = cursor.fetchone()
+        self.tareas.enviar(
+            lambda recetario: recetario.obtener_receta(receta_id),
+            al_terminar=lambda receta: self.mostrar_instrucciones(receta_id, receta),
+            al_fallar=self.mostrar_error
+        )
+    def mostrar_instrucciones(self, receta_id, receta):
+        """Mostrar en una ventana las instrucciones completas de una receta"""
+        if receta is None:
+            return
         
         # Crear ventana emergente con instrucciones completas
         ventana_instrucciones = tk.Toplevel(self.root)
@@ -272,70 +253,33 @@ class RecetarioInteligente:
             command=lambda rid=receta_id: self.visualizar_analisis_nutricional(rid)
         ).pack(pady=5)
     def mostrar_analisis_nutricional_general(self, recetas_ids):
+        """Calcular y dibujar en segundo plano el análisis consolidado de varias recetas y mostrarlo"""
+        # Todas las recetas en un solo lote; los 10 ingredientes con más calorías
+        def analizar(recetario):
+            totales_consolidados, ingredientes_ordenados = recetario.analisis_consolidado(recetas_ids, top=10)
+            grafico = self.graficos.renderizar(
+                ('consolidado', tuple(sorted(recetas_ids))),
+                totales_consolidados,
+                ingredientes_ordenados,
+                'Top 10 Ingredientes por Calorías'
+            )
+            return totales_consolidados, grafico
+        
+        self.tareas.enviar(
+            analizar,
+            al_terminar=lambda resultado: self.mostrar_analisis_consolidado(*resultado),
+            al_fallar=self.mostrar_error
+        )
+    def mostrar_analisis_consolidado(self, totales_consolidados, grafico):
         """Mostrar análisis nutricional consolidado para múltiples recetas"""
+        from graficos import mostrar_en
+        
         ventana_analisis = tk.Toplevel(self.root)
         ventana_analisis.title("Análisis Nutricional General")
         ventana_analisis.geometry("800x600")
         
-        # Crear figura para gráficos
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-        
-        # Recopilar datos nutricionales de todas las recetas
-        totales_consolidados = {
-            'calorias': 0,
-            'proteinas': 0,
-            'carbohidratos': 0,
-            'grasas': 0,
-            'fibra': 0,
-            'sodio': 0
-        }
-        
-        ingredientes_desglose = []
-        
-        # Calcular valores para cada receta
-        for receta_id in recetas_ids:
-            totales, desglose = self.calcular_valor_nutricional_receta(receta_id)
-            
-            # Consolidar totales
-            for key in totales_consolidados:
-                totales_consolidados[key] += totales[key]
-            
-            # Agregar desglose de ingredientes
-            ingredientes_desglose.extend(desglose)
-        
-        # Gráfico de pastel de macronutrientes
-        macronutrientes = [
-            totales_consolidados['proteinas'], 
-            totales_consolidados['carbohidratos'], 
-            totales_consolidados['grasas']
-        ]
-        labels = ['Proteínas', 'Carbohidratos', 'Grasas']
-        ax1.pie(macronutrientes, labels=labels, autopct='%1.1f%%', startangle=90)
-        ax1.set_title('Distribución de Macronutrientes')
-        
-        # Gráfico de barras de ingredientes (top 10)
-        ingredientes_ordenados = sorted(
-            ingredientes_desglose, 
-            key=lambda x: x['calorias'], 
-            reverse=True
-        )[:10]  # Tomar los 10 ingredientes con más calorías
-        
-        ingredientes = [ing['nombre'] for ing in ingredientes_ordenados]
-        calorias = [ing['calorias'] for ing in ingredientes_ordenados]
-        
-        ax2.bar(ingredientes, calorias)
-        ax2.set_title('Top 10 Ingredientes por Calorías')
-        ax2.set_xlabel('Ingredientes')
-        ax2.set_ylabel('Calorías')
-        plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
-        
-        # Ajustar layout
-        plt.tight_layout()
-        
-        # Incrustar gráfico en Tkinter
-        canvas = FigureCanvasTkAgg(fig, master=ventana_analisis)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(fill='both', expand=True)
+        # Gráfico ya dibujado en segundo plano; su imagen se libera al cerrar la ventana
+        mostrar_en(ventana_analisis, grafico).pack(padx=10)
         
         # Mostrar valores totales consolidados
         frame_totales = ttk.Frame(ventana_analisis)
@@ -345,89 +289,37 @@ class RecetarioInteligente:
             ttk.Label(frame_totales, text=f"{key.capitalize()}: {valor:.2f}").pack(side='left', padx=5)
     def agregar_ingrediente(self, nombre, calorias, proteinas, carbohidratos, grasas, fibra, sodio):
         """Agregar ingrediente a la base de datos"""
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute('''
-            INSERT OR REPLACE INTO ingredientes 
-            (nombre, calorias, proteinas, carbohidratos, grasas, fibra, sodio) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (nombre, calorias, proteinas, carbohidratos, grasas, fibra, sodio))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"No se pudo agregar el ingrediente: {e}")
+        def al_terminar(ingrediente_id):
+            if self.autocompletado is not None:
+                self.autocompletado.agregar(ingrediente_id, nombre)
+
+        self.tareas.enviar(
+            lambda recetario: recetario.agregar_ingrediente(nombre, calorias, proteinas, carbohidratos, grasas, fibra, sodio),
+            al_terminar=al_terminar,
+            al_fallar=lambda e: messagebox.showerror("Error", f"No se pudo agregar el ingrediente: {e}")
+        )
 
     def agregar_receta(self, nombre, tipo_dieta, instrucciones, ingredientes):
         """Agregar receta a la base de datos"""
-        cursor = self.conn.cursor()
-        try:
-            # Insertar receta
-            cursor.execute('INSERT OR REPLACE INTO recetas (nombre, tipo_dieta, instrucciones) VALUES (?, ?, ?)',
-                           (nombre, tipo_dieta, instrucciones))
-            receta_id = cursor.lastrowid
-            
-            # Insertar ingredientes de la receta
-            for ingrediente in ingredientes:
-                cursor.execute('SELECT id FROM ingredientes WHERE nombre = ?', (ingrediente['nombre'],))
-                ingrediente_id = cursor.fetchone()[0]
-                
-                cursor.execute('''
-                INSERT INTO receta_ingredientes (receta_id, ingrediente_id, cantidad) 
-                VALUES (?, ?, ?)
-                ''', (receta_id, ingrediente_id, ingrediente['cantidad']))
-            
-            self.conn.commit()
-        except sqlite3.Error as e:
-            messagebox.showerror("Error", f"No se pudo agregar la receta: {e}")
-
-    def encontrar_recetas(self, ingredientes_disponibles, tipo_dieta="Todos"):
-        """Encontrar recetas según ingredientes disponibles y tipo de dieta"""
-        cursor = self.conn.cursor()
-        
-        # Consulta SQL para encontrar recetas
-        query = '''
-        SELECT r.id, r.nombre, r.instrucciones 
-        FROM recetas r
-        WHERE (? = 'Todos' OR r.tipo_dieta = ?)
-        AND r.id IN (
-            SELECT receta_id 
-            FROM (
-                SELECT receta_id, 
-                       COUNT(DISTINCT ingrediente_id) as ingredientes_match,
-                       COUNT(DISTINCT ingrediente_id) as total_ingredientes
-                FROM receta_ingredientes ri
-                JOIN ingredientes i ON ri.ingrediente_id = i.id
-                WHERE i.nombre IN ({})
-                GROUP BY receta_id
-            ) matches
-            WHERE ingredientes_match = total_ingredientes
+        self.tareas.enviar(
+            lambda recetario: recetario.agregar_receta(nombre, tipo_dieta, instrucciones, ingredientes),
+            al_fallar=lambda e: messagebox.showerror("Error", f"No se pudo agregar la receta: {e}")
         )
-        '''.format(','.join(['?']*len(ingredientes_disponibles)))
-        
-        params = [tipo_dieta, tipo_dieta] + list(ingredientes_disponibles.keys())
-        cursor.execute(query, params)
-        
-        return cursor.fetchall()
 
-    def generar_lista_compras(self, recetas):
-        """Generar lista de compras basada en recetas seleccionadas"""
-        lista_compras = {}
-        
-        for receta_id in recetas:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-            SELECT i.nombre, ri.cantidad 
-            FROM receta_ingredientes ri
-            JOIN ingredientes i ON ri.ingrediente_id = i.id
-            WHERE ri.receta_id = ?
-            ''', (receta_id,))
-            
-            for ingrediente, cantidad in cursor.fetchall():
-                if ingrediente not in lista_compras:
-                    lista_compras[ingrediente] = cantidad
-                else:
-                    lista_compras[ingrediente] += cantidad
-        
-        return lista_compras
+    def mostrar_error(self, error):
+        """Mostrar un error de una tarea en segundo plano"""
+        messagebox.showerror("Error", str(error))
+
+    def mostrar_ocupado(self, ocupado):
+        """Indicar que hay consultas en curso sin bloquear la ventana"""
+        if ocupado:
+            self.estado_var.set("Trabajando...")
+            self.progreso.start(10)
+            self.root.configure(cursor='watch')
+        else:
+            self.estado_var.set("")
+            self.progreso.stop()
+            self.root.configure(cursor='')
 
     def configurar_interfaz(self):
         """Configurar interfaz gráfica"""
@@ -436,8 +328,18 @@ class RecetarioInteligente:
         ingredientes_frame.pack(padx=10, pady=10, fill="x")
 
         ttk.Label(ingredientes_frame, text="Ingredientes (separados por coma):").pack()
-        ingredientes_entry = ttk.Entry(ingredientes_frame, textvariable=self.ingredientes_var, width=50)
-        ingredientes_entry.pack(padx=10, pady=5)
+        self.ingredientes_entry = ttk.Entry(ingredientes_frame, textvariable=self.ingredientes_var, width=50)
+        self.ingredientes_entry.pack(padx=10, pady=5)
+
+        # Sugerencias para el ingrediente que se está escribiendo, desplegadas bajo la entrada
+        self.sugerencias = tk.Listbox(self.root, height=6, activestyle='dotbox')
+        self.ingredientes_entry.bind('<KeyRelease>', self.actualizar_sugerencias)
+        self.ingredientes_entry.bind('<Down>', self.ir_a_sugerencias)
+        self.ingredientes_entry.bind('<Escape>', lambda evento: self.ocultar_sugerencias())
+        self.ingredientes_entry.bind('<FocusOut>', self.al_salir_de_entrada)
+        self.sugerencias.bind('<Return>', self.aceptar_sugerencia)
+        self.sugerencias.bind('<Double-Button-1>', self.aceptar_sugerencia)
+        self.sugerencias.bind('<Escape>', lambda evento: self.ocultar_sugerencias(volver=True))
 
         # Selector de dieta
         dietas = ["Todos", "Vegetariano", "Vegano", "Sin Gluten", "Bajo en Carbohidratos"]
@@ -446,53 +348,258 @@ class RecetarioInteligente:
         dieta_selector.pack(padx=10, pady=5)
 
         # Botón de búsqueda
-        ttk.Button(ingredientes_frame, text="Buscar Recetas", command=self.mostrar_recetas).pack(pady=5)
+        botones_frame = ttk.Frame(ingredientes_frame)
+        botones_frame.pack(pady=5)
+        ttk.Button(botones_frame, text="Buscar Recetas", command=self.mostrar_recetas).pack(side='left', padx=5)
+        ttk.Button(botones_frame, text="Planificar Semana", command=self.planificar_semana).pack(side='left', padx=5)
+
+        # Barra de estado con indicador de actividad
+        estado_frame = ttk.Frame(self.root)
+        estado_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 5))
+        self.estado_var = tk.StringVar()
+        ttk.Label(estado_frame, textvariable=self.estado_var).pack(side='left')
+        self.progreso = ttk.Progressbar(estado_frame, mode='indeterminate', length=120)
+        self.progreso.pack(side='right')
 
         # Frame de resultados
         self.resultados_frame = ttk.Frame(self.root)
         self.resultados_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.crear_tabla_resultados()
+
+    def ingrediente_en_curso(self):
+        """(texto, inicio, fin) del ingrediente de la entrada donde está el cursor (entre comas)"""
+        texto = self.ingredientes_var.get()
+        cursor = self.ingredientes_entry.index('insert')
+        inicio = texto.rfind(',', 0, cursor) + 1
+        fin = texto.find(',', cursor)
+        return texto, inicio, len(texto) if fin == -1 else fin
+
+    def actualizar_sugerencias(self, event):
+        """Sugerir ingredientes para lo que se está escribiendo (solo memoria: no espera a la base de datos)"""
+        if self.autocompletado is None or event.keysym in ('Down', 'Up', 'Return', 'Escape', 'Tab'):
+            return
+        texto, inicio, fin = self.ingrediente_en_curso()
+        parcial = texto[inicio:fin].strip()
+        # Con cantidad ("arroz:500") el nombre ya está escrito
+        nombres = self.autocompletado.completar(parcial) if parcial and ':' not in parcial else []
+        if not nombres or nombres == [parcial]:
+            self.ocultar_sugerencias()
+            return
+
+        self.sugerencias.delete(0, 'end')
+        self.sugerencias.insert('end', *nombres)
+        self.sugerencias.configure(height=len(nombres))
+        self.sugerencias.place(in_=self.ingredientes_entry, x=0, rely=1, relwidth=1)
+        self.sugerencias.lift()
+
+    def ir_a_sugerencias(self, event):
+        """Pasar con la flecha abajo de la entrada a la lista de sugerencias"""
+        if self.sugerencias.winfo_ismapped():
+            self.sugerencias.focus_set()
+            self.sugerencias.selection_clear(0, 'end')
+            self.sugerencias.selection_set(0)
+            self.sugerencias.activate(0)
+        return 'break'
+
+    def aceptar_sugerencia(self, event):
+        """Sustituir el ingrediente en curso por la sugerencia elegida"""
+        seleccion = self.sugerencias.curselection()
+        if not seleccion:
+            return
+        nombre = self.sugerencias.get(seleccion[0])
+        texto, inicio, fin = self.ingrediente_en_curso()
+        # Se conserva la cantidad si ya se había escrito
+        _, separador, cantidad = texto[inicio:fin].partition(':')
+        nuevo = (' ' if inicio else '') + nombre + separador + cantidad
+        resto = texto[fin:] if fin < len(texto) else ', '
+        self.ingredientes_var.set(texto[:inicio] + nuevo + resto)
+
+        self.ocultar_sugerencias(volver=True)
+        self.ingredientes_entry.icursor(inicio + len(nuevo) + (2 if fin == len(texto) else 0))
+
+    def ocultar_sugerencias(self, volver=False):
+        self.sugerencias.place_forget()
+        if volver:
+            self.ingredientes_entry.focus_set()
 
-    def mostrar_lista_compras(self, recetas):
-        """Mostrar lista de compras"""
-        lista_compras = self.generar_lista_compras(recetas)
+    def al_salir_de_entrada(self, event):
+        """Ocultar las sugerencias si el foco no pasa a ellas"""
+        def ocultar():
+            # `focus_get` falla si el foco está en el desplegable de un Combobox; el nombre de Tk basta
+            if self.root.tk.call('focus') != str(self.sugerencias):
+                self.ocultar_sugerencias()
+
+        self.root.after(100, ocultar)
+
+    def cargar_autocompletado(self):
+        """Construir en segundo plano el índice de nombres, ordenado por uso en recetas"""
+        def construir(recetario):
+            from autocompletado import IndiceNombres
+            return IndiceNombres.desde_conexion(recetario.conn, popularidad=True)
+
+        self.tareas.enviar(construir, clave='autocompletado', al_terminar=self.establecer_autocompletado)
+
+    def establecer_autocompletado(self, indice):
+        self.autocompletado = indice
+
+    def planificar_semana(self):
+        """Menú de 7 días x 3 comidas con la dieta elegida, aprovechando la despensa escrita arriba"""
+        try:
+            despensa = despensa_desde_texto(self.ingredientes_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Las cantidades de la despensa deben ser números")
+            return
+        dieta = self.dieta_var.get()
+
+        self.tareas.enviar(
+            lambda recetario: recetario.planificar_semana(tipo_dieta=dieta, ingredientes_disponibles=set(despensa)),
+            clave='plan',
+            al_terminar=lambda plan: self.mostrar_plan(plan, despensa),
+            al_fallar=self.mostrar_error
+        )
+
+    def mostrar_plan(self, plan, despensa):
+        """Mostrar el plan por días con sus totales, y su lista de compras a un clic"""
+        # El planificador (y NumPy) se importa solo al necesitarlo
+        from planificador import porciones
+
+        ventana_plan = tk.Toplevel(self.root)
+        ventana_plan.title("Plan Semanal")
+        ventana_plan.geometry("700x450")
+        
+        nutrientes = list(plan['objetivos'])
+        tabla = ttk.Treeview(ventana_plan, columns=['Porción'] + nutrientes, show='tree headings')
+        tabla.heading('#0', text='Día / Receta')
+        tabla.column('#0', width=250)
+        tabla.heading('Porción', text='Porción')
+        tabla.column('Porción', width=60, anchor='e')
+        for nutriente in nutrientes:
+            tabla.heading(nutriente, text=nutriente.capitalize())
+            tabla.column(nutriente, width=60, anchor='e')
+        
+        # Una fila por día con sus totales y, debajo, sus comidas
+        for numero, (comidas, totales) in enumerate(zip(plan['comidas'], plan['totales']), 1):
+            dia = tabla.insert('', 'end', text=f"Día {numero}", open=True,
+                               values=[''] + [f"{totales[n]:.0f}" for n in nutrientes])
+            for receta_id, fraccion in comidas:
+                tabla.insert(dia, 'end', text=plan['nombres'].get(receta_id, str(receta_id)), values=[f"{fraccion:g}"])
+        
+        scrollbar = ttk.Scrollbar(ventana_plan, orient="vertical", command=tabla.yview)
+        tabla.configure(yscrollcommand=scrollbar.set)
+        
+        pie = ttk.Frame(ventana_plan)
+        pie.pack(side='bottom', fill='x', padx=10, pady=5)
+        objetivos = ', '.join(f"{n} {v:g}" for n, v in plan['objetivos'].items())
+        ttk.Label(pie, text=f"Objetivos diarios: {objetivos}\nDespensa aprovechada: {plan['cobertura']:.0%}").pack(side='left')
+        ttk.Button(
+            pie,
+            text="Lista de Compras",
+            command=lambda: self.mostrar_lista_compras(porciones(plan), despensa)
+        ).pack(side='right')
         
+        tabla.pack(side='left', fill='both', expand=True, padx=(10, 0), pady=10)
+        scrollbar.pack(side='right', fill='y', pady=10)
+
+    def lista_compras_seleccion(self):
+        """Lista de compras de las recetas seleccionadas, descontando la despensa escrita arriba"""
+        receta_ids = [
+            int(self.tabla_recetas.item(item)['tags'][0])
+            for item in self.tabla_recetas.selection()
+            if self.tabla_recetas.item(item)['tags']
+        ]
+        if not receta_ids:
+            messagebox.showinfo("Lista de Compras", "Seleccione una o más recetas de la tabla")
+            return
+        
+        try:
+            porciones = float(self.porciones_var.get())
+            despensa = despensa_desde_texto(self.ingredientes_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Las porciones y las cantidades de la despensa deben ser números")
+            return
+        
+        self.mostrar_lista_compras({receta_id: porciones for receta_id in receta_ids}, despensa)
+
+    def mostrar_lista_compras(self, recetas, despensa=None):
+        """Generar la lista de compras en segundo plano y mostrarla"""
+        self.tareas.enviar(
+            lambda recetario: recetario.lista_compras(recetas, despensa),
+            al_terminar=self.mostrar_ventana_compras,
+            al_fallar=self.mostrar_error
+        )
+
+    def mostrar_ventana_compras(self, filas):
+        """Mostrar lista de compras en una tabla ordenable, con exportación a CSV"""
         ventana_compras = tk.Toplevel(self.root)
         ventana_compras.title("Lista de Compras")
+        ventana_compras.geometry("650x400")
+        
+        tabla_frame = ttk.Frame(ventana_compras)
+        tabla_frame.pack(padx=10, pady=10, fill='both', expand=True)
+        
+        columnas = ('Ingrediente', 'Necesario (g)', 'En despensa (g)', 'A comprar (g)', 'Recetas')
+        tabla = ttk.Treeview(tabla_frame, columns=columnas, show='headings')
+        for col in columnas:
+            tabla.heading(col, text=col, command=lambda c=col: self.ordenar_tabla(tabla, c, False))
+            tabla.column(col, width=200 if col == 'Ingrediente' else 100, anchor='w' if col == 'Ingrediente' else 'e')
+        
+        # Fila original de cada elemento, para exportar en el orden que se ve
+        filas_por_item = {}
+        for fila in filas:
+            nombre, necesario, en_despensa, comprar, recetas = fila
+            item = tabla.insert('', 'end', values=(nombre, f"{necesario:.2f}", f"{en_despensa:.2f}", f"{comprar:.2f}", recetas))
+            filas_por_item[item] = fila
+        
+        scrollbar = ttk.Scrollbar(tabla_frame, orient="vertical", command=tabla.yview)
+        tabla.configure(yscrollcommand=scrollbar.set)
+        tabla.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
         
-        for ingrediente, cantidad in lista_compras.items():
-            ttk.Label(ventana_compras, text=f"{ingrediente}: {cantidad} gramos").pack()
+        def exportar():
+            ruta = filedialog.asksaveasfilename(parent=ventana_compras, defaultextension='.csv',
+                                                filetypes=[("CSV", "*.csv")], initialfile="lista_compras.csv")
+            if not ruta:
+                return
+            try:
+                with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+                    escribir_lista_compras_csv([filas_por_item[item] for item in tabla.get_children()], archivo)
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo exportar la lista: {e}", parent=ventana_compras)
+        
+        por_comprar = sum(1 for fila in filas if fila[3] > 0)
+        ttk.Label(ventana_compras, text=f"{len(filas)} ingredientes, {por_comprar} por comprar").pack(side='left', padx=10, pady=5)
+        ttk.Button(ventana_compras, text="Exportar CSV", command=exportar).pack(side='right', padx=10, pady=5)
+
+    def ordenar_tabla(self, tabla, columna, descendente):
+        """Ordenar una tabla por una columna (numérica si se puede); otro clic invierte el orden"""
+        valores = [(tabla.set(item, columna), item) for item in tabla.get_children('')]
+        try:
+            valores.sort(key=lambda valor: float(valor[0]), reverse=descendente)
+        except ValueError:
+            valores.sort(key=lambda valor: valor[0].lower(), reverse=descendente)
+        
+        for posicion, (_, item) in enumerate(valores):
+            tabla.move(item, '', posicion)
+        tabla.heading(columna, command=lambda: self.ordenar_tabla(tabla, columna, not descendente))
 
     def ejecutar(self):
         """Iniciar aplicación con más ingredientes de ejemplo"""
-        # Agregar más ingredientes con valores nutricionales
-        ingredientes_ejemplo = [
-            ("pollo", 165, 31, 0, 3.6, 0, 74),
-            ("arroz", 130, 2.7, 28, 0.3, 0.4, 1),
-            ("tomate", 18, 0.9, 3.9, 0.2, 1.2, 5),
-            ("aceite de oliva", 884, 0, 0, 100, 0, 0),
-            ("cebolla", 40, 1.1, 9.3, 0.1, 1.7, 4),
-            ("ajo", 149, 6.4, 33.1, 0.5, 2.1, 17)
-        ]
-        
-        for ingrediente in ingredientes_ejemplo:
-            self.agregar_ingrediente(*ingrediente)
-        
-        # Agregar receta de ejemplo con más detalles
-        self.agregar_receta(
-            "Arroz con Pollo", 
-            "Todos", 
-            "1. Cortar el pollo\n2. Cocinar arroz\n3. Agregar tomate y cebolla\n4. Mezclar y servir", 
-            [
-                {"nombre": "pollo", "cantidad": 200},
-                {"nombre": "arroz", "cantidad": 150},
-                {"nombre": "tomate", "cantidad": 50},
-                {"nombre": "cebolla", "cantidad": 30},
-                {"nombre": "aceite de oliva", "cantidad": 10}
-            ]
+        # Ingredientes y receta de ejemplo: la carga es idempotente y no duplica nada en cada arranque
+        self.tareas.enviar(
+            lambda recetario: recetario.sembrar_ejemplos(),
+            al_fallar=lambda e: messagebox.showerror("Error", f"No se pudieron cargar los datos de ejemplo: {e}")
         )
+        self.cargar_autocompletado()
         
         self.root.mainloop()
 
+    def cerrar(self):
+        """Cerrar la ventana y el hilo de consultas"""
+        self.tareas.cerrar()
+        if self.ruta_metricas:
+            METRICAS.guardar(self.ruta_metricas)
+        self.root.destroy()
+
 if __name__ == "__main__":
     app = RecetarioInteligente()
     app.ejecutar()
\ No newline at end of file
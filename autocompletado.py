@@ -0,0 +1,330 @@
+"""Resolución aproximada de nombres de ingredientes y autocompletado
+
+Los nombres se normalizan (minúsculas, sin tildes ni signos), se quitan las
+palabras vacías ("de", "con"...) y se reduce el plural de cada palabra, así
+que "Tomates", "tomate " y "aceite oliva" dan la misma clave que "tomate" y
+"aceite de oliva". Lo que no coincide por clave se busca por trigramas
+(Jaccard entre los conjuntos de trigramas de las claves).
+
+Para autocompletar, la lista ordenada de nombres normalizados hace de trie:
+los nombres con un prefijo ocupan un tramo contiguo que se encuentra con
+bisect. Cada nombre se indexa también desde cada una de sus palabras
+("oliva" sugiere "aceite de oliva"), y las mejores sugerencias de los
+prefijos de una y dos letras, cuyos tramos son muy largos, se precalculan.
+
+    python autocompletado.py --ingredientes 50000
+"""
+import argparse
+import heapq
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+PALABRAS_VACIAS = {'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'los', 'y'}
+
+# Similitud mínima para proponer un ingrediente como sugerencia cuando no hay
+# coincidencias por prefijo (las sugerencias por trigramas nunca se aplican solas)
+UMBRAL_SUGERENCIA = 0.3
+
+# Sugerencias guardadas por cada prefijo corto
+MAX_SUGERENCIAS = 20
+LONGITUD_PREFIJO_CORTO = 3
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9 ]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni signos y con los espacios colapsados ("Jamón  Ibérico!" -> "jamon iberico")"""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(_NO_ALFANUMERICO.sub(' ', sin_tildes).split())
+
+
+def reducir(palabra):
+    """Forma común del singular y el plural ("tomates" y "tomate" -> "tomat", "nueces" -> "nuez")
+
+    No es una raíz gramatical: basta con que ambas formas den lo mismo.
+    """
+    if len(palabra) <= 3:
+        return palabra
+    if palabra.endswith('ces'):
+        return palabra[:-3] + 'z'
+    if palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if palabra.endswith('e') and len(palabra) > 3:
+        palabra = palabra[:-1]
+    return palabra
+
+
+def clave(texto):
+    """Clave de comparación: normalizada, sin palabras vacías y sin plurales"""
+    return ' '.join(reducir(palabra) for palabra in normalizar(texto).split() if palabra not in PALABRAS_VACIAS)
+
+
+def trigramas(texto_clave):
+    """Trigramas de una clave, con relleno para que cuenten el principio y el final"""
+    relleno = f'  {texto_clave} '
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceNombres:
+    """Nombres de ingredientes por clave, por trigramas y por prefijo
+
+    Solo lee memoria: una vez construido se puede consultar desde el hilo de la
+    interfaz sin tocar la base de datos.
+    """
+
+    def __init__(self, filas=()):
+        # Id -> nombre, nombre -> id y id -> número de recetas que lo usan
+        self.nombres = {}
+        self.ids = {}
+        self.popularidad = {}
+        # Clave -> ids
+        self.por_clave = {}
+
+        # Trigramas: cada ingrediente tiene una posición densa para contar coincidencias con bincount;
+        # trigrama -> posiciones (int32) y, por posición, id y número de trigramas de su clave
+        self.por_trigrama = {}
+        self._ids_posicion = []
+        self._num_trigramas = np.zeros(0, dtype=np.int32)
+
+        # Trie plano: textos normalizados ordenados y, en paralelo, su id y si es el principio del nombre
+        self._textos = []
+        self._ids_texto = []
+        self._inicios = []
+        # Prefijo corto -> mejores (id, inicio)
+        self._mejores = {}
+
+        entradas = []
+        posiciones = {}
+        num_trigramas = []
+        for ingrediente_id, nombre, popularidad in filas:
+            if ingrediente_id in self.nombres:
+                continue
+            tris, entradas_nombre = self._registrar(ingrediente_id, nombre, popularidad)
+            for trigrama in tris:
+                posiciones.setdefault(trigrama, []).append(len(num_trigramas))
+            num_trigramas.append(len(tris))
+            entradas.extend(entradas_nombre)
+
+        self.por_trigrama = {trigrama: np.array(lista, dtype=np.int32) for trigrama, lista in posiciones.items()}
+        self._num_trigramas = np.array(num_trigramas, dtype=np.int32)
+        entradas.sort()
+        self._textos = [texto for texto, _, _ in entradas]
+        self._ids_texto = [ingrediente_id for _, ingrediente_id, _ in entradas]
+        self._inicios = [inicio for _, _, inicio in entradas]
+        self._precalcular_mejores()
+
+    @classmethod
+    def desde_conexion(cls, conn, popularidad=False):
+        """Leer los ingredientes; con `popularidad`, las sugerencias se ordenan por número de recetas"""
+        cursor = conn.cursor()
+        if popularidad:
+            cursor.execute('''
+            SELECT i.id, i.nombre, COALESCE(u.recetas, 0)
+            FROM ingredientes i
+            LEFT JOIN (
+                SELECT ingrediente_id, COUNT(*) AS recetas FROM receta_ingredientes GROUP BY ingrediente_id
+            ) u ON u.ingrediente_id = i.id
+            ''')
+        else:
+            cursor.execute('SELECT id, nombre, 0 FROM ingredientes')
+        return cls(cursor.fetchall())
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def _registrar(self, ingrediente_id, nombre, popularidad):
+        """Indexar un nombre por clave; devuelve sus trigramas y sus entradas del trie"""
+        self.nombres[ingrediente_id] = nombre
+        self.ids[nombre] = ingrediente_id
+        self.popularidad[ingrediente_id] = popularidad
+        self._ids_posicion.append(ingrediente_id)
+
+        clave_nombre = clave(nombre)
+        self.por_clave.setdefault(clave_nombre, []).append(ingrediente_id)
+
+        # El nombre completo y cada resto que empieza por una palabra con contenido
+        palabras = normalizar(nombre).split()
+        entradas = [(' '.join(palabras), ingrediente_id, True)]
+        for i in range(1, len(palabras)):
+            if palabras[i] not in PALABRAS_VACIAS:
+                entradas.append((' '.join(palabras[i:]), ingrediente_id, False))
+        return trigramas(clave_nombre), entradas
+
+    def _orden(self, ingrediente_id, inicio):
+        """Orden de las sugerencias: coincidencia al principio, más recetas, más corto"""
+        nombre = self.nombres[ingrediente_id]
+        return (not inicio, -self.popularidad[ingrediente_id], len(nombre), nombre)
+
+    def _elegir(self, entradas, limite):
+        """Las `limite` mejores (id, inicio) de {id: inicio}"""
+        return heapq.nsmallest(limite, entradas.items(), key=lambda entrada: self._orden(*entrada))
+
+    def _mejores_del_tramo(self, inicio, fin, limite):
+        """Las `limite` mejores (id, inicio) entre las entradas del trie [inicio, fin), sin repetir ingrediente"""
+        entradas = {}
+        for posicion in range(inicio, fin):
+            ingrediente_id = self._ids_texto[posicion]
+            if self._inicios[posicion] or ingrediente_id not in entradas:
+                entradas[ingrediente_id] = self._inicios[posicion]
+        return self._elegir(entradas, limite)
+
+    def _tramo(self, prefijo):
+        return bisect_left(self._textos, prefijo), bisect_left(self._textos, prefijo + '\uffff')
+
+    def _precalcular_mejores(self):
+        self._mejores = {}
+        prefijos = {texto[:longitud] for texto in self._textos for longitud in range(1, LONGITUD_PREFIJO_CORTO + 1)}
+        for prefijo in prefijos:
+            self._mejores[prefijo] = self._mejores_del_tramo(*self._tramo(prefijo), MAX_SUGERENCIAS)
+
+    def agregar(self, ingrediente_id, nombre, popularidad=0):
+        """Añadir un ingrediente nuevo sin reconstruir el índice (los ya conocidos se ignoran)"""
+        if ingrediente_id in self.nombres:
+            return
+        tris, entradas = self._registrar(ingrediente_id, nombre, popularidad)
+        posicion_nueva = len(self._num_trigramas)
+        for trigrama in tris:
+            self.por_trigrama[trigrama] = np.append(
+                self.por_trigrama.get(trigrama, np.zeros(0, dtype=np.int32)), np.int32(posicion_nueva))
+        self._num_trigramas = np.append(self._num_trigramas, np.int32(len(tris)))
+
+        for texto, _, inicio in entradas:
+            posicion = bisect_left(self._textos, texto)
+            self._textos.insert(posicion, texto)
+            self._ids_texto.insert(posicion, ingrediente_id)
+            self._inicios.insert(posicion, inicio)
+        # Las listas precalculadas ya tenían lo mejor de su tramo: basta con volver a ordenar el nuevo entre ellas
+        for texto, _, inicio in entradas:
+            for longitud in range(1, min(len(texto), LONGITUD_PREFIJO_CORTO) + 1):
+                prefijo = texto[:longitud]
+                mejores = dict(self._mejores.get(prefijo, []))
+                mejores[ingrediente_id] = mejores.get(ingrediente_id, False) or inicio
+                self._mejores[prefijo] = self._elegir(mejores, MAX_SUGERENCIAS)
+
+    def _parecidos(self, texto_clave, umbral, limite):
+        """(id, similitud) de los nombres con similitud de trigramas >= `umbral` respecto a `texto_clave`"""
+        tris = trigramas(texto_clave)
+        listas = [self.por_trigrama[trigrama] for trigrama in tris if trigrama in self.por_trigrama]
+        if not listas:
+            return []
+        comunes = np.bincount(np.concatenate(listas), minlength=len(self._num_trigramas))
+
+        # Jaccard <= comunes / trigramas de la consulta: lo que no llega ni a eso se descarta sin calcularlo
+        candidatas = np.flatnonzero(comunes >= umbral * len(tris))
+        en_comun = comunes[candidatas]
+        similitud = en_comun / (len(tris) + self._num_trigramas[candidatas] - en_comun)
+        validas = similitud >= umbral
+        candidatas, similitud = candidatas[validas], similitud[validas]
+
+        # Los empates en el corte se desempatan por popularidad, así que se ordenan todos los que empatan
+        if len(similitud) > limite:
+            corte = np.partition(similitud, len(similitud) - limite)[len(similitud) - limite]
+            seleccion = similitud >= corte
+            candidatas, similitud = candidatas[seleccion], similitud[seleccion]
+        puntuados = [(self._ids_posicion[posicion], valor) for posicion, valor in zip(candidatas.tolist(), similitud.tolist())]
+        puntuados.sort(key=lambda p: (-p[1], -self.popularidad[p[0]], p[0]))
+        return puntuados[:limite]
+
+    def resolver(self, texto, limite=5, umbral=UMBRAL_SUGERENCIA):
+        """Ingredientes que puede querer decir `texto`: (id, nombre, puntuación entre 0 y 1), mejor primero
+
+        El nombre exacto o la misma clave puntúan 1; el resto, por similitud de trigramas.
+        """
+        texto = texto.strip()
+        if texto in self.ids:
+            return [(self.ids[texto], texto, 1.0)]
+        texto_clave = clave(texto)
+        if not texto_clave:
+            return []
+
+        iguales = self.por_clave.get(texto_clave)
+        if iguales:
+            iguales = sorted(iguales, key=lambda i: (-self.popularidad[i], self.nombres[i]))
+            return [(i, self.nombres[i], 1.0) for i in iguales[:limite]]
+        return [(i, self.nombres[i], round(similitud, 3))
+                for i, similitud in self._parecidos(texto_clave, umbral, limite)]
+
+    def canonico(self, texto):
+        """Ingrediente con el mismo nombre o la misma clave que `texto` (el más usado), o `texto` tal cual
+
+        Solo cambia la forma de escribirlo ("Tomates", "aceite oliva"): un nombre
+        que solo se parece por trigramas no se sustituye sin avisar.
+        """
+        if texto.strip() in self.ids:
+            return texto.strip()
+        iguales = self.por_clave.get(clave(texto))
+        if not iguales:
+            return texto
+        return self.nombres[min(iguales, key=lambda i: (-self.popularidad[i], self.nombres[i]))]
+
+    def completar(self, texto, limite=8):
+        """Nombres que empiezan por `texto` (o alguna de sus palabras); si no hay ninguno, los más parecidos"""
+        prefijo = normalizar(texto)
+        if not prefijo:
+            return []
+
+        if len(prefijo) <= LONGITUD_PREFIJO_CORTO and limite <= MAX_SUGERENCIAS:
+            mejores = self._mejores.get(prefijo, [])[:limite]
+        else:
+            mejores = self._mejores_del_tramo(*self._tramo(prefijo), limite)
+        ids = [ingrediente_id for ingrediente_id, _ in mejores]
+
+        # Con erratas no hay prefijo que valga: se sugieren los parecidos por trigramas
+        texto_clave = clave(texto)
+        if not ids and len(texto_clave) >= 3:
+            ids = [i for i, _ in self._parecidos(texto_clave, UMBRAL_SUGERENCIA, limite)]
+        return [self.nombres[i] for i in ids]
+
+
+def medir_latencia(indice, consultas):
+    """Milisegundos (p50, p99, máximo) de `completar` tecla a tecla sobre cada consulta"""
+    tiempos = []
+    for consulta in consultas:
+        for fin in range(1, len(consulta) + 1):
+            inicio = time.perf_counter()
+            indice.completar(consulta[:fin])
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'pulsaciones': len(tiempos),
+        'p50_ms': round(tiempos[len(tiempos) // 2], 3),
+        'p99_ms': round(tiempos[int(len(tiempos) * 0.99)], 3),
+        'max_ms': round(tiempos[-1], 3),
+    }
+
+
+def main(argv=None):
+    """Medir construcción y latencia por pulsación con nombres sintéticos"""
+    import random
+
+    from generador_datos import nombres_ingredientes
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--ingredientes', type=int, default=50000)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    aleatorio = random.Random(args.semilla)
+    nombres = nombres_ingredientes(args.ingredientes)
+    inicio = time.perf_counter()
+    indice = IndiceNombres((i, nombre, aleatorio.randint(0, 1000)) for i, nombre in enumerate(nombres, 1))
+    construccion = time.perf_counter() - inicio
+
+    # Nombres existentes, en plural, sin tildes y con una letra cambiada
+    consultas = []
+    for nombre in aleatorio.sample(nombres, args.consultas):
+        posicion = aleatorio.randrange(len(nombre))
+        consultas.extend([nombre, nombre + 's', normalizar(nombre), nombre[:posicion] + 'x' + nombre[posicion + 1:]])
+
+    print(f"{len(indice)} ingredientes indexados en {construccion:.2f} s")
+    print(medir_latencia(indice, consultas))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""Banco de pruebas de rendimiento del recetario (sin interfaz gráfica)
+
+Genera catálogos sintéticos de varios tamaños con `generador_datos`, mide las
+operaciones principales de `Recetario` con entradas aleatorias reproducibles y
+guarda un informe JSON con p50/p99 y operaciones por segundo:
+
+    python benchmark.py --escalas 1000 10000 100000 --salida base.json
+    python benchmark.py --escalas 1000 10000 100000 --comparar base.json
+
+Con --comparar se muestra la variación de p50 respecto a un informe anterior y
+el programa termina con código 1 si alguna operación empeora más del umbral.
+"""
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+from generador_datos import GeneradorCatalogo
+from recetario_core import Recetario, conectar
+from similitud import actualizar_pendientes
+
+
+def percentil(tiempos_ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    posicion = max(0, math.ceil(p / 100 * len(tiempos_ordenados)) - 1)
+    return tiempos_ordenados[posicion]
+
+
+def medir(funcion, entradas, calentar=True):
+    """Ejecutar `funcion(*entrada)` para cada entrada y resumir las latencias
+
+    Con `calentar`, la primera entrada se ejecuta una vez antes sin medirla
+    (preparación de sentencias, caché de páginas de SQLite).
+    """
+    if calentar and entradas:
+        funcion(*entradas[0])
+
+    tiempos = []
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        funcion(*entrada)
+        tiempos.append(time.perf_counter() - inicio)
+
+    total = sum(tiempos)
+    tiempos.sort()
+    return {
+        'n': len(tiempos),
+        'p50_ms': round(percentil(tiempos, 50) * 1000, 3),
+        'p99_ms': round(percentil(tiempos, 99) * 1000, 3),
+        'media_ms': round(total / len(tiempos) * 1000, 3),
+        'ops_por_s': round(len(tiempos) / total, 1) if total else None,
+    }
+
+
+def medir_una_vez(funcion):
+    """Duración en ms de una sola llamada (construcción de estructuras en frío)"""
+    inicio = time.perf_counter()
+    funcion()
+    return round((time.perf_counter() - inicio) * 1000, 3)
+
+
+def medir_escala(recetas, ingredientes=500, repeticiones=200, semilla=42, directorio=None):
+    """Generar un catálogo de `recetas` recetas y medir cada operación sobre él"""
+    generador = GeneradorCatalogo(ingredientes, recetas, semilla=semilla)
+    ruta = os.path.join(directorio, f'benchmark_{recetas}.db')
+
+    conn = conectar(ruta)
+    _, carga = generador.cargar(conn)
+    recetario = Recetario(conn=conn)
+
+    resultado = {
+        'recetas': recetas,
+        'ingredientes': ingredientes,
+        'carga_masiva': {
+            'segundos': carga['segundos'],
+            'filas_por_segundo': carga['filas_por_segundo'],
+        },
+        'en_frio_ms': {
+            'indice_despensa': medir_una_vez(lambda: recetario.indice),
+            'motor_nutricional': medir_una_vez(lambda: recetario.motor_nutricional),
+            'indice_similitud': medir_una_vez(lambda: actualizar_pendientes(conn)),
+        },
+    }
+
+    # Arranque en frío desde la instantánea columnar: índice de despensa y motor proyectados con mmap
+    instantanea = ruta + '.instantanea'
+
+    def desde_instantanea():
+        en_frio = Recetario(conn=conn, instantanea=instantanea)
+        return en_frio.indice, en_frio.motor_nutricional
+
+    resultado['en_frio_ms']['exportar_instantanea'] = medir_una_vez(lambda: recetario.exportar_instantanea(instantanea))
+    resultado['en_frio_ms']['desde_instantanea'] = medir_una_vez(desde_instantanea)
+
+    # Entradas aleatorias reproducibles: despensas con la misma popularidad que el catálogo
+    aleatorio = random.Random(semilla)
+    receta_ids = [fila[0] for fila in conn.execute('SELECT id FROM recetas')]
+
+    def despensa():
+        return generador.elegir_ingredientes(aleatorio, 25)
+
+    def lote(tamano):
+        return aleatorio.sample(receta_ids, min(tamano, len(receta_ids)))
+
+    def texto():
+        ingrediente = aleatorio.choice(generador.nombres[:50]).split()[0]
+        return f"{ingrediente} {aleatorio.choice(['picar', 'hornear', 'servir'])}"
+
+    operaciones = {
+        'encontrar_recetas': (
+            recetario.encontrar_recetas,
+            [(despensa(),) for _ in range(repeticiones)],
+        ),
+        'busqueda_pagina': (
+            lambda d: recetario.buscar_pagina(d, 'Todos', None, 200),
+            [(despensa(),) for _ in range(repeticiones)],
+        ),
+        'busqueda_cobertura': (
+            lambda d: recetario.recetas_por_cobertura(d, 'Todos', 1),
+            [(despensa(),) for _ in range(repeticiones)],
+        ),
+        'busqueda_texto': (
+            lambda t: recetario.buscar_texto(t, limite=20),
+            [(texto(),) for _ in range(repeticiones)],
+        ),
+        'nutricion_receta': (
+            recetario.calcular_valor_nutricional_receta,
+            [(aleatorio.choice(receta_ids),) for _ in range(repeticiones)],
+        ),
+        'nutricion_lote_100': (
+            recetario.calcular_valor_nutricional_lote,
+            [(lote(100),) for _ in range(repeticiones)],
+        ),
+        'analisis_consolidado_50': (
+            recetario.analisis_consolidado,
+            [(lote(50),) for _ in range(repeticiones)],
+        ),
+        'filtro_nutricional': (
+            lambda maximo: recetario.filtrar_por_nutricion(maximos={'calorias': maximo}),
+            [(aleatorio.uniform(200, 3000),) for _ in range(repeticiones)],
+        ),
+        'similares_10': (
+            recetario.recetas_similares,
+            [(aleatorio.choice(receta_ids),) for _ in range(repeticiones)],
+        ),
+        'plan_semanal': (
+            lambda d: recetario.planificar_semana(ingredientes_disponibles=d),
+            [(despensa(),) for _ in range(repeticiones)],
+        ),
+        'lista_compras_7': (
+            recetario.generar_lista_compras,
+            [(lote(7),) for _ in range(repeticiones)],
+        ),
+    }
+    resultado['operaciones'] = {
+        nombre: medir(funcion, entradas) for nombre, (funcion, entradas) in operaciones.items()
+    }
+
+    # Escrituras al final: invalidan las estructuras en memoria de las lecturas
+    nuevas = [
+        (f'Receta de prueba {numero}', 'Todos', 'Mezclar y servir.',
+         [{'nombre': nombre, 'cantidad': 100} for nombre in despensa()[:8]])
+        for numero in range(min(repeticiones, 100))
+    ]
+    resultado['operaciones']['insercion_receta'] = medir(recetario.agregar_receta, nuevas, calentar=False)
+
+    recetario.cerrar()
+    return resultado
+
+
+def _revision():
+    """Commit actual del repositorio, si se ejecuta dentro de uno"""
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+def ejecutar(escalas, ingredientes=500, repeticiones=200, semilla=42, directorio=None):
+    """Medir todas las escalas y devolver el informe completo"""
+    import numpy
+
+    informe = {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': _revision(),
+        'entorno': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'numpy': numpy.__version__,
+            'plataforma': platform.platform(),
+        },
+        'parametros': {'ingredientes': ingredientes, 'repeticiones': repeticiones, 'semilla': semilla},
+        'escalas': [],
+    }
+
+    with tempfile.TemporaryDirectory(dir=directorio) as temporal:
+        for recetas in escalas:
+            informe['escalas'].append(medir_escala(recetas, ingredientes, repeticiones, semilla, temporal))
+    return informe
+
+
+def comparar(anterior, actual, umbral=1.10):
+    """Filas (escala, operación, p50 anterior, p50 actual, cociente, empeora) de dos informes"""
+    anteriores = {
+        (escala['recetas'], nombre): datos
+        for escala in anterior['escalas'] for nombre, datos in escala['operaciones'].items()
+    }
+    filas = []
+    for escala in actual['escalas']:
+        for nombre, datos in escala['operaciones'].items():
+            previo = anteriores.get((escala['recetas'], nombre))
+            if previo is None or not previo['p50_ms']:
+                continue
+            cociente = datos['p50_ms'] / previo['p50_ms']
+            filas.append((escala['recetas'], nombre, previo['p50_ms'], datos['p50_ms'], cociente, cociente > umbral))
+    return filas
+
+
+def _imprimir_informe(informe):
+    for escala in informe['escalas']:
+        carga = escala['carga_masiva']
+        print(f"\n{escala['recetas']} recetas  (carga masiva: {carga['filas_por_segundo']:.0f} recetas/s, "
+              f"índice en frío: {escala['en_frio_ms']['indice_despensa']:.1f} ms, "
+              f"motor en frío: {escala['en_frio_ms']['motor_nutricional']:.1f} ms, "
+              f"desde instantánea: {escala['en_frio_ms']['desde_instantanea']:.1f} ms)")
+        for nombre, datos in escala['operaciones'].items():
+            print(f"  {nombre:<26} p50 {datos['p50_ms']:>9.3f} ms  p99 {datos['p99_ms']:>9.3f} ms  "
+                  f"{datos['ops_por_s']:>10.1f} ops/s")
+
+
+def main():
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Medir el rendimiento del recetario a varias escalas")
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1000, 10000, 100000], help="Número de recetas")
+    parser.add_argument('--ingredientes', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--directorio', help="Dónde crear las bases de datos temporales")
+    parser.add_argument('--salida', help="Guardar el informe JSON en este archivo")
+    parser.add_argument('--comparar', metavar='INFORME', help="Informe JSON anterior con el que comparar")
+    parser.add_argument('--umbral', type=float, default=1.10, help="Cociente de p50 a partir del cual hay regresión")
+    args = parser.parse_args()
+
+    informe = ejecutar(args.escalas, args.ingredientes, args.repeticiones, args.semilla, args.directorio)
+    _imprimir_informe(informe)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        filas = comparar(anterior, informe, args.umbral)
+
+        print(f"\nComparación con {args.comparar} (revisión {anterior.get('revision')}):")
+        for recetas, nombre, antes, ahora, cociente, empeora in filas:
+            marca = '  <-- regresión' if empeora else ''
+            print(f"  {recetas:>8} {nombre:<26} {antes:>9.3f} -> {ahora:>9.3f} ms  x{cociente:.2f}{marca}")
+        if any(fila[-1] for fila in filas):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
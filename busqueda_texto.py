@@ -0,0 +1,118 @@
+"""Búsqueda de texto completo (FTS5) sobre nombre e instrucciones de las recetas
+
+El índice `recetas_fts` lo crea una migración y se mantiene sincronizado con
+la tabla `recetas` mediante triggers. El tokenizador `unicode61` con
+`remove_diacritics 2` ignora mayúsculas y tildes ("canción" = "cancion").
+"""
+import re
+import time
+
+# Peso de cada columna en BM25: un acierto en el nombre vale más que en las instrucciones
+PESO_NOMBRE = 10.0
+PESO_INSTRUCCIONES = 1.0
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def raiz(palabra):
+    """Quitar el plural español más común para buscar también por prefijo ("tomates" -> "tomate")"""
+    if len(palabra) > 4 and palabra.endswith('es'):
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s'):
+        return palabra[:-1]
+    return palabra
+
+
+def preparar_consulta(texto):
+    """Convertir texto libre en una consulta FTS5 segura: todas las palabras, por prefijo"""
+    terminos = []
+    for palabra in _PALABRA.findall(texto.lower()):
+        base = raiz(palabra)
+        if base != palabra:
+            terminos.append(f'("{palabra}"* OR "{base}"*)')
+        else:
+            terminos.append(f'"{palabra}"*')
+    return ' AND '.join(terminos)
+
+
+def buscar_texto(conn, texto, tipo_dieta="Todos", permitidas=None, limite=20):
+    """Buscar recetas por texto ordenadas por BM25, con fragmento resaltado de las instrucciones
+
+    `permitidas` restringe el resultado a un conjunto de ids (p. ej. las
+    recetas cocinables con la despensa). Devuelve tuplas
+    (id, nombre, fragmento, puntuación); una puntuación menor es más relevante.
+    """
+    consulta = preparar_consulta(texto)
+    if not consulta or (permitidas is not None and not permitidas):
+        return []
+
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT r.id, r.nombre,
+           snippet(recetas_fts, 1, '[', ']', '...', 12),
+           bm25(recetas_fts, ?, ?) AS puntuacion
+    FROM recetas_fts
+    JOIN recetas r ON r.id = recetas_fts.rowid
+    WHERE recetas_fts MATCH ?
+      AND (? = 'Todos' OR r.tipo_dieta = ?)
+    ORDER BY puntuacion
+    ''' + ('' if permitidas is not None else 'LIMIT ?'),
+        [PESO_NOMBRE, PESO_INSTRUCCIONES, consulta, tipo_dieta, tipo_dieta]
+        + ([] if permitidas is not None else [limite]))
+
+    if permitidas is None:
+        return cursor.fetchall()
+
+    # Se recorren los resultados por relevancia hasta reunir `limite` recetas permitidas
+    resultados = []
+    for fila in cursor:
+        if fila[0] in permitidas:
+            resultados.append(fila)
+            if len(resultados) >= limite:
+                break
+    return resultados
+
+
+def medir_latencia(conn, consultas, repeticiones=20, **opciones):
+    """Latencias p50/p99 (ms) de `buscar_texto` para cada consulta"""
+    informe = []
+    for texto in consultas:
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultados = buscar_texto(conn, texto, **opciones)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        informe.append({
+            'consulta': texto,
+            'resultados': len(resultados),
+            'p50_ms': round(tiempos[len(tiempos) // 2], 3),
+            'p99_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))], 3),
+        })
+    return informe
+
+
+def main():
+    import argparse
+    import json
+
+    from recetario_core import conectar
+
+    parser = argparse.ArgumentParser(description="Medir la latencia de la búsqueda de texto")
+    parser.add_argument('consultas', nargs='+')
+    parser.add_argument('--db', default='recetario.db')
+    parser.add_argument('--dieta', default='Todos')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = conectar(args.db)
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM recetas')
+    recetas = cursor.fetchone()[0]
+
+    informe = medir_latencia(conn, args.consultas, args.repeticiones, tipo_dieta=args.dieta)
+    print(json.dumps({'recetas': recetas, 'consultas': informe}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Generador reproducible de catálogos sintéticos de ingredientes y recetas
+
+La popularidad de los ingredientes sigue una ley de Zipf (unos pocos, como la
+sal o el aceite, aparecen en muchísimas recetas y la mayoría en muy pocas),
+que es lo que hace costosas las búsquedas reales por despensa.
+"""
+import itertools
+import random
+
+from importador import ImportadorCatalogo
+
+_BASES = [
+    'sal', 'aceite de oliva', 'ajo', 'cebolla', 'tomate', 'pimienta', 'huevo', 'harina', 'leche',
+    'mantequilla', 'azúcar', 'arroz', 'pollo', 'patata', 'zanahoria', 'pimiento', 'perejil', 'limón',
+    'queso', 'nata', 'ternera', 'cerdo', 'pasta', 'lentejas', 'garbanzos', 'judías', 'calabacín',
+    'berenjena', 'espinacas', 'champiñones', 'atún', 'merluza', 'gambas', 'calamar', 'mejillones',
+    'chorizo', 'jamón', 'pan', 'vino blanco', 'caldo', 'comino', 'pimentón', 'laurel', 'orégano',
+    'canela', 'almendras', 'nueces', 'manzana', 'naranja', 'plátano', 'fresas', 'yogur', 'lechuga',
+    'pepino', 'aguacate', 'maíz', 'guisantes', 'puerro', 'apio', 'coliflor', 'brócoli', 'tofu',
+]
+_VARIEDADES = ['', 'de temporada', 'en conserva', 'bio', 'de bote', 'a granel', 'del país', 'extra', 'de la huerta', 'selecto']
+_PLATOS = ['Guiso', 'Ensalada', 'Crema', 'Salteado', 'Tortilla', 'Estofado', 'Asado', 'Sopa', 'Pastel', 'Arroz']
+_PASOS = [
+    'Picar finamente {a}.', 'Sofreír {a} con {b} a fuego medio.', 'Añadir {a} y remover.',
+    'Cocer {a} durante {n} minutos.', 'Hornear a {t} grados durante {n} minutos.',
+    'Mezclar {a} con {b} en un bol.', 'Salpimentar y dejar reposar {n} minutos.', 'Servir caliente con {a}.',
+]
+_DIETAS = ['Todos', 'Todos', 'Todos', 'Vegetariano', 'Vegano', 'Sin Gluten', 'Bajo en Carbohidratos']
+
+
+def nombres_ingredientes(cantidad):
+    """Nombres únicos y verosímiles: base, base + variedad y, si hacen falta más, numerados"""
+    nombres = []
+    for variedad in _VARIEDADES:
+        for base in _BASES:
+            nombres.append(f'{base} {variedad}'.strip())
+            if len(nombres) == cantidad:
+                return nombres
+
+    numero = 2
+    while len(nombres) < cantidad:
+        nombres.extend(f'{base} {numero}' for base in _BASES[:cantidad - len(nombres)])
+        numero += 1
+    return nombres
+
+
+class GeneradorCatalogo:
+    """Catálogo sintético reproducible a partir de una semilla"""
+
+    def __init__(self, ingredientes=500, recetas=10000, por_receta=(4, 12), sesgo=1.1, semilla=42):
+        self.n_ingredientes = ingredientes
+        self.n_recetas = recetas
+        self.por_receta = por_receta
+        self.sesgo = sesgo
+        self.semilla = semilla
+
+        self.nombres = nombres_ingredientes(ingredientes)
+        # Peso de Zipf: el ingrediente de rango k aparece con probabilidad ~ 1 / k^sesgo
+        self.pesos = [1 / (rango ** sesgo) for rango in range(1, ingredientes + 1)]
+
+        # random.choices con pesos acumulados precalculados evita sumarlos en cada receta
+        self._posiciones = range(len(self.nombres))
+        self._acumulados = list(itertools.accumulate(self.pesos))
+
+    def ingredientes(self):
+        """Registros de ingredientes con valores nutricionales por 100 g"""
+        aleatorio = random.Random(self.semilla)
+        for nombre in self.nombres:
+            yield {
+                'nombre': nombre,
+                'calorias': round(aleatorio.uniform(10, 900), 1),
+                'proteinas': round(aleatorio.uniform(0, 35), 1),
+                'carbohidratos': round(aleatorio.uniform(0, 80), 1),
+                'grasas': round(aleatorio.uniform(0, 100), 1),
+                'fibra': round(aleatorio.uniform(0, 12), 1),
+                'sodio': round(aleatorio.uniform(0, 800), 1),
+            }
+
+    def elegir_ingredientes(self, aleatorio, cantidad):
+        """Ingredientes distintos elegidos según su popularidad, del más al menos común"""
+        cantidad = min(cantidad, len(self.nombres))
+        elegidos = []
+        while len(elegidos) < cantidad:
+            for indice in aleatorio.choices(self._posiciones, cum_weights=self._acumulados, k=cantidad - len(elegidos)):
+                if indice not in elegidos:
+                    elegidos.append(indice)
+        return [self.nombres[indice] for indice in sorted(elegidos)]
+
+    def recetas(self):
+        """Registros de recetas con sus líneas de ingredientes"""
+        aleatorio = random.Random(self.semilla + 1)
+        for numero in range(self.n_recetas):
+            nombres = self.elegir_ingredientes(aleatorio, aleatorio.randint(*self.por_receta))
+            principal = nombres[-1]  # el menos común da nombre al plato
+            pasos = [
+                aleatorio.choice(_PASOS).format(
+                    a=aleatorio.choice(nombres), b=aleatorio.choice(nombres),
+                    n=aleatorio.randint(2, 60), t=aleatorio.choice([160, 180, 200, 220])
+                )
+                for _ in range(aleatorio.randint(3, 8))
+            ]
+            yield {
+                'nombre': f'{aleatorio.choice(_PLATOS)} de {principal} {numero}',
+                'tipo_dieta': aleatorio.choice(_DIETAS),
+                'instrucciones': '\n'.join(f'{i}. {paso}' for i, paso in enumerate(pasos, 1)),
+                'ingredientes': [
+                    {'nombre': nombre, 'cantidad': aleatorio.choice([5, 10, 25, 50, 100, 150, 200, 250])}
+                    for nombre in nombres
+                ],
+            }
+
+    def cargar(self, conn, tam_bloque=5000, progreso=None):
+        """Escribir el catálogo con el importador masivo
+
+        Devuelve el resumen (`InformeImportacion.como_dict`) de cada fase,
+        tomado al terminarla para que los tiempos no se solapen.
+        """
+        importador = ImportadorCatalogo(conn, tam_bloque, progreso)
+        ingredientes = importador.cargar_ingredientes(self.ingredientes()).como_dict()
+        recetas = importador.cargar_recetas(self.recetas()).como_dict()
+        return ingredientes, recetas
+
+
+def main():
+    import argparse
+    import json
+    import sys
+
+    from recetario_core import conectar
+
+    parser = argparse.ArgumentParser(description="Generar un catálogo sintético de recetas")
+    parser.add_argument('--db', default='recetario_sintetico.db')
+    parser.add_argument('--ingredientes', type=int, default=500)
+    parser.add_argument('--recetas', type=int, default=10000)
+    parser.add_argument('--por-receta', type=int, nargs=2, default=(4, 12), metavar=('MIN', 'MAX'))
+    parser.add_argument('--sesgo', type=float, default=1.1, help="Exponente de Zipf de la popularidad")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    def mostrar_progreso(informe):
+        print(f"\r{informe.procesados} registros ({informe.filas_por_segundo:.0f}/s)", end='', file=sys.stderr)
+
+    generador = GeneradorCatalogo(args.ingredientes, args.recetas, tuple(args.por_receta), args.sesgo, args.semilla)
+    informes = generador.cargar(conectar(args.db), progreso=mostrar_progreso)
+    print(file=sys.stderr)
+    print(json.dumps(informes, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Gráficos nutricionales reutilizables, con caché y exportación sin interfaz
+
+`RenderizadorGraficos` dibuja siempre sobre la misma Figure con lienzo Agg
+(sin pyplot, que guarda cada figura en un registro global hasta que se
+cierra) y devuelve la imagen ya codificada. Las imágenes se guardan en una
+caché LRU por clave (p. ej. el id de receta) y versión, que es un hash de los
+datos nutricionales: volver a abrir una receta sin cambios no dibuja nada.
+
+`exportar_tarjetas` genera tarjetas PNG/SVG de muchas recetas con un pool de
+procesos; cada proceso abre su propia conexión y reutiliza una sola figura:
+
+    python recetario_cli.py cards --todas --directorio tarjetas --formato svg
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MACRONUTRIENTES = [('proteinas', 'Proteínas'), ('carbohidratos', 'Carbohidratos'), ('grasas', 'Grasas')]
+
+# Los márgenes son fijos, así que los nombres largos se recortan para que quepan
+LONGITUD_ETIQUETA = 16
+
+
+def _etiqueta(nombre):
+    return nombre if len(nombre) <= LONGITUD_ETIQUETA else nombre[:LONGITUD_ETIQUETA - 1] + '…'
+
+
+def version(totales, desglose):
+    """Hash corto del contenido nutricional, para invalidar la caché cuando cambian los datos"""
+    contenido = json.dumps([totales, desglose], sort_keys=True, default=float)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+
+
+def dibujar(ax1, ax2, totales, desglose, titulo_barras):
+    """Dibujar la tarta de macronutrientes y las barras de calorías por ingrediente (borrando los ejes antes)"""
+    ax1.clear()
+    ax2.clear()
+
+    # Gráfico de pastel de macronutrientes (una receta sin macronutrientes no tiene tarta)
+    macronutrientes = [totales[nutriente] for nutriente, _ in MACRONUTRIENTES]
+    if sum(macronutrientes) > 0:
+        ax1.set_axis_on()
+        ax1.pie(macronutrientes, labels=[etiqueta for _, etiqueta in MACRONUTRIENTES], autopct='%1.1f%%',
+                startangle=90)
+    else:
+        ax1.text(0.5, 0.5, 'Sin datos', ha='center', va='center')
+        ax1.set_axis_off()
+    ax1.set_title('Distribución de Macronutrientes')
+
+    # Gráfico de barras de ingredientes
+    ax2.bar([_etiqueta(ing['nombre']) for ing in desglose], [ing['calorias'] for ing in desglose])
+    ax2.set_title(titulo_barras)
+    ax2.set_xlabel('Ingredientes')
+    ax2.set_ylabel('Calorías')
+    for etiqueta in ax2.get_xticklabels():
+        etiqueta.set_rotation(45)
+        etiqueta.set_horizontalalignment('right')
+
+
+class RenderizadorGraficos:
+    """Una figura Agg reutilizada y una caché LRU de imágenes ya codificadas
+
+    No es seguro usarlo desde varios hilos a la vez: en la interfaz todas las
+    tareas corren en el mismo hilo de trabajo.
+    """
+
+    def __init__(self, ancho=8, alto=4, dpi=100, capacidad=64):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figura = Figure(figsize=(ancho, alto), dpi=dpi)
+        FigureCanvasAgg(self.figura)
+        # Ejes y márgenes fijos: borrar los ejes es más barato que recrearlos, y
+        # tight_layout dibujaría la figura una vez más en cada gráfico
+        self.ejes = self.figura.subplots(1, 2, gridspec_kw={'width_ratios': [1, 1.5]})
+        self.figura.subplots_adjust(left=0.1, right=0.98, bottom=0.33, wspace=0.3)
+        self._titulo = self.figura.suptitle('')
+
+        # (clave, versión, títulos, formato) -> bytes; con capacidad 0 no se guarda nada
+        self.capacidad = capacidad
+        self._cache = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def renderizar(self, clave, totales, desglose, titulo_barras, titulo=None, formato='png'):
+        """Imagen (bytes en `formato`) del análisis, de la caché si los datos no han cambiado"""
+        llave = (clave, version(totales, desglose), titulo_barras, titulo, formato)
+        if llave in self._cache:
+            self._cache.move_to_end(llave)
+            self.aciertos += 1
+            return self._cache[llave]
+
+        self.fallos += 1
+        dibujar(*self.ejes, totales, desglose, titulo_barras)
+        self._titulo.set_text(titulo or '')
+        self.figura.subplots_adjust(top=0.8 if titulo else 0.9)
+        salida = io.BytesIO()
+        self.figura.savefig(salida, format=formato)
+        imagen = salida.getvalue()
+
+        if self.capacidad:
+            self._cache[llave] = imagen
+            if len(self._cache) > self.capacidad:
+                self._cache.popitem(last=False)
+        return imagen
+
+    def vaciar(self):
+        """Olvidar las imágenes guardadas"""
+        self._cache.clear()
+
+
+def mostrar_en(contenedor, png):
+    """Etiqueta de Tk con un PNG; la imagen de Tk se borra al destruir la etiqueta (p. ej. con su Toplevel)"""
+    import tkinter as tk
+    from tkinter import ttk
+
+    imagen = tk.PhotoImage(master=contenedor, data=base64.b64encode(png))
+    etiqueta = ttk.Label(contenedor, image=imagen)
+    etiqueta.imagen = imagen
+    etiqueta.bind('<Destroy>', lambda evento: imagen.tk.call('image', 'delete', imagen.name))
+    return etiqueta
+
+
+# Estado de cada proceso del pool de exportación
+_recetario = None
+_renderizador = None
+
+
+def _iniciar_proceso(ruta_db, ancho, alto, dpi):
+    global _recetario, _renderizador
+    from recetario_core import Recetario
+
+    _recetario = Recetario(ruta_db)
+    _renderizador = RenderizadorGraficos(ancho, alto, dpi, capacidad=0)
+
+
+def _exportar_bloque(receta_ids, directorio, formato):
+    """Escribir la tarjeta de cada receta del bloque; devuelve cuántas se escribieron"""
+    nombres = {receta[0]: receta[1] for receta in _recetario.obtener_recetas(receta_ids)}
+    for receta_id in receta_ids:
+        if receta_id not in nombres:
+            continue
+        totales, desglose = _recetario.calcular_valor_nutricional_receta(receta_id)
+        titulo = f"{nombres[receta_id]} ({totales['calorias']:.0f} kcal)"
+        imagen = _renderizador.renderizar(receta_id, totales, desglose, 'Calorías por Ingrediente', titulo, formato)
+        with open(os.path.join(directorio, f'receta_{receta_id}.{formato}'), 'wb') as archivo:
+            archivo.write(imagen)
+    return sum(1 for receta_id in receta_ids if receta_id in nombres)
+
+
+def exportar_tarjetas(ruta_db, receta_ids, directorio, formato='png', procesos=None, tam_bloque=100,
+                      ancho=8, alto=4, dpi=100, progreso=None):
+    """Exportar una tarjeta nutricional por receta a `directorio` con un pool de procesos
+
+    Las recetas se reparten en bloques de `tam_bloque`; `progreso(hechas, total)`
+    se llama al terminar cada bloque. Devuelve el número de tarjetas y el tiempo.
+    """
+    if formato not in ('png', 'svg'):
+        raise ValueError(f"Formato no soportado: {formato}")
+    os.makedirs(directorio, exist_ok=True)
+
+    inicio = time.perf_counter()
+    receta_ids = list(receta_ids)
+    bloques = [receta_ids[i:i + tam_bloque] for i in range(0, len(receta_ids), tam_bloque)]
+    tarjetas = 0
+    with ProcessPoolExecutor(procesos, initializer=_iniciar_proceso, initargs=(ruta_db, ancho, alto, dpi)) as pool:
+        futuros = [pool.submit(_exportar_bloque, bloque, directorio, formato) for bloque in bloques]
+        for hechos, futuro in enumerate(as_completed(futuros), 1):
+            tarjetas += futuro.result()
+            if progreso:
+                progreso(min(hechos * tam_bloque, len(receta_ids)), len(receta_ids))
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'tarjetas': tarjetas,
+        'segundos': round(segundos, 3),
+        'tarjetas_por_segundo': round(tarjetas / segundos, 1) if segundos else None,
+    }
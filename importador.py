@@ -0,0 +1,287 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+from recetario_core import NUTRIENTES
+
+
+def leer_registros(ruta):
+    """Leer registros de un archivo CSV o JSONL sin cargarlo entero en memoria"""
+    with open(ruta, encoding='utf-8', newline='') as archivo:
+        if ruta.lower().endswith('.csv'):
+            yield from csv.DictReader(archivo)
+        else:
+            for linea in archivo:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+class ValorInvalido(ValueError):
+    """Un campo de un registro falta o no vale (una cantidad '12g' o 'n/a', un nombre vacío)"""
+
+    def __init__(self, campo, valor, esperado='un número'):
+        super().__init__(f"{campo}: {valor!r} no es {esperado}")
+        self.campo = campo
+
+
+def _numero(valor, campo):
+    """Convertir un campo numérico de un registro; ValorInvalido si no se puede"""
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValorInvalido(campo, valor) from None
+
+
+def _nombre(valor, campo='nombre'):
+    """Nombre sin espacios alrededor; ValorInvalido si falta o está vacío"""
+    if not isinstance(valor, str) or not valor.strip():
+        raise ValorInvalido(campo, valor, 'un nombre')
+    return valor.strip()
+
+
+def ingredientes_de_registro(registro):
+    """Líneas de ingredientes de una receta: lista de dicts en JSONL o 'pollo:200;arroz:150' en CSV"""
+    ingredientes = registro.get('ingredientes') or []
+    if isinstance(ingredientes, str):
+        lineas = []
+        for parte in ingredientes.split(';'):
+            if not parte.strip():
+                continue
+            nombre, _, cantidad = parte.rpartition(':')
+            lineas.append({'nombre': nombre, 'cantidad': cantidad})
+    elif isinstance(ingredientes, list):
+        lineas = ingredientes
+    else:
+        raise ValorInvalido('ingredientes', ingredientes, 'una lista')
+    for linea in lineas:
+        if not isinstance(linea, dict):
+            raise ValorInvalido('ingredientes', linea, 'una línea con nombre y cantidad')
+    return [{'nombre': _nombre(linea.get('nombre')), 'cantidad': _numero(linea.get('cantidad'), 'cantidad')}
+            for linea in lineas]
+
+
+class InformeImportacion:
+    """Progreso y resultado de una importación"""
+
+    def __init__(self, ruta, omitidos=0):
+        self.ruta = ruta
+        self.omitidos = omitidos
+        self.procesados = 0
+        self.importados = 0
+        self.rechazados = 0
+        self.desconocidos = Counter()
+        # Registros rechazados por un valor no numérico, por campo
+        self.invalidos = Counter()
+        self.inicio = time.perf_counter()
+
+    @property
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    @property
+    def filas_por_segundo(self):
+        return self.procesados / self.segundos if self.segundos else 0.0
+
+    def como_dict(self):
+        return {
+            'ruta': self.ruta,
+            'reanudado_desde': self.omitidos,
+            'procesados': self.procesados,
+            'importados': self.importados,
+            'rechazados': self.rechazados,
+            'ingredientes_desconocidos': dict(self.desconocidos.most_common()),
+            'invalidos': dict(self.invalidos.most_common()),
+            'segundos': round(self.segundos, 3),
+            'filas_por_segundo': round(self.filas_por_segundo, 1),
+        }
+
+
+class ImportadorCatalogo:
+    """Importación masiva de ingredientes y recetas por bloques
+
+    Cada bloque se escribe con `executemany` dentro de una única transacción.
+    Los nombres de ingredientes se resuelven con una caché en memoria y, tras
+    cada bloque confirmado, se guarda un archivo de progreso junto al archivo
+    de origen para poder reanudar si la importación se interrumpe.
+    """
+
+    def __init__(self, conn, tam_bloque=5000, progreso=None):
+        self.conn = conn
+        self.tam_bloque = tam_bloque
+        self.progreso = progreso
+        self.ingrediente_ids = None
+
+    def cargar_cache_ingredientes(self):
+        """Cargar la caché nombre -> id de ingredientes"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT nombre, id FROM ingredientes')
+        self.ingrediente_ids = dict(cursor.fetchall())
+
+    def importar_ingredientes(self, ruta, reanudar=True):
+        """Importar ingredientes desde CSV/JSONL con columnas nombre y nutrientes"""
+        return self._importar_archivo(ruta, self.cargar_ingredientes, reanudar)
+
+    def importar_recetas(self, ruta, reanudar=True):
+        """Importar recetas desde CSV/JSONL con nombre, tipo_dieta, instrucciones e ingredientes"""
+        return self._importar_archivo(ruta, self.cargar_recetas, reanudar)
+
+    def cargar_ingredientes(self, registros, informe=None, al_confirmar=None):
+        """Insertar o actualizar ingredientes desde un iterable de dicts"""
+        informe = informe or InformeImportacion(None)
+        for bloque in self._bloques(registros):
+            filas = []
+            for registro in bloque:
+                try:
+                    filas.append((_nombre(registro.get('nombre')),)
+                                 + tuple(_numero(registro.get(n) or 0, n) for n in NUTRIENTES))
+                except ValorInvalido as error:
+                    # Como los ingredientes desconocidos de las recetas: se salta y se informa al final
+                    informe.invalidos[error.campo] += 1
+                    informe.rechazados += 1
+
+            with self.conn:
+                self.conn.executemany('''
+                INSERT INTO ingredientes (nombre, {columnas}) VALUES (?, {marcas})
+                ON CONFLICT(nombre) DO UPDATE SET {actualizar}
+                '''.format(
+                    columnas=', '.join(NUTRIENTES),
+                    marcas=', '.join(['?'] * len(NUTRIENTES)),
+                    actualizar=', '.join(f'{n} = excluded.{n}' for n in NUTRIENTES)
+                ), filas)
+            informe.procesados += len(bloque)
+            informe.importados += len(filas)
+            self._notificar(informe, al_confirmar)
+
+        # Los ids nuevos se leen de nuevo la próxima vez que se necesiten
+        self.ingrediente_ids = None
+        return informe
+
+    def cargar_recetas(self, registros, informe=None, al_confirmar=None):
+        """Insertar o actualizar recetas desde un iterable de dicts"""
+        informe = informe or InformeImportacion(None)
+        if self.ingrediente_ids is None:
+            self.cargar_cache_ingredientes()
+
+        cursor = self.conn.cursor()
+        for bloque in self._bloques(registros):
+            recetas = []
+            lineas_por_nombre = {}
+            for registro in bloque:
+                try:
+                    nombre = _nombre(registro.get('nombre'))
+                    lineas = ingredientes_de_registro(registro)
+                except ValorInvalido as error:
+                    informe.invalidos[error.campo] += 1
+                    informe.rechazados += 1
+                    continue
+                faltantes = [linea['nombre'] for linea in lineas if linea['nombre'] not in self.ingrediente_ids]
+                if faltantes:
+                    # Se rechaza la receta completa y se informa al final en bloque
+                    informe.desconocidos.update(faltantes)
+                    informe.rechazados += 1
+                    continue
+
+                recetas.append((nombre, registro.get('tipo_dieta') or 'Todos', registro.get('instrucciones') or ''))
+                lineas_por_nombre[nombre] = lineas
+
+            with self.conn:
+                if recetas:
+                    # Recetas que ya existían: sus líneas de ingredientes se reemplazan
+                    existentes = self._ids_recetas(cursor, lineas_por_nombre)
+                    cursor.executemany(
+                        'DELETE FROM receta_ingredientes WHERE receta_id = ?',
+                        [(receta_id,) for receta_id in existentes.values()]
+                    )
+
+                    # Actualizar en el sitio conserva el id de las recetas existentes
+                    cursor.executemany('''
+                    INSERT INTO recetas (nombre, tipo_dieta, instrucciones) VALUES (?, ?, ?)
+                    ON CONFLICT(nombre) DO UPDATE SET
+                        tipo_dieta = excluded.tipo_dieta,
+                        instrucciones = excluded.instrucciones
+                    ''', recetas)
+
+                    receta_ids = self._ids_recetas(cursor, lineas_por_nombre)
+                    cursor.executemany(
+                        '''
+                        INSERT INTO receta_ingredientes (receta_id, ingrediente_id, cantidad) VALUES (?, ?, ?)
+                        ON CONFLICT(receta_id, ingrediente_id) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+                        ''',
+                        [
+                            (receta_ids[nombre], self.ingrediente_ids[linea['nombre']], float(linea['cantidad']))
+                            for nombre, lineas in lineas_por_nombre.items()
+                            for linea in lineas
+                        ]
+                    )
+
+            informe.procesados += len(bloque)
+            informe.importados += len(recetas)
+            self._notificar(informe, al_confirmar)
+
+        return informe
+
+    def _importar_archivo(self, ruta, cargar, reanudar):
+        """Importar un archivo guardando el progreso tras cada bloque confirmado"""
+        ruta_estado = ruta + '.progreso'
+        firma = self._firma_archivo(ruta)
+
+        omitidos = 0
+        if reanudar and os.path.exists(ruta_estado):
+            with open(ruta_estado, encoding='utf-8') as archivo:
+                estado = json.load(archivo)
+            # Solo se reanuda si el archivo de origen no ha cambiado
+            if estado.get('firma') == firma:
+                omitidos = estado['procesados']
+
+        informe = InformeImportacion(ruta, omitidos)
+        registros = islice(leer_registros(ruta), omitidos, None)
+
+        def guardar_estado(informe):
+            with open(ruta_estado, 'w', encoding='utf-8') as archivo:
+                json.dump({'firma': firma, 'procesados': omitidos + informe.procesados}, archivo)
+
+        cargar(registros, informe, guardar_estado)
+
+        # Importación completa: ya no hace falta el archivo de progreso
+        if os.path.exists(ruta_estado):
+            os.remove(ruta_estado)
+        return informe
+
+    @staticmethod
+    def _ids_recetas(cursor, nombres):
+        """Ids de las recetas con los nombres indicados, consultando por bloques"""
+        receta_ids = {}
+        nombres = list(nombres)
+        for inicio in range(0, len(nombres), 900):
+            parte = nombres[inicio:inicio + 900]
+            cursor.execute(
+                'SELECT nombre, id FROM recetas WHERE nombre IN ({})'.format(','.join(['?'] * len(parte))),
+                parte
+            )
+            receta_ids.update(cursor.fetchall())
+        return receta_ids
+
+    def _bloques(self, registros):
+        """Agrupar un iterable en listas de `tam_bloque` elementos"""
+        registros = iter(registros)
+        while True:
+            bloque = list(islice(registros, self.tam_bloque))
+            if not bloque:
+                return
+            yield bloque
+
+    def _notificar(self, informe, al_confirmar):
+        """Guardar el progreso (si es un archivo) e informar al callback"""
+        if al_confirmar:
+            al_confirmar(informe)
+        if self.progreso:
+            self.progreso(informe)
+
+    @staticmethod
+    def _firma_archivo(ruta):
+        estado = os.stat(ruta)
+        return [os.path.abspath(ruta), estado.st_size, int(estado.st_mtime)]
+
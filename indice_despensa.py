@@ -0,0 +1,140 @@
+from collections import Counter
+
+
+class IndiceDespensa:
+    """Índice invertido ingrediente -> recetas para buscar por despensa"""
+
+    def __init__(self):
+        # Nombre de ingrediente -> id
+        self.ingrediente_ids = {}
+        # Id de ingrediente -> conjunto de recetas que lo usan
+        self.recetas_por_ingrediente = {}
+        # Id de receta -> conjunto de ingredientes distintos
+        self.ingredientes_por_receta = {}
+        # Id de receta -> tipo de dieta
+        self.dieta_por_receta = {}
+
+    @classmethod
+    def desde_conexion(cls, conn):
+        """Construir el índice leyendo las tablas de la base de datos"""
+        indice = cls()
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT id, nombre FROM ingredientes')
+        indice.ingrediente_ids = {nombre: ingrediente_id for ingrediente_id, nombre in cursor}
+
+        cursor.execute('SELECT id, tipo_dieta FROM recetas')
+        for receta_id, tipo_dieta in cursor:
+            indice.dieta_por_receta[receta_id] = tipo_dieta
+            indice.ingredientes_por_receta[receta_id] = set()
+
+        # Solo se indexan las líneas de recetas que existen
+        cursor.execute('''
+        SELECT ri.receta_id, ri.ingrediente_id
+        FROM receta_ingredientes ri
+        JOIN recetas r ON ri.receta_id = r.id
+        ''')
+        for receta_id, ingrediente_id in cursor:
+            indice.ingredientes_por_receta[receta_id].add(ingrediente_id)
+            indice.recetas_por_ingrediente.setdefault(ingrediente_id, set()).add(receta_id)
+
+        return indice
+
+    def agregar_ingrediente(self, nombre, ingrediente_id):
+        """Registrar (o actualizar) el id de un ingrediente"""
+        self.ingrediente_ids[nombre] = ingrediente_id
+
+    def agregar_receta(self, receta_id, tipo_dieta, ingrediente_ids):
+        """Indexar una receta nueva sin reconstruir el índice"""
+        self.eliminar_receta(receta_id)
+
+        ingredientes = set(ingrediente_ids)
+        self.dieta_por_receta[receta_id] = tipo_dieta
+        self.ingredientes_por_receta[receta_id] = ingredientes
+        for ingrediente_id in ingredientes:
+            self.recetas_por_ingrediente.setdefault(ingrediente_id, set()).add(receta_id)
+
+    def eliminar_receta(self, receta_id):
+        """Quitar una receta del índice"""
+        ingredientes = self.ingredientes_por_receta.pop(receta_id, None)
+        self.dieta_por_receta.pop(receta_id, None)
+        if not ingredientes:
+            return
+
+        for ingrediente_id in ingredientes:
+            recetas = self.recetas_por_ingrediente.get(ingrediente_id)
+            if recetas is None:
+                continue
+            recetas.discard(receta_id)
+            if not recetas:
+                del self.recetas_por_ingrediente[ingrediente_id]
+
+    def resolver_ingredientes(self, nombres):
+        """Convertir nombres de ingredientes en ids conocidos"""
+        return {self.ingrediente_ids[nombre] for nombre in nombres if nombre in self.ingrediente_ids}
+
+    def buscar(self, ingredientes_disponibles, tipo_dieta="Todos", max_faltantes=0):
+        """Buscar recetas a las que les faltan como máximo `max_faltantes` ingredientes
+
+        Devuelve tuplas (receta_id, ingredientes_en_despensa, total_ingredientes)
+        ordenadas por ingredientes faltantes y luego por cobertura.
+        """
+        despensa = self.resolver_ingredientes(ingredientes_disponibles)
+
+        # Contar, para cada receta, cuántos de sus ingredientes hay en la despensa
+        coincidencias = Counter()
+        for ingrediente_id in despensa:
+            coincidencias.update(self.recetas_por_ingrediente.get(ingrediente_id, ()))
+
+        resultados = []
+        for receta_id, en_despensa in coincidencias.items():
+            if tipo_dieta != 'Todos' and self.dieta_por_receta.get(receta_id) != tipo_dieta:
+                continue
+            total = len(self.ingredientes_por_receta[receta_id])
+            if total - en_despensa <= max_faltantes:
+                resultados.append((receta_id, en_despensa, total))
+
+        resultados.sort(key=lambda r: (r[2] - r[1], -r[1] / r[2], r[0]))
+        return resultados
+
+    def cobertura(self, ingredientes_disponibles, tipo_dieta="Todos"):
+        """{receta_id: fracción de sus ingredientes que hay en la despensa} (solo las que tienen alguno)"""
+        coincidencias = Counter()
+        for ingrediente_id in self.resolver_ingredientes(ingredientes_disponibles):
+            coincidencias.update(self.recetas_por_ingrediente.get(ingrediente_id, ()))
+
+        return {
+            receta_id: en_despensa / len(self.ingredientes_por_receta[receta_id])
+            for receta_id, en_despensa in coincidencias.items()
+            if tipo_dieta == 'Todos' or self.dieta_por_receta.get(receta_id) == tipo_dieta
+        }
+
+    def recetas_cocinables(self, ingredientes_disponibles, tipo_dieta="Todos"):
+        """Ids de las recetas que se pueden cocinar con la despensa completa"""
+        return sorted(receta_id for receta_id, _, _ in self.buscar(ingredientes_disponibles, tipo_dieta))
+
+    def recetas_con_sustitucion(self, ingredientes_disponibles, ingrediente, sustituto=None, tipo_dieta="Todos"):
+        """Ids de las recetas con `ingrediente` que se pueden cocinar si se sustituye
+
+        Solo se recorren las recetas que llevan el ingrediente (no todo el
+        catálogo). Sin `sustituto` basta con que haya de todo lo demás; con él,
+        el sustituto cuenta como disponible.
+        """
+        ingrediente_id = self.ingrediente_ids.get(ingrediente)
+        if ingrediente_id is None:
+            return []
+        despensa = self.resolver_ingredientes(ingredientes_disponibles)
+        if sustituto is not None:
+            if sustituto not in self.ingrediente_ids:
+                return []
+            despensa.add(self.ingrediente_ids[sustituto])
+        # Las recetas que ya se podían cocinar no cambian
+        if ingrediente_id in despensa:
+            return []
+
+        despensa.add(ingrediente_id)
+        return sorted(
+            receta_id for receta_id in self.recetas_por_ingrediente.get(ingrediente_id, ())
+            if (tipo_dieta == 'Todos' or self.dieta_por_receta.get(receta_id) == tipo_dieta)
+            and self.ingredientes_por_receta[receta_id] <= despensa
+        )
@@ -0,0 +1,359 @@
+"""Instantáneas columnares del catálogo para arrancar en frío sin leer SQLite fila a fila
+
+`exportar` escribe en un directorio un archivo .npy por columna:
+
+- ingredientes: ids, matriz de nutrientes y nombres (bytes UTF-8 + desplazamientos);
+- recetas: ids, código de dieta, número de ingredientes y totales nutricionales;
+- cantidades receta x ingrediente en CSR (filas por receta) y la traspuesta
+  ingrediente -> recetas, que es lo que recorre la búsqueda por despensa;
+
+y un manifiesto con el contador `version_datos` de la base de datos en el
+momento de exportar y la suma SHA-256 de cada archivo. `abrir` proyecta los
+archivos en memoria (mmap) y solo los usa si el contador no ha cambiado: en
+cuanto hay una escritura, el recetario vuelve a leer de SQLite.
+
+    python recetario_cli.py snapshot export
+    python recetario_cli.py snapshot check --verificar
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from migraciones import NUTRIENTES, version_datos
+from nutricion import MotorNutricional
+
+FORMATO = 1
+MANIFIESTO = 'manifiesto.json'
+
+# Filas leídas de SQLite por bloque al exportar
+TAM_BLOQUE = 1_000_000
+
+
+def _suma(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _leer_columnas(cursor, consulta, tipos):
+    """Ejecutar `consulta` y devolver una matriz NumPy por columna, leyendo por bloques"""
+    cursor.execute(consulta)
+    bloques = []
+    while True:
+        filas = cursor.fetchmany(TAM_BLOQUE)
+        if not filas:
+            break
+        bloques.append(np.array(filas, dtype=np.float64).reshape(len(filas), len(tipos)))
+    datos = np.concatenate(bloques) if bloques else np.zeros((0, len(tipos)))
+    return [np.ascontiguousarray(datos[:, i]).astype(tipo) for i, tipo in enumerate(tipos)]
+
+
+def _leer_matrices(conn):
+    """Leer todo el catálogo dentro de una transacción de lectura; devuelve (versión, dietas, matrices)"""
+    cursor = conn.cursor()
+    if not conn.in_transaction:
+        cursor.execute('BEGIN')
+    try:
+        version = version_datos(conn)
+
+        cursor.execute('SELECT id, nombre, {} FROM ingredientes ORDER BY id'.format(', '.join(NUTRIENTES)))
+        filas = cursor.fetchall()
+        ingrediente_ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+        nombres = [fila[1].encode('utf-8') for fila in filas]
+        # Los valores desconocidos (NULL) cuentan como cero, como en el motor nutricional
+        nutrientes = np.nan_to_num(np.array([fila[2:] for fila in filas], dtype=np.float64)).reshape(
+            len(filas), len(NUTRIENTES))
+
+        cursor.execute('SELECT id, tipo_dieta FROM recetas ORDER BY id')
+        filas = cursor.fetchall()
+        receta_ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+        dietas = sorted({fila[1] for fila in filas}, key=str)
+        codigo = {dieta: i for i, dieta in enumerate(dietas)}
+        codigos_dieta = np.array([codigo[fila[1]] for fila in filas], dtype=np.int16)
+
+        # Líneas por clave primaria (receta, ingrediente): ya vienen ordenadas y sin repetir
+        receta_linea, ingrediente_linea, cantidades = _leer_columnas(cursor, '''
+        SELECT ri.receta_id, ri.ingrediente_id, ri.cantidad
+        FROM receta_ingredientes ri
+        JOIN recetas r ON r.id = ri.receta_id
+        ORDER BY ri.receta_id, ri.ingrediente_id
+        ''', (np.int64, np.int64, np.float64))
+
+        nutricion_ids, *totales = _leer_columnas(cursor, '''
+        SELECT n.receta_id, {}
+        FROM receta_nutricion n
+        JOIN recetas r ON r.id = n.receta_id
+        ORDER BY n.receta_id
+        '''.format(', '.join(f'n.{nutriente}' for nutriente in NUTRIENTES)), (np.int64,) + (np.float64,) * len(NUTRIENTES))
+    finally:
+        conn.rollback()
+
+    filas_linea = np.searchsorted(receta_ids, receta_linea)
+    # Un ingrediente borrado sigue contando para la despensa (la receta no se puede hacer), pero no tiene nutrientes
+    num_ingredientes = np.bincount(filas_linea, minlength=len(receta_ids)).astype(np.int32)
+    columnas = np.minimum(np.searchsorted(ingrediente_ids, ingrediente_linea), max(len(ingrediente_ids) - 1, 0))
+    existe = ingrediente_ids[columnas] == ingrediente_linea if len(ingrediente_ids) else np.zeros(0, dtype=bool)
+    filas_linea, columnas, cantidades = filas_linea[existe], columnas[existe].astype(np.int32), cantidades[existe]
+    offsets = np.zeros(len(receta_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(filas_linea, minlength=len(receta_ids)), out=offsets[1:])
+
+    # Traspuesta: para cada ingrediente, las filas de las recetas que lo usan (ordenadas)
+    orden = np.argsort(columnas, kind='stable')
+    offsets_ingredientes = np.zeros(len(ingrediente_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(columnas, minlength=len(ingrediente_ids)), out=offsets_ingredientes[1:])
+
+    nombres_offsets = np.zeros(len(nombres) + 1, dtype=np.int64)
+    np.cumsum([len(nombre) for nombre in nombres], out=nombres_offsets[1:])
+
+    matrices = {
+        'ingrediente_ids': ingrediente_ids,
+        'ingrediente_nutrientes': nutrientes,
+        'ingrediente_nombres': np.frombuffer(b''.join(nombres), dtype=np.uint8),
+        'ingrediente_nombres_offsets': nombres_offsets,
+        'receta_ids': receta_ids,
+        'receta_dietas': codigos_dieta,
+        'receta_num_ingredientes': num_ingredientes,
+        'receta_offsets': offsets,
+        'receta_columnas': columnas,
+        'receta_cantidades': np.nan_to_num(cantidades),
+        'ingrediente_offsets': offsets_ingredientes,
+        'ingrediente_recetas': filas_linea[orden].astype(np.int32),
+        'nutricion_ids': nutricion_ids,
+        'nutricion_totales': np.column_stack(totales) if totales else np.zeros((0, len(NUTRIENTES))),
+    }
+    return version, dietas, matrices
+
+
+def exportar(conn, directorio):
+    """Escribir la instantánea del catálogo en `directorio` (se sustituye entera) y devolver su manifiesto
+
+    Se escribe primero en un directorio temporal, así que una exportación a
+    medias nunca deja una instantánea que parezca válida.
+    """
+    inicio = time.perf_counter()
+    version, dietas, matrices = _leer_matrices(conn)
+
+    temporal = directorio.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    archivos = {}
+    for nombre, matriz in matrices.items():
+        ruta = os.path.join(temporal, nombre + '.npy')
+        np.save(ruta, matriz)
+        archivos[nombre] = {'sha256': _suma(ruta), 'bytes': os.path.getsize(ruta)}
+
+    manifiesto = {
+        'formato': FORMATO,
+        'version_datos': version,
+        'creada': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ingredientes': len(matrices['ingrediente_ids']),
+        'recetas': len(matrices['receta_ids']),
+        'lineas': len(matrices['receta_columnas']),
+        'dietas': dietas,
+        'archivos': archivos,
+    }
+    # La suma global liga el contenido al estado de la base de datos del que salió
+    manifiesto['suma'] = hashlib.sha256(json.dumps(
+        [version, {nombre: datos['sha256'] for nombre, datos in archivos.items()}], sort_keys=True
+    ).encode('utf-8')).hexdigest()
+    with open(os.path.join(temporal, MANIFIESTO), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.replace(temporal, directorio)
+    manifiesto['segundos'] = round(time.perf_counter() - inicio, 3)
+    return manifiesto
+
+
+def leer_manifiesto(directorio):
+    """Manifiesto de la instantánea, o None si no hay"""
+    try:
+        with open(os.path.join(directorio, MANIFIESTO), encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def comprobar(directorio, conn, verificar=False):
+    """Motivo por el que la instantánea no se puede usar, o None si está al día
+
+    Con `verificar` se recalculan además las sumas de todos los archivos (lee
+    la instantánea entera; la comprobación normal solo compara el contador).
+    """
+    manifiesto = leer_manifiesto(directorio)
+    if manifiesto is None:
+        return 'no existe'
+    if manifiesto.get('formato') != FORMATO:
+        return f"formato {manifiesto.get('formato')} (se espera {FORMATO})"
+    version = version_datos(conn)
+    if manifiesto['version_datos'] != version:
+        return f"desfasada (exportada con la versión de datos {manifiesto['version_datos']}, la actual es {version})"
+    for nombre, datos in manifiesto['archivos'].items():
+        ruta = os.path.join(directorio, nombre + '.npy')
+        if not os.path.exists(ruta) or os.path.getsize(ruta) != datos['bytes']:
+            return f"falta o está incompleto {nombre}.npy"
+        if verificar and _suma(ruta) != datos['sha256']:
+            return f"la suma de {nombre}.npy no coincide"
+    return None
+
+
+def abrir(directorio, conn, verificar=False):
+    """Instantánea proyectada en memoria si está al día con `conn`; si no, None"""
+    if comprobar(directorio, conn, verificar) is not None:
+        return None
+    return Instantanea(directorio, leer_manifiesto(directorio))
+
+
+class Instantanea:
+    """Matrices de una instantánea abiertas con mmap (solo lectura)"""
+
+    def __init__(self, directorio, manifiesto):
+        self.directorio = directorio
+        self.manifiesto = manifiesto
+        self.dietas = manifiesto['dietas']
+        for nombre in manifiesto['archivos']:
+            setattr(self, nombre, np.load(os.path.join(directorio, nombre + '.npy'), mmap_mode='r'))
+
+    @property
+    def nombres(self):
+        """Nombres de los ingredientes, en el orden de `ingrediente_ids`"""
+        datos = self.ingrediente_nombres.tobytes()
+        offsets = self.ingrediente_nombres_offsets.tolist()
+        return [datos[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+    def motor_nutricional(self):
+        """Motor nutricional sobre las matrices proyectadas"""
+        return MotorNutricional(self.ingrediente_ids, self.nombres, self.ingrediente_nutrientes, self.receta_ids,
+                                self.receta_offsets, self.receta_columnas, self.receta_cantidades)
+
+    def planificador(self):
+        """Planificador con los totales materializados de cada receta"""
+        from planificador import Planificador
+
+        filas = np.searchsorted(self.receta_ids, self.nutricion_ids)
+        dietas = np.array(self.dietas, dtype=object)[self.receta_dietas[filas]]
+        return Planificador(np.asarray(self.nutricion_ids), dietas, self.nutricion_totales)
+
+    def indice(self):
+        """Índice de despensa sobre las listas ingrediente -> recetas"""
+        return IndiceColumnar(self)
+
+
+class ConjuntosReceta:
+    """{receta_id: conjunto de ingredientes} calculado al pedirlo a partir de la CSR"""
+
+    def __init__(self, receta_ids, offsets, columnas, ingrediente_ids):
+        self._receta_ids = receta_ids
+        self._offsets = offsets
+        self._columnas = columnas
+        self._ingrediente_ids = ingrediente_ids
+
+    def _fila(self, receta_id):
+        fila = int(np.searchsorted(self._receta_ids, receta_id))
+        return fila if fila < len(self._receta_ids) and self._receta_ids[fila] == receta_id else None
+
+    def __contains__(self, receta_id):
+        return self._fila(receta_id) is not None
+
+    def __getitem__(self, receta_id):
+        fila = self._fila(receta_id)
+        if fila is None:
+            raise KeyError(receta_id)
+        columnas = self._columnas[self._offsets[fila]:self._offsets[fila + 1]]
+        return set(self._ingrediente_ids[columnas].tolist())
+
+    def __len__(self):
+        return len(self._receta_ids)
+
+
+class IndiceColumnar:
+    """Búsqueda por despensa de solo lectura sobre una instantánea
+
+    Misma interfaz de consulta que `IndiceDespensa`, pero las coincidencias por
+    receta se cuentan con bincount sobre las listas ingrediente -> recetas en
+    lugar de con Counter sobre conjuntos, y no hay que construir nada por receta.
+    """
+
+    def __init__(self, instantanea):
+        self.ingrediente_ids = dict(zip(instantanea.nombres, instantanea.ingrediente_ids.tolist()))
+        self._columna = {ingrediente_id: columna for columna, ingrediente_id in enumerate(instantanea.ingrediente_ids.tolist())}
+        self._receta_ids = instantanea.receta_ids
+        self._dietas = instantanea.dietas
+        self._codigos_dieta = instantanea.receta_dietas
+        self._totales = instantanea.receta_num_ingredientes
+        self._offsets = instantanea.ingrediente_offsets
+        self._recetas = instantanea.ingrediente_recetas
+        self.ingredientes_por_receta = ConjuntosReceta(instantanea.receta_ids, instantanea.receta_offsets,
+                                                       instantanea.receta_columnas, instantanea.ingrediente_ids)
+
+    def resolver_ingredientes(self, nombres):
+        """Convertir nombres de ingredientes en ids conocidos"""
+        return {self.ingrediente_ids[nombre] for nombre in nombres if nombre in self.ingrediente_ids}
+
+    def _filas(self, ingrediente_id):
+        columna = self._columna.get(ingrediente_id)
+        if columna is None:
+            return self._recetas[:0]
+        return self._recetas[self._offsets[columna]:self._offsets[columna + 1]]
+
+    def _coincidencias(self, despensa, tipo_dieta):
+        """(filas de receta, ingredientes en despensa, total) de las recetas con algún ingrediente disponible"""
+        listas = [self._filas(ingrediente_id) for ingrediente_id in despensa]
+        if not listas:
+            vacio = np.zeros(0, dtype=np.int64)
+            return vacio, vacio, vacio
+        cuentas = np.bincount(np.concatenate(listas), minlength=len(self._receta_ids))
+        filas = np.flatnonzero(cuentas)
+        if tipo_dieta != 'Todos':
+            codigo = self._dietas.index(tipo_dieta) if tipo_dieta in self._dietas else -1
+            filas = filas[self._codigos_dieta[filas] == codigo]
+        return filas, cuentas[filas], self._totales[filas]
+
+    def buscar(self, ingredientes_disponibles, tipo_dieta="Todos", max_faltantes=0):
+        """Buscar recetas a las que les faltan como máximo `max_faltantes` ingredientes
+
+        Devuelve tuplas (receta_id, ingredientes_en_despensa, total_ingredientes)
+        ordenadas por ingredientes faltantes y luego por cobertura.
+        """
+        filas, en_despensa, totales = self._coincidencias(self.resolver_ingredientes(ingredientes_disponibles), tipo_dieta)
+        validas = totales - en_despensa <= max_faltantes
+        filas, en_despensa, totales = filas[validas], en_despensa[validas], totales[validas]
+
+        receta_ids = self._receta_ids[filas]
+        orden = np.lexsort((receta_ids, -(en_despensa / totales), totales - en_despensa))
+        return list(zip(receta_ids[orden].tolist(), en_despensa[orden].tolist(), totales[orden].tolist()))
+
+    def cobertura(self, ingredientes_disponibles, tipo_dieta="Todos"):
+        """{receta_id: fracción de sus ingredientes que hay en la despensa} (solo las que tienen alguno)"""
+        filas, en_despensa, totales = self._coincidencias(self.resolver_ingredientes(ingredientes_disponibles), tipo_dieta)
+        return dict(zip(self._receta_ids[filas].tolist(), (en_despensa / totales).tolist()))
+
+    def recetas_cocinables(self, ingredientes_disponibles, tipo_dieta="Todos"):
+        """Ids de las recetas que se pueden cocinar con la despensa completa"""
+        filas, en_despensa, totales = self._coincidencias(self.resolver_ingredientes(ingredientes_disponibles), tipo_dieta)
+        return self._receta_ids[filas[en_despensa == totales]].tolist()
+
+    def recetas_con_sustitucion(self, ingredientes_disponibles, ingrediente, sustituto=None, tipo_dieta="Todos"):
+        """Ids de las recetas con `ingrediente` que se pueden cocinar si se sustituye"""
+        ingrediente_id = self.ingrediente_ids.get(ingrediente)
+        if ingrediente_id is None:
+            return []
+        despensa = self.resolver_ingredientes(ingredientes_disponibles)
+        if sustituto is not None:
+            if sustituto not in self.ingrediente_ids:
+                return []
+            despensa.add(self.ingrediente_ids[sustituto])
+        # Las recetas que ya se podían cocinar no cambian
+        if ingrediente_id in despensa:
+            return []
+
+        despensa.add(ingrediente_id)
+        filas, en_despensa, totales = self._coincidencias(despensa, tipo_dieta)
+        con_ingrediente = np.isin(filas, self._filas(ingrediente_id))
+        return self._receta_ids[filas[con_ingrediente & (en_despensa == totales)]].tolist()
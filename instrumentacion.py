@@ -0,0 +1,365 @@
+"""Métricas de latencia de consultas SQLite y de operaciones del recetario
+
+`conectar` abre las conexiones con `ConexionInstrumentada`, cuyos cursores
+miden cada sentencia (tiempo de ejecución, tiempo de lectura y filas), y los
+métodos públicos de `Recetario` se miden con el decorador `operacion`. Todo se
+acumula en el registro global `METRICAS`, que es seguro entre hilos y se
+exporta como JSON o en formato de texto de Prometheus.
+
+El registro de consultas lentas es opcional (`activar_consultas_lentas` o la
+variable de entorno RECETARIO_CONSULTAS_LENTAS_MS): guarda la sentencia con
+sus parámetros y la salida de EXPLAIN QUERY PLAN de las que superan el umbral.
+Las filas se cuentan al leerlas con fetchone/fetchmany/fetchall y, en
+escrituras, con `rowcount`; las que se recorren iterando el cursor no se cuentan.
+"""
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Límites superiores (segundos) de las cubetas de los histogramas
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ESPACIOS = re.compile(r'\s+')
+_LISTA_PARAMETROS = re.compile(r'\?(?:\s*,\s*\?)+')
+_CON_PLAN = re.compile(r'\s*(SELECT|WITH|INSERT|REPLACE|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def normalizar_sentencia(sql):
+    """Clave estable de una sentencia: espacios colapsados y listas IN (?, ?, ...) reducidas"""
+    return _LISTA_PARAMETROS.sub('?, ...', _ESPACIOS.sub(' ', sql).strip())
+
+
+class Histograma:
+    """Histograma acumulado de latencias con cubetas fijas"""
+
+    def __init__(self, limites=LIMITES_SEGUNDOS):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)
+        self.cuenta = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        self.cubetas[bisect_left(self.limites, segundos)] += 1
+        self.cuenta += 1
+        self.suma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def cuantil(self, q):
+        """Cota superior de la cubeta que contiene el cuantil `q` (0-1)"""
+        if not self.cuenta:
+            return 0.0
+        objetivo = q * self.cuenta
+        acumulado = 0
+        for limite, cantidad in zip(self.limites, self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def como_dict(self):
+        return {
+            'llamadas': self.cuenta,
+            'total_ms': round(self.suma * 1000, 3),
+            'media_ms': round(self.suma / self.cuenta * 1000, 3) if self.cuenta else 0.0,
+            'p50_ms': round(self.cuantil(0.5) * 1000, 3),
+            'p99_ms': round(self.cuantil(0.99) * 1000, 3),
+            'max_ms': round(self.maximo * 1000, 3),
+            'cubetas': {str(limite): cantidad for limite, cantidad in zip(self.limites + ('+Inf',), self.cubetas)},
+        }
+
+
+class Estadistica:
+    """Latencias, filas y tiempo de lectura acumulados de una operación o sentencia"""
+
+    def __init__(self):
+        self.histograma = Histograma()
+        self.filas = 0
+        self.lectura = 0.0
+        self.errores = 0
+
+    def como_dict(self):
+        datos = self.histograma.como_dict()
+        datos.update(filas=self.filas, lectura_ms=round(self.lectura * 1000, 3), errores=self.errores)
+        return datos
+
+
+class RegistroConsultasLentas:
+    """Sentencias que superan `umbral_ms`, con su plan de ejecución
+
+    Se conservan las `maximo` más recientes en memoria y, si se indica
+    `ruta`, se añaden además a ese archivo como líneas JSON.
+    """
+
+    def __init__(self, umbral_ms=100, ruta=None, maximo=100):
+        self.umbral = umbral_ms / 1000
+        self.ruta = ruta
+        self.entradas = deque(maxlen=maximo)
+        self._bloqueo = threading.Lock()
+
+    def registrar(self, conn, sql, parametros, segundos, expandida=None):
+        entrada = {
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ms': round(segundos * 1000, 3),
+            'sentencia': normalizar_sentencia(sql),
+            'expandida': expandida,
+            'plan': self.plan(conn, sql, parametros),
+        }
+        with self._bloqueo:
+            self.entradas.append(entrada)
+            if self.ruta:
+                with open(self.ruta, 'a', encoding='utf-8') as archivo:
+                    archivo.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+
+    @staticmethod
+    def plan(conn, sql, parametros):
+        """Líneas de EXPLAIN QUERY PLAN, sangradas según su nivel en el árbol"""
+        if not _CON_PLAN.match(sql):
+            return []
+        try:
+            # Cursor sin instrumentar para no medir (ni registrar) el propio EXPLAIN
+            cursor = sqlite3.Connection.cursor(conn)
+            filas = cursor.execute('EXPLAIN QUERY PLAN ' + sql, parametros).fetchall()
+        except sqlite3.Error as error:
+            return [f'(sin plan: {error})']
+
+        niveles = {0: -1}
+        lineas = []
+        for nodo, padre, _, detalle in filas:
+            niveles[nodo] = niveles.get(padre, -1) + 1
+            lineas.append('  ' * niveles[nodo] + detalle)
+        return lineas
+
+
+class Metricas:
+    """Registro de métricas compartido por todas las conexiones y hilos"""
+
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self.operaciones = {}
+        self.sentencias = {}
+        self.consultas_lentas = None
+
+    def _estadistica(self, tabla, clave):
+        estadistica = tabla.get(clave)
+        if estadistica is None:
+            estadistica = tabla[clave] = Estadistica()
+        return estadistica
+
+    def registrar_operacion(self, nombre, segundos, filas=None, error=False):
+        with self._bloqueo:
+            estadistica = self._estadistica(self.operaciones, nombre)
+            estadistica.histograma.observar(segundos)
+            estadistica.filas += filas or 0
+            estadistica.errores += error
+
+    def registrar_sentencia(self, clave, segundos, filas=None, error=False):
+        """`clave` es la sentencia ya pasada por `normalizar_sentencia`"""
+        with self._bloqueo:
+            estadistica = self._estadistica(self.sentencias, clave)
+            estadistica.histograma.observar(segundos)
+            estadistica.filas += filas or 0
+            estadistica.errores += error
+
+    def registrar_lectura(self, clave, segundos, filas):
+        """Tiempo y filas de fetch* de una sentencia ya registrada"""
+        with self._bloqueo:
+            estadistica = self._estadistica(self.sentencias, clave)
+            estadistica.lectura += segundos
+            estadistica.filas += filas
+
+    def reiniciar(self):
+        with self._bloqueo:
+            self.operaciones.clear()
+            self.sentencias.clear()
+        if self.consultas_lentas is not None:
+            self.consultas_lentas.entradas.clear()
+
+    def como_dict(self):
+        with self._bloqueo:
+            datos = {
+                'operaciones': {nombre: e.como_dict() for nombre, e in sorted(self.operaciones.items())},
+                'sentencias': {sql: e.como_dict() for sql, e in sorted(self.sentencias.items())},
+            }
+        if self.consultas_lentas is not None:
+            datos['consultas_lentas'] = list(self.consultas_lentas.entradas)
+        return datos
+
+    def como_json(self):
+        return json.dumps(self.como_dict(), ensure_ascii=False, indent=2)
+
+    def como_prometheus(self):
+        """Texto en el formato de exposición de Prometheus"""
+        with self._bloqueo:
+            grupos = [
+                ('recetario_operacion', 'operacion', "Operaciones del recetario", dict(self.operaciones)),
+                ('recetario_sentencia', 'sentencia', "Sentencias SQLite", dict(self.sentencias)),
+            ]
+            lineas = []
+            for prefijo, etiqueta, ayuda, tabla in grupos:
+                lineas.append(f'# HELP {prefijo}_segundos Latencia: {ayuda}')
+                lineas.append(f'# TYPE {prefijo}_segundos histogram')
+                for clave, estadistica in sorted(tabla.items()):
+                    nombre = f'{etiqueta}="{_escapar(clave)}"'
+                    histograma = estadistica.histograma
+                    acumulado = 0
+                    for limite, cantidad in zip(histograma.limites + ('+Inf',), histograma.cubetas):
+                        acumulado += cantidad
+                        lineas.append(f'{prefijo}_segundos_bucket{{{nombre},le="{limite}"}} {acumulado}')
+                    lineas.append(f'{prefijo}_segundos_sum{{{nombre}}} {histograma.suma}')
+                    lineas.append(f'{prefijo}_segundos_count{{{nombre}}} {histograma.cuenta}')
+
+                for sufijo, atributo, descripcion in (('filas_total', 'filas', "Filas devueltas o modificadas"),
+                                                      ('errores_total', 'errores', "Llamadas con error")):
+                    lineas.append(f'# HELP {prefijo}_{sufijo} {descripcion}: {ayuda}')
+                    lineas.append(f'# TYPE {prefijo}_{sufijo} counter')
+                    for clave, estadistica in sorted(tabla.items()):
+                        lineas.append(f'{prefijo}_{sufijo}{{{etiqueta}="{_escapar(clave)}"}} '
+                                      f'{getattr(estadistica, atributo)}')
+        return '\n'.join(lineas) + '\n'
+
+    def guardar(self, ruta):
+        """Escribir las métricas en `ruta`: Prometheus si termina en .prom, JSON en otro caso"""
+        texto = self.como_prometheus() if ruta.endswith('.prom') else self.como_json()
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICAS = Metricas()
+
+
+def activar_consultas_lentas(umbral_ms=100, ruta=None):
+    """Registrar las sentencias más lentas que `umbral_ms` de las conexiones que se abran después"""
+    METRICAS.consultas_lentas = RegistroConsultasLentas(umbral_ms, ruta)
+    return METRICAS.consultas_lentas
+
+
+def configurar_desde_entorno():
+    """Activar el registro de consultas lentas si lo pide RECETARIO_CONSULTAS_LENTAS_MS
+
+    Devuelve la ruta de RECETARIO_METRICAS (donde guardar las métricas al
+    salir) o None.
+    """
+    umbral = os.environ.get('RECETARIO_CONSULTAS_LENTAS_MS')
+    if umbral:
+        activar_consultas_lentas(float(umbral), os.environ.get('RECETARIO_CONSULTAS_LENTAS_RUTA'))
+    return os.environ.get('RECETARIO_METRICAS')
+
+
+def operacion(nombre, filas=None):
+    """Decorador que mide una operación; `filas(resultado)` indica cuántas filas produjo
+
+    Sin `filas` se usa len(resultado) si el resultado es una lista o un dict.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception:
+                METRICAS.registrar_operacion(nombre, time.perf_counter() - inicio, error=True)
+                raise
+            duracion = time.perf_counter() - inicio
+
+            if filas is not None:
+                cantidad = filas(resultado)
+            elif isinstance(resultado, (list, dict)):
+                cantidad = len(resultado)
+            else:
+                cantidad = None
+            METRICAS.registrar_operacion(nombre, duracion, cantidad)
+            return resultado
+        return medida
+    return decorador
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide cada sentencia y las filas que se leen de ella"""
+
+    _clave = None
+
+    def execute(self, sql, parametros=()):
+        conn = self.connection
+        conn._traza = None
+        clave = normalizar_sentencia(sql)
+        inicio = time.perf_counter()
+        try:
+            resultado = super().execute(sql, parametros)
+        except sqlite3.Error:
+            METRICAS.registrar_sentencia(clave, time.perf_counter() - inicio, error=True)
+            raise
+        duracion = time.perf_counter() - inicio
+
+        self._clave = clave
+        METRICAS.registrar_sentencia(clave, duracion, self.rowcount if self.rowcount > 0 else None)
+        lentas = METRICAS.consultas_lentas
+        if lentas is not None and duracion >= lentas.umbral:
+            lentas.registrar(conn, sql, parametros, duracion, conn._traza)
+        return resultado
+
+    def executemany(self, sql, secuencia):
+        clave = normalizar_sentencia(sql)
+        inicio = time.perf_counter()
+        try:
+            resultado = super().executemany(sql, secuencia)
+        except sqlite3.Error:
+            METRICAS.registrar_sentencia(clave, time.perf_counter() - inicio, error=True)
+            raise
+        self._clave = None
+        METRICAS.registrar_sentencia(clave, time.perf_counter() - inicio, self.rowcount if self.rowcount > 0 else None)
+        return resultado
+
+    def _leer(self, lectura, *args):
+        inicio = time.perf_counter()
+        filas = lectura(*args)
+        if self._clave is not None:
+            cantidad = len(filas) if isinstance(filas, list) else int(filas is not None)
+            METRICAS.registrar_lectura(self._clave, time.perf_counter() - inicio, cantidad)
+        return filas
+
+    def fetchone(self):
+        return self._leer(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._leer(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._leer(super().fetchall)
+
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión cuyos cursores (también los de `execute`) están instrumentados"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traza = None
+        # La traza solo hace falta para anotar con sus parámetros las consultas lentas
+        if METRICAS.consultas_lentas is not None:
+            self.set_trace_callback(self._trazar)
+
+    def _trazar(self, sql):
+        # Las sentencias de triggers llegan como "-- TRIGGER ..."; interesa la de nivel superior
+        if self._traza is None and not sql.startswith('--'):
+            self._traza = sql
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
@@ -0,0 +1,131 @@
+"""Mantenimiento de la base de datos del recetario
+
+Recolecta filas huérfanas, comprueba las claves foráneas y el índice de texto,
+actualiza las estadísticas del planificador (ANALYZE) y devuelve al sistema el
+espacio libre (VACUUM incremental). El informe incluye el espacio recuperado y
+la latencia de las consultas representativas antes y después.
+"""
+import os
+import sqlite3
+import time
+
+from migraciones import _recalcular_nutricion, informe_consultas
+
+
+def tamano_en_disco(conn):
+    """Páginas usadas y libres del archivo principal y tamaño (bytes) del archivo y del WAL"""
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA page_size')
+    tamano_pagina = cursor.fetchone()[0]
+    cursor.execute('PRAGMA page_count')
+    paginas = cursor.fetchone()[0]
+    cursor.execute('PRAGMA freelist_count')
+    libres = cursor.fetchone()[0]
+
+    cursor.execute('PRAGMA database_list')
+    ruta = next((fila[2] for fila in cursor.fetchall() if fila[1] == 'main'), '')
+    wal = ruta + '-wal'
+    return {
+        'paginas': paginas,
+        'paginas_libres': libres,
+        'bytes': paginas * tamano_pagina,
+        'bytes_wal': os.path.getsize(wal) if ruta and os.path.exists(wal) else 0,
+    }
+
+
+def recolectar_huerfanos(conn):
+    """Borrar líneas y totales nutricionales sin receta (o sin ingrediente) y completar los que faltan"""
+    cursor = conn.cursor()
+    recolectados = {}
+    with conn:
+        cursor.execute('DELETE FROM receta_ingredientes WHERE receta_id NOT IN (SELECT id FROM recetas)')
+        recolectados['lineas_sin_receta'] = cursor.rowcount
+        cursor.execute('DELETE FROM receta_ingredientes WHERE ingrediente_id NOT IN (SELECT id FROM ingredientes)')
+        recolectados['lineas_sin_ingrediente'] = cursor.rowcount
+        cursor.execute('DELETE FROM receta_nutricion WHERE receta_id NOT IN (SELECT id FROM recetas)')
+        recolectados['nutricion_sin_receta'] = cursor.rowcount
+        cursor.execute(_recalcular_nutricion('r.id NOT IN (SELECT receta_id FROM receta_nutricion)'))
+        recolectados['nutricion_recalculada'] = cursor.rowcount
+    return recolectados
+
+
+def comprobar_claves_foraneas(conn):
+    """Filas que incumplen una clave foránea: (tabla, rowid, tabla referenciada)"""
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA foreign_key_check')
+    return [(tabla, rowid, padre) for tabla, rowid, padre, _ in cursor.fetchall()]
+
+
+def comprobar_indice_texto(conn):
+    """Comprobar que recetas_fts coincide con la tabla recetas; si no, reconstruirlo
+
+    Devuelve True si hubo que reconstruirlo.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO recetas_fts (recetas_fts, rank) VALUES ('integrity-check', 1)")
+        conn.commit()
+        return False
+    except sqlite3.DatabaseError:
+        conn.rollback()
+
+    with conn:
+        cursor.execute("INSERT INTO recetas_fts (recetas_fts) VALUES ('rebuild')")
+    return True
+
+
+def compactar(conn):
+    """Devolver al sistema las páginas libres
+
+    La primera vez se pasa la base de datos a auto_vacuum incremental con un
+    VACUUM completo (reescribe el archivo); las siguientes basta con
+    `incremental_vacuum`, que solo mueve las páginas libres al final.
+    """
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA auto_vacuum')
+    if cursor.fetchone()[0] != 2:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+        modo = 'vacuum_completo'
+    else:
+        cursor.execute('PRAGMA incremental_vacuum')
+        cursor.fetchall()
+        modo = 'incremental'
+
+    # Vaciar el WAL en el archivo principal y truncarlo
+    cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    cursor.fetchall()
+    return modo
+
+
+def ejecutar_mantenimiento(conn, vacuum=True):
+    """Ejecutar todas las tareas y devolver el informe"""
+    inicio = time.perf_counter()
+    inicial = tamano_en_disco(conn)
+    latencias_antes = informe_consultas(conn)
+
+    informe = {'huerfanos': recolectar_huerfanos(conn)}
+    informe['claves_foraneas_incumplidas'] = comprobar_claves_foraneas(conn)
+    informe['indice_texto_reconstruido'] = comprobar_indice_texto(conn)
+
+    conn.execute('ANALYZE')
+    conn.commit()
+    # ANALYZE escribe sqlite_stat1 (en una base nueva, el archivo crece): lo recuperado se mide desde aquí
+    antes = tamano_en_disco(conn)
+    informe['compactacion'] = compactar(conn) if vacuum else None
+
+    despues = tamano_en_disco(conn)
+    total = lambda tamano: tamano['bytes'] + tamano['bytes_wal']
+    informe['espacio'] = {
+        'inicial': inicial,
+        'antes': antes,
+        'despues': despues,
+        'bytes_analisis': total(antes) - total(inicial),
+        'bytes_recuperados': max(total(antes) - total(despues), 0),
+    }
+    informe['latencias'] = [
+        {'consulta': previo['consulta'], 'antes_ms': round(previo['ms'], 3), 'despues_ms': round(posterior['ms'], 3)}
+        for previo, posterior in zip(latencias_antes, informe_consultas(conn))
+    ]
+    informe['segundos'] = round(time.perf_counter() - inicio, 3)
+    return informe
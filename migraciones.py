@@ -0,0 +1,441 @@
+import sqlite3
+import time
+
+# Columnas de nutrientes de la tabla ingredientes (valores por 100 g)
+NUTRIENTES = ('calorias', 'proteinas', 'carbohidratos', 'grasas', 'fibra', 'sodio')
+
+
+def configurar_conexion(conn):
+    """Ajustar los pragmas de rendimiento de una conexión
+
+    Estos pragmas no se guardan en el archivo de la base de datos, así que se
+    aplican en cada conexión; el modo WAL, que sí es persistente, lo activa una
+    migración.
+    """
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA synchronous = NORMAL')  # Seguro en modo WAL y mucho más rápido
+    cursor.execute('PRAGMA cache_size = -65536')  # 64 MiB de caché de páginas
+    cursor.execute('PRAGMA mmap_size = 268435456')  # Hasta 256 MiB mapeados en memoria
+    cursor.execute('PRAGMA temp_store = MEMORY')
+    # Que INSERT OR REPLACE dispare los triggers de borrado de la fila reemplazada
+    cursor.execute('PRAGMA recursive_triggers = ON')
+    # Rechazar líneas de receta que apunten a recetas o ingredientes inexistentes
+    cursor.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def _esquema_base(cursor):
+    """Tablas originales del recetario"""
+    # Tabla de ingredientes
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ingredientes (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT UNIQUE,
+        calorias REAL,
+        proteinas REAL,
+        carbohidratos REAL,
+        grasas REAL,
+        fibra REAL,
+        sodio REAL
+    )''')
+
+    # Tabla de recetas
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS recetas (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT UNIQUE,
+        tipo_dieta TEXT,
+        instrucciones TEXT
+    )''')
+
+    # Tabla de ingredientes por receta
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS receta_ingredientes (
+        receta_id INTEGER,
+        ingrediente_id INTEGER,
+        cantidad REAL,
+        FOREIGN KEY(receta_id) REFERENCES recetas(id),
+        FOREIGN KEY(ingrediente_id) REFERENCES ingredientes(id)
+    )''')
+
+
+def _clave_receta_ingredientes(cursor):
+    """Clave primaria (receta_id, ingrediente_id) e índice por ingrediente"""
+    # WITHOUT ROWID agrupa físicamente las líneas de cada receta
+    cursor.execute('''
+    CREATE TABLE receta_ingredientes_nueva (
+        receta_id INTEGER NOT NULL,
+        ingrediente_id INTEGER NOT NULL,
+        cantidad REAL,
+        PRIMARY KEY (receta_id, ingrediente_id),
+        FOREIGN KEY(receta_id) REFERENCES recetas(id),
+        FOREIGN KEY(ingrediente_id) REFERENCES ingredientes(id)
+    ) WITHOUT ROWID''')
+
+    # Las líneas repetidas de un mismo ingrediente se suman en una sola
+    cursor.execute('''
+    INSERT INTO receta_ingredientes_nueva (receta_id, ingrediente_id, cantidad)
+    SELECT receta_id, ingrediente_id, SUM(cantidad)
+    FROM receta_ingredientes
+    WHERE receta_id IS NOT NULL AND ingrediente_id IS NOT NULL
+    GROUP BY receta_id, ingrediente_id
+    ''')
+    cursor.execute('DROP TABLE receta_ingredientes')
+    cursor.execute('ALTER TABLE receta_ingredientes_nueva RENAME TO receta_ingredientes')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_receta_ingredientes_ingrediente ON receta_ingredientes (ingrediente_id)')
+
+
+def _indice_tipo_dieta(cursor):
+    """Índice para filtrar recetas por tipo de dieta"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recetas_tipo_dieta ON recetas (tipo_dieta)')
+
+
+def _modo_wal(cursor):
+    """Journal en modo WAL: lectores y escritor ya no se bloquean entre sí"""
+    cursor.execute('PRAGMA journal_mode = WAL')
+
+
+def _recalcular_nutricion(condicion):
+    """Sentencia que recalcula la fila de receta_nutricion de las recetas que cumplen `condicion`
+
+    Se usa UPSERT y no INSERT OR REPLACE: dentro de un trigger, la política OR
+    de la sentencia exterior (p. ej. un INSERT con ON CONFLICT) sustituiría a
+    la del trigger y el REPLACE fallaría con un error de unicidad.
+    """
+    return '''
+    INSERT INTO receta_nutricion (receta_id, {columnas})
+    SELECT r.id, {sumas}
+    FROM recetas r
+    LEFT JOIN receta_ingredientes ri ON ri.receta_id = r.id
+    LEFT JOIN ingredientes i ON i.id = ri.ingrediente_id
+    WHERE {condicion}
+    GROUP BY r.id
+    ON CONFLICT(receta_id) DO UPDATE SET {actualizar};
+    '''.format(
+        columnas=', '.join(NUTRIENTES),
+        sumas=', '.join(f'COALESCE(SUM(ri.cantidad * i.{n}), 0) / 100' for n in NUTRIENTES),
+        condicion=condicion,
+        actualizar=', '.join(f'{n} = excluded.{n}' for n in NUTRIENTES)
+    )
+
+
+def _nutricion_materializada(cursor):
+    """Tabla receta_nutricion con los totales de cada receta, mantenida por triggers"""
+    cursor.execute('''
+    CREATE TABLE receta_nutricion (
+        receta_id INTEGER PRIMARY KEY REFERENCES recetas(id),
+        {}
+    )'''.format(',\n        '.join(f'{n} REAL NOT NULL DEFAULT 0' for n in NUTRIENTES)))
+
+    # Índices para consultas por rangos de nutrientes
+    for nutriente in NUTRIENTES:
+        cursor.execute(f'CREATE INDEX idx_receta_nutricion_{nutriente} ON receta_nutricion ({nutriente})')
+
+    cursor.execute(_recalcular_nutricion('1'))
+
+    # Cada cambio recalcula solo las recetas afectadas
+    triggers = {
+        'trg_nutricion_receta_insertada': ('AFTER INSERT ON recetas', _recalcular_nutricion('r.id = NEW.id')),
+        'trg_nutricion_receta_borrada': (
+            'AFTER DELETE ON recetas',
+            'DELETE FROM receta_nutricion WHERE receta_id = OLD.id;'
+        ),
+        'trg_nutricion_linea_insertada': (
+            'AFTER INSERT ON receta_ingredientes',
+            _recalcular_nutricion('r.id = NEW.receta_id')
+        ),
+        'trg_nutricion_linea_borrada': (
+            'AFTER DELETE ON receta_ingredientes',
+            _recalcular_nutricion('r.id = OLD.receta_id')
+        ),
+        'trg_nutricion_linea_actualizada': (
+            'AFTER UPDATE ON receta_ingredientes',
+            _recalcular_nutricion('r.id IN (OLD.receta_id, NEW.receta_id)')
+        ),
+        'trg_nutricion_ingrediente_insertado': (
+            'AFTER INSERT ON ingredientes',
+            _recalcular_nutricion('r.id IN (SELECT receta_id FROM receta_ingredientes WHERE ingrediente_id = NEW.id)')
+        ),
+        'trg_nutricion_ingrediente_borrado': (
+            'AFTER DELETE ON ingredientes',
+            _recalcular_nutricion('r.id IN (SELECT receta_id FROM receta_ingredientes WHERE ingrediente_id = OLD.id)')
+        ),
+        'trg_nutricion_ingrediente_actualizado': (
+            'AFTER UPDATE OF id, {} ON ingredientes'.format(', '.join(NUTRIENTES)),
+            _recalcular_nutricion(
+                'r.id IN (SELECT receta_id FROM receta_ingredientes WHERE ingrediente_id IN (OLD.id, NEW.id))'
+            )
+        ),
+    }
+    for nombre, (evento, cuerpo) in triggers.items():
+        cursor.execute(f'CREATE TRIGGER {nombre} {evento} BEGIN {cuerpo} END')
+
+
+def _busqueda_texto(cursor):
+    """Índice FTS5 sobre nombre e instrucciones, sin distinguir mayúsculas ni tildes"""
+    cursor.execute('''
+    CREATE VIRTUAL TABLE recetas_fts USING fts5(
+        nombre,
+        instrucciones,
+        content='recetas',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )''')
+    cursor.execute("INSERT INTO recetas_fts (recetas_fts) VALUES ('rebuild')")
+
+    # Triggers de sincronización de la tabla de contenido externo
+    cursor.execute('''
+    CREATE TRIGGER trg_fts_receta_insertada AFTER INSERT ON recetas BEGIN
+        INSERT INTO recetas_fts (rowid, nombre, instrucciones) VALUES (NEW.id, NEW.nombre, NEW.instrucciones);
+    END''')
+    cursor.execute('''
+    CREATE TRIGGER trg_fts_receta_borrada AFTER DELETE ON recetas BEGIN
+        INSERT INTO recetas_fts (recetas_fts, rowid, nombre, instrucciones)
+        VALUES ('delete', OLD.id, OLD.nombre, OLD.instrucciones);
+    END''')
+    cursor.execute('''
+    CREATE TRIGGER trg_fts_receta_actualizada AFTER UPDATE OF id, nombre, instrucciones ON recetas BEGIN
+        INSERT INTO recetas_fts (recetas_fts, rowid, nombre, instrucciones)
+        VALUES ('delete', OLD.id, OLD.nombre, OLD.instrucciones);
+        INSERT INTO recetas_fts (rowid, nombre, instrucciones) VALUES (NEW.id, NEW.nombre, NEW.instrucciones);
+    END''')
+
+
+def _lineas_en_cascada(cursor):
+    """Borrar las líneas huérfanas y borrar en cascada las líneas de una receta eliminada
+
+    Las versiones anteriores reemplazaban las recetas con INSERT OR REPLACE,
+    que cambiaba su id y dejaba las líneas antiguas sin receta. Se usa un
+    trigger en lugar de ON DELETE CASCADE para no reconstruir la tabla.
+    """
+    cursor.execute('''
+    DELETE FROM receta_ingredientes
+    WHERE receta_id NOT IN (SELECT id FROM recetas)
+       OR ingrediente_id NOT IN (SELECT id FROM ingredientes)
+    ''')
+    cursor.execute('DELETE FROM receta_nutricion WHERE receta_id NOT IN (SELECT id FROM recetas)')
+    cursor.execute('''
+    CREATE TRIGGER trg_lineas_receta_borrada AFTER DELETE ON recetas BEGIN
+        DELETE FROM receta_ingredientes WHERE receta_id = OLD.id;
+    END''')
+
+
+def _similitud(cursor):
+    """Tablas del índice de similitud (MinHash/LSH) y triggers que marcan las recetas a recalcular
+
+    Las firmas se calculan en Python (módulo `similitud`); los triggers solo
+    apuntan qué recetas han cambiado, así que cualquier escritura (también la
+    importación masiva) deja el índice listo para actualizarse de forma
+    incremental.
+    """
+    # Claves LSH de cada receta (para borrar sus cubetas al recalcularla)
+    cursor.execute('CREATE TABLE similitud_firmas (receta_id INTEGER PRIMARY KEY, claves BLOB NOT NULL)')
+    cursor.execute('''
+    CREATE TABLE similitud_bandas (
+        banda INTEGER NOT NULL,
+        clave INTEGER NOT NULL,
+        receta_id INTEGER NOT NULL,
+        PRIMARY KEY (banda, clave, receta_id)
+    ) WITHOUT ROWID''')
+    cursor.execute('CREATE TABLE similitud_pendientes (receta_id INTEGER PRIMARY KEY)')
+    cursor.execute('INSERT INTO similitud_pendientes (receta_id) SELECT id FROM recetas')
+
+    marcar = 'INSERT OR IGNORE INTO similitud_pendientes (receta_id) VALUES ({});'
+    triggers = {
+        'trg_similitud_linea_insertada': ('AFTER INSERT ON receta_ingredientes', marcar.format('NEW.receta_id')),
+        'trg_similitud_linea_borrada': ('AFTER DELETE ON receta_ingredientes', marcar.format('OLD.receta_id')),
+        'trg_similitud_linea_actualizada': (
+            'AFTER UPDATE OF receta_id, ingrediente_id ON receta_ingredientes',
+            marcar.format('OLD.receta_id') + ' ' + marcar.format('NEW.receta_id')
+        ),
+        'trg_similitud_receta_borrada': ('AFTER DELETE ON recetas', marcar.format('OLD.id')),
+    }
+    for nombre, (evento, cuerpo) in triggers.items():
+        cursor.execute(f'CREATE TRIGGER {nombre} {evento} BEGIN {cuerpo} END')
+
+
+def _version_datos(cursor):
+    """Contador que sube con cada escritura en el catálogo, para saber si una copia externa sigue al día
+
+    Lo usan las instantáneas columnares (módulo `instantanea`): guardan el
+    valor con el que se exportaron y dejan de usarse en cuanto cambia.
+    """
+    cursor.execute('CREATE TABLE version_datos (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)')
+    cursor.execute('INSERT INTO version_datos (id, version) VALUES (1, 0)')
+
+    eventos = {
+        'trg_version_ingrediente_insertado': 'AFTER INSERT ON ingredientes',
+        'trg_version_ingrediente_borrado': 'AFTER DELETE ON ingredientes',
+        'trg_version_ingrediente_actualizado': 'AFTER UPDATE ON ingredientes',
+        'trg_version_receta_insertada': 'AFTER INSERT ON recetas',
+        'trg_version_receta_borrada': 'AFTER DELETE ON recetas',
+        'trg_version_receta_actualizada': 'AFTER UPDATE OF id, tipo_dieta ON recetas',
+        'trg_version_linea_insertada': 'AFTER INSERT ON receta_ingredientes',
+        'trg_version_linea_borrada': 'AFTER DELETE ON receta_ingredientes',
+        'trg_version_linea_actualizada': 'AFTER UPDATE ON receta_ingredientes',
+    }
+    for nombre, evento in eventos.items():
+        cursor.execute(f'CREATE TRIGGER {nombre} {evento} BEGIN UPDATE version_datos SET version = version + 1; END')
+
+
+# Migraciones ordenadas: (versión, descripción, función, se ejecuta en una transacción)
+MIGRACIONES = [
+    (1, "Esquema base", _esquema_base, True),
+    (2, "Clave primaria e índices de receta_ingredientes", _clave_receta_ingredientes, True),
+    (3, "Índice de recetas por tipo de dieta", _indice_tipo_dieta, True),
+    (4, "Modo WAL", _modo_wal, False),
+    (5, "Nutrición por receta materializada", _nutricion_materializada, True),
+    (6, "Búsqueda de texto completo", _busqueda_texto, True),
+    (7, "Limpieza de líneas huérfanas y borrado en cascada", _lineas_en_cascada, True),
+    (8, "Índice de similitud entre recetas", _similitud, True),
+    (9, "Contador de versión de los datos", _version_datos, True),
+]
+
+
+def version_actual(conn):
+    """Versión de esquema registrada en la base de datos"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS esquema_version (
+        version INTEGER PRIMARY KEY,
+        descripcion TEXT,
+        aplicada TEXT DEFAULT CURRENT_TIMESTAMP
+    )''')
+    conn.commit()
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM esquema_version')
+    return cursor.fetchone()[0]
+
+
+def version_datos(conn):
+    """Contador de escrituras del catálogo (migración 9): si no cambia, los datos tampoco"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM version_datos WHERE id = 1')
+    return cursor.fetchone()[0]
+
+
+def aplicar_migraciones(conn):
+    """Aplicar en orden las migraciones pendientes y devolver las versiones aplicadas"""
+    aplicadas = []
+    version = version_actual(conn)
+    if version >= MIGRACIONES[-1][0]:
+        return aplicadas
+
+    # Las migraciones que reconstruyen tablas necesitan las claves foráneas
+    # desactivadas (no se puede cambiar dentro de una transacción)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA foreign_keys')
+    claves_foraneas = cursor.fetchone()[0]
+    cursor.execute('PRAGMA foreign_keys = OFF')
+    try:
+        _aplicar_pendientes(conn, version, aplicadas)
+    finally:
+        cursor.execute(f'PRAGMA foreign_keys = {claves_foraneas}')
+    return aplicadas
+
+
+def _aplicar_pendientes(conn, version, aplicadas):
+    cursor = conn.cursor()
+    for numero, descripcion, migrar, transaccional in MIGRACIONES:
+        if numero <= version:
+            continue
+
+        if transaccional:
+            # IMMEDIATE evita que dos procesos apliquen la misma migración
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('SELECT 1 FROM esquema_version WHERE version = ?', (numero,))
+                if cursor.fetchone() is None:
+                    migrar(cursor)
+                    cursor.execute('INSERT INTO esquema_version (version, descripcion) VALUES (?, ?)',
+                                   (numero, descripcion))
+                    aplicadas.append(numero)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        else:
+            migrar(cursor)
+            cursor.execute('INSERT OR IGNORE INTO esquema_version (version, descripcion) VALUES (?, ?)',
+                           (numero, descripcion))
+            conn.commit()
+            aplicadas.append(numero)
+
+
+def _consultas_representativas(conn):
+    """Consultas de las rutas calientes con parámetros tomados de la propia base de datos"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT receta_id, ingrediente_id FROM receta_ingredientes LIMIT 1')
+    receta_id, ingrediente_id = cursor.fetchone() or (0, 0)
+    cursor.execute('SELECT tipo_dieta FROM recetas LIMIT 1')
+    tipo_dieta = (cursor.fetchone() or ('Todos',))[0]
+
+    return [
+        ("Ingredientes de una receta (nutrición, lista de compras)", '''
+        SELECT i.nombre, ri.cantidad, i.calorias
+        FROM receta_ingredientes ri
+        JOIN ingredientes i ON ri.ingrediente_id = i.id
+        WHERE ri.receta_id = ?
+        ''', (receta_id,)),
+        ("Recetas que usan un ingrediente (búsqueda)", '''
+        SELECT receta_id FROM receta_ingredientes WHERE ingrediente_id = ?
+        ''', (ingrediente_id,)),
+        ("Recetas por tipo de dieta", '''
+        SELECT id, nombre FROM recetas WHERE tipo_dieta = ?
+        ''', (tipo_dieta,)),
+    ]
+
+
+def informe_consultas(conn, repeticiones=20):
+    """Plan de ejecución y latencia media (ms) de las consultas representativas"""
+    cursor = conn.cursor()
+    informe = []
+    for nombre, consulta, parametros in _consultas_representativas(conn):
+        cursor.execute('EXPLAIN QUERY PLAN ' + consulta, parametros)
+        plan = [fila[3] for fila in cursor.fetchall()]
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            cursor.execute(consulta, parametros)
+            cursor.fetchall()
+        milisegundos = (time.perf_counter() - inicio) * 1000 / repeticiones
+
+        informe.append({'consulta': nombre, 'plan': plan, 'ms': milisegundos})
+    return informe
+
+
+def formatear_comparacion(antes, despues):
+    """Texto con el plan y la latencia de cada consulta antes y después de migrar"""
+    lineas = []
+    for previo, posterior in zip(antes, despues):
+        lineas.append(previo['consulta'])
+        lineas.append(f"  antes:   {previo['ms']:.3f} ms  {' | '.join(previo['plan'])}")
+        lineas.append(f"  después: {posterior['ms']:.3f} ms  {' | '.join(posterior['plan'])}")
+    return '\n'.join(lineas)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aplicar migraciones pendientes del recetario")
+    parser.add_argument('--db', default='recetario.db')
+    parser.add_argument('--informe', action='store_true',
+                        help="Mostrar planes de consulta y latencias antes y después de migrar")
+    args = parser.parse_args()
+
+    conn = configurar_conexion(sqlite3.connect(args.db))
+    antes = None
+    if args.informe:
+        try:
+            antes = informe_consultas(conn)
+        except sqlite3.OperationalError:
+            pass  # Base de datos nueva: todavía no hay tablas que medir
+    aplicadas = aplicar_migraciones(conn)
+    print(f"Versión de esquema: {version_actual(conn)} (aplicadas: {aplicadas or 'ninguna'})")
+
+    if antes is not None:
+        print(formatear_comparacion(antes, informe_consultas(conn)))
+
+
+if __name__ == '__main__':
+    main()
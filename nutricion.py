@@ -0,0 +1,109 @@
+import numpy as np
+
+from recetario_core import NUTRIENTES
+
+
+class MotorNutricional:
+    """Cálculo nutricional por lotes sobre una matriz dispersa receta x ingrediente
+
+    Los nutrientes se guardan en una matriz densa ingrediente x nutriente y las
+    cantidades de cada receta en formato CSR (una fila por receta), de modo que
+    los totales de muchas recetas salen de un único producto matricial.
+    """
+
+    def __init__(self, ingrediente_ids, nombres, nutrientes, receta_ids, offsets, columnas, cantidades):
+        # Matriz ingrediente x nutriente
+        self.ingrediente_ids = ingrediente_ids
+        self.nombres = nombres
+        self.nutrientes = nutrientes
+
+        # Matriz dispersa receta x ingrediente en formato CSR (filas ordenadas por id de receta,
+        # que se buscan con searchsorted: construir el motor no recorre las recetas en Python)
+        self.receta_ids = receta_ids
+        self.offsets = offsets
+        self.columnas = columnas
+        self.cantidades = cantidades
+
+    @classmethod
+    def desde_conexion(cls, conn):
+        """Cargar las matrices desde la base de datos"""
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT id, nombre, {} FROM ingredientes ORDER BY id'.format(', '.join(NUTRIENTES)))
+        filas = cursor.fetchall()
+        ingrediente_ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+        nombres = [fila[1] for fila in filas]
+        nutrientes = np.array([fila[2:] for fila in filas], dtype=np.float64).reshape(len(filas), len(NUTRIENTES))
+        # Los valores desconocidos (NULL) cuentan como cero
+        nutrientes = np.nan_to_num(nutrientes)
+
+        # Solo las líneas cuyo ingrediente existe, igual que el JOIN de la consulta original
+        cursor.execute('''
+        SELECT ri.receta_id, ri.ingrediente_id, ri.cantidad
+        FROM receta_ingredientes ri
+        JOIN ingredientes i ON ri.ingrediente_id = i.id
+        ORDER BY ri.receta_id
+        ''')
+        lineas = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 3)
+        receta_por_linea = lineas[:, 0].astype(np.int64)
+
+        receta_ids, inicios = np.unique(receta_por_linea, return_index=True)
+        offsets = np.append(inicios, len(lineas)).astype(np.int64)
+        columnas = np.searchsorted(ingrediente_ids, lineas[:, 1].astype(np.int64))
+        cantidades = np.nan_to_num(lineas[:, 2])
+
+        return cls(ingrediente_ids, nombres, nutrientes, receta_ids, offsets, columnas, cantidades)
+
+    def _lineas(self, receta_ids):
+        """Índices de las líneas de cada receta y la posición de la receta a la que pertenecen"""
+        buscadas = np.asarray(receta_ids, dtype=np.int64).reshape(-1)
+        if len(self.receta_ids):
+            seguras = np.minimum(np.searchsorted(self.receta_ids, buscadas), len(self.receta_ids) - 1)
+            validas = self.receta_ids[seguras] == buscadas
+        else:
+            seguras = np.zeros(len(buscadas), dtype=np.int64)
+            validas = np.zeros(len(buscadas), dtype=bool)
+
+        inicios = np.where(validas, self.offsets[seguras], 0)
+        longitudes = np.where(validas, self.offsets[np.minimum(seguras + 1, len(self.offsets) - 1)] - inicios, 0)
+
+        # Expandir los rangos [inicio, inicio + longitud) sin bucles de Python
+        posicion = np.repeat(np.arange(len(buscadas)), longitudes)
+        desplazamiento = np.arange(longitudes.sum()) - np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+        lineas = np.repeat(inicios, longitudes) + desplazamiento
+        return lineas, posicion
+
+    def calcular_lote(self, receta_ids):
+        """Calcular totales y aportes por línea de ingrediente para muchas recetas
+
+        Devuelve (totales, posicion, columnas, aportes): `totales` tiene una fila
+        por receta en el orden recibido; `aportes` tiene una fila por línea de
+        ingrediente, `posicion` indica a qué receta pertenece y `columnas` el
+        índice del ingrediente en `nombres`.
+        """
+        receta_ids = list(receta_ids)
+        lineas, posicion = self._lineas(receta_ids)
+        columnas = self.columnas[lineas]
+
+        # Producto de la matriz dispersa de cantidades por la de nutrientes (por 100 g)
+        aportes = self.nutrientes[columnas] * (self.cantidades[lineas] / 100)[:, None]
+
+        totales = np.zeros((len(receta_ids), len(NUTRIENTES)))
+        np.add.at(totales, posicion, aportes)
+        return totales, posicion, columnas, aportes
+
+    def totales(self, receta_ids):
+        """Matriz receta x nutriente con los totales de cada receta"""
+        return self.calcular_lote(receta_ids)[0]
+
+    def calcular_receta(self, receta_id):
+        """Totales y desglose por ingrediente de una sola receta, como diccionarios"""
+        totales, _, columnas, aportes = self.calcular_lote([receta_id])
+        return dict(zip(NUTRIENTES, totales[0].tolist())), self.desglose(columnas, aportes)
+
+    def desglose(self, columnas, aportes):
+        """Convertir aportes por línea en la lista de diccionarios usada por la interfaz"""
+        return [
+            dict(nombre=self.nombres[columna], **dict(zip(NUTRIENTES, aporte)))
+            for columna, aporte in zip(columnas.tolist(), aportes.tolist())
+        ]
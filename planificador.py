@@ -0,0 +1,199 @@
+"""Planificador de menús semanales sobre los totales de `receta_nutricion`
+
+Cada comida es una receta servida en la fracción que más se acerca a las
+calorías por comida (las recetas son para varias raciones). El plan reparte
+`dias` x `comidas` recetas distintas minimizando, día a día, la desviación
+relativa respecto a los objetivos diarios (la fibra es un mínimo y el sodio un
+máximo) y premiando las recetas que se pueden hacer con la despensa.
+
+La búsqueda es voraz (cada comida, la mejor dadas las anteriores del día) y
+después local (se prueba a cambiar cada comida por cualquier otra candidata
+hasta que nada mejora). Todo se evalúa con NumPy sobre un grupo de candidatas
+preseleccionadas, así que el coste casi no depende del tamaño del catálogo.
+"""
+import time
+
+import numpy as np
+
+from recetario_core import NUTRIENTES
+
+# Objetivos diarios por defecto (sodio en mg, el resto en kcal o gramos)
+OBJETIVOS_DIARIOS = {
+    'calorias': 2000,
+    'proteinas': 75,
+    'carbohidratos': 250,
+    'grasas': 70,
+    'fibra': 25,
+    'sodio': 2300,
+}
+# Nutrientes cuyo objetivo es un mínimo o un máximo; los demás, un valor a alcanzar
+MINIMOS = {'fibra'}
+MAXIMOS = {'sodio'}
+
+# Fracción de una receta que se puede servir en una comida
+FRACCION_MINIMA = 0.1
+FRACCION_MAXIMA = 2.0
+
+
+def porciones(plan):
+    """{receta_id: fracción} del plan, como lo espera `Recetario.lista_compras`"""
+    resultado = {}
+    for dia in plan['comidas']:
+        for receta_id, fraccion in dia:
+            resultado[receta_id] = resultado.get(receta_id, 0) + fraccion
+    return resultado
+
+
+class Planificador:
+    """Vectores nutricionales de todas las recetas y búsqueda de planes sobre ellos"""
+
+    def __init__(self, receta_ids, dietas, nutrientes):
+        # Ordenados por id de receta
+        self.receta_ids = receta_ids
+        self.dietas = dietas
+        self.nutrientes = nutrientes
+
+        self._minimos = np.array([n in MINIMOS for n in NUTRIENTES])
+        self._maximos = np.array([n in MAXIMOS for n in NUTRIENTES])
+
+    @classmethod
+    def desde_conexion(cls, conn):
+        """Cargar los totales materializados de cada receta"""
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT r.id, r.tipo_dieta, {}
+        FROM recetas r
+        JOIN receta_nutricion n ON n.receta_id = r.id
+        ORDER BY r.id
+        '''.format(', '.join(f'n.{nutriente}' for nutriente in NUTRIENTES)))
+        filas = cursor.fetchall()
+
+        receta_ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+        dietas = np.array([fila[1] for fila in filas], dtype=object)
+        nutrientes = np.array([fila[2:] for fila in filas], dtype=np.float64).reshape(len(filas), len(NUTRIENTES))
+        return cls(receta_ids, dietas, nutrientes)
+
+    def _coste(self, totales, objetivo, pesos):
+        """Suma ponderada de desviaciones relativas al cuadrado (última dimensión: nutrientes)"""
+        relativa = (totales - objetivo) / objetivo
+        relativa[..., self._minimos] = np.minimum(relativa[..., self._minimos], 0)
+        relativa[..., self._maximos] = np.maximum(relativa[..., self._maximos], 0)
+        return (pesos * relativa ** 2).sum(axis=-1)
+
+    def _cobertura(self, cobertura):
+        """Vector alineado con `receta_ids` a partir de {receta_id: fracción de ingredientes en la despensa}"""
+        vector = np.zeros(len(self.receta_ids))
+        if cobertura:
+            ids = np.fromiter(cobertura.keys(), dtype=np.int64, count=len(cobertura))
+            valores = np.fromiter(cobertura.values(), dtype=np.float64, count=len(cobertura))
+            filas = np.minimum(np.searchsorted(self.receta_ids, ids), len(self.receta_ids) - 1)
+            existe = self.receta_ids[filas] == ids
+            vector[filas[existe]] = valores[existe]
+        return vector
+
+    def planificar(self, dias=7, comidas=3, objetivos=None, tipo_dieta="Todos", cobertura=None,
+                   peso_despensa=0.05, candidatas=2000, pasadas=20, excluir=(), semilla=None):
+        """Buscar un plan de `dias` x `comidas` recetas distintas
+
+        `objetivos` sustituye a OBJETIVOS_DIARIOS (solo cuentan los nutrientes
+        indicados), `cobertura` es {receta_id: fracción en despensa} y
+        `peso_despensa` lo que vale una receta completa en la despensa frente a
+        la desviación nutricional. Con `semilla` se varía la preselección para
+        obtener planes distintos en cada llamada.
+
+        Devuelve un diccionario con las comidas de cada día como
+        (receta_id, fracción), los totales diarios, el coste nutricional y la
+        cobertura media de la despensa.
+        """
+        inicio = time.perf_counter()
+        objetivos = OBJETIVOS_DIARIOS if objetivos is None else objetivos
+        objetivo = np.ones(len(NUTRIENTES))
+        pesos = np.zeros(len(NUTRIENTES))
+        for nutriente, valor in objetivos.items():
+            if nutriente not in NUTRIENTES:
+                raise ValueError(f"Nutriente desconocido: {nutriente}")
+            if valor <= 0:
+                raise ValueError(f"El objetivo de {nutriente} debe ser positivo")
+            objetivo[NUTRIENTES.index(nutriente)] = valor
+            pesos[NUTRIENTES.index(nutriente)] = 1.0
+
+        # Candidatas: dieta, sin excluidas y con calorías (si no, no se pueden escalar)
+        calorias = self.nutrientes[:, NUTRIENTES.index('calorias')]
+        validas = calorias > 0
+        if tipo_dieta != 'Todos':
+            validas &= self.dietas == tipo_dieta
+        if excluir:
+            validas &= ~np.isin(self.receta_ids, np.fromiter(excluir, dtype=np.int64))
+        validas = np.flatnonzero(validas)
+        if len(validas) < dias * comidas:
+            raise ValueError(f"Solo hay {len(validas)} recetas posibles para {dias * comidas} comidas")
+
+        # Fracción de cada receta que da las calorías de una comida
+        if 'calorias' in objetivos:
+            fracciones = np.round(np.clip(
+                objetivos['calorias'] / comidas / calorias[validas], FRACCION_MINIMA, FRACCION_MAXIMA), 2)
+        else:
+            fracciones = np.ones(len(validas))
+        escalados = self.nutrientes[validas] * fracciones[:, None]
+        en_despensa = self._cobertura(cobertura)
+        bonificacion = peso_despensa * en_despensa[validas]
+
+        # Preselección: lo bien que encaja cada receta como comida de un día típico
+        encaje = self._coste(escalados * comidas, objetivo, pesos) - bonificacion
+        if semilla is not None:
+            encaje += np.random.default_rng(semilla).exponential(0.05, len(encaje))
+        if len(encaje) > candidatas:
+            grupo = np.argpartition(encaje, candidatas)[:candidatas]
+        else:
+            grupo = np.arange(len(encaje))
+        vectores = escalados[grupo]
+        bonificacion = bonificacion[grupo]
+
+        # Voraz: las comidas que quedan se suponen exactas en el objetivo
+        por_comida = objetivo / comidas
+        plan = np.empty((dias, comidas), dtype=np.int64)
+        usadas = np.zeros(len(grupo), dtype=bool)
+        totales = np.zeros((dias, len(NUTRIENTES)))
+        for dia in range(dias):
+            for comida in range(comidas):
+                previsto = totales[dia] + (comidas - comida - 1) * por_comida
+                costes = self._coste(previsto + vectores, objetivo, pesos) - bonificacion
+                costes[usadas] = np.inf
+                elegida = int(costes.argmin())
+                plan[dia, comida] = elegida
+                usadas[elegida] = True
+                totales[dia] += vectores[elegida]
+
+        # Búsqueda local: cambiar cada comida por la mejor candidata libre mientras mejore
+        for _ in range(pasadas):
+            mejorado = False
+            for dia in range(dias):
+                for comida in range(comidas):
+                    actual = plan[dia, comida]
+                    sin_ella = totales[dia] - vectores[actual]
+                    costes = self._coste(sin_ella + vectores, objetivo, pesos) - bonificacion
+                    costes[usadas] = np.inf
+                    mejor = int(costes.argmin())
+                    coste_actual = self._coste(totales[dia], objetivo, pesos) - bonificacion[actual]
+                    if costes[mejor] < coste_actual - 1e-9:
+                        usadas[actual] = False
+                        usadas[mejor] = True
+                        plan[dia, comida] = mejor
+                        totales[dia] = sin_ella + vectores[mejor]
+                        mejorado = True
+            if not mejorado:
+                break
+
+        filas = validas[grupo[plan]]
+        return {
+            'comidas': [
+                [(int(self.receta_ids[fila]), float(fracciones[grupo[indice]])) for fila, indice in zip(filas_dia, plan_dia)]
+                for filas_dia, plan_dia in zip(filas, plan)
+            ],
+            'totales': [dict(zip(NUTRIENTES, fila)) for fila in totales.tolist()],
+            'objetivos': dict(objetivos),
+            'coste': float(self._coste(totales, objetivo, pesos).sum()),
+            'cobertura': float(en_despensa[filas].mean()),
+            'candidatas': len(validas),
+            'segundos': round(time.perf_counter() - inicio, 4),
+        }
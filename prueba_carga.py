@@ -0,0 +1,215 @@
+"""Prueba de carga del servicio HTTP: rendimiento con varios terminales a la vez
+
+Lanza el servicio sobre la base de datos indicada (o usa uno ya arrancado con
+--url) y, para cada nivel de concurrencia, mantiene ese número de clientes
+con conexión persistente haciendo peticiones sin pausa durante --duracion
+segundos. La mezcla imita a las cocinas: búsquedas por despensa, detalle y
+nutrición de lotes de recetas y listas de compras.
+
+    python prueba_carga.py --db recetario.db --concurrencia 1 2 4 8 16 --lectores 4
+    python prueba_carga.py --db recetario.db --url http://127.0.0.1:8765 --salida carga.json
+"""
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmark import percentil
+from recetario_core import conectar_lectura
+
+# Peso de cada tipo de petición en la mezcla
+MEZCLA = [('buscar', 4), ('detalle', 2), ('nutricion', 2), ('lista_compras', 2)]
+
+
+def cargar_muestras(ruta):
+    """Ids de receta y despensas de ejemplo sacados de la propia base de datos"""
+    conn = conectar_lectura(ruta)
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM recetas')
+    receta_ids = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute('SELECT nombre FROM ingredientes')
+    ingredientes = [fila[0] for fila in cursor.fetchall()]
+    conn.close()
+    if not receta_ids or not ingredientes:
+        raise ValueError("La base de datos no tiene recetas")
+    return receta_ids, ingredientes
+
+
+class GeneradorPeticiones:
+    """Peticiones aleatorias (reproducibles por semilla) de la mezcla"""
+
+    def __init__(self, receta_ids, ingredientes, semilla, lote=20):
+        self.receta_ids = receta_ids
+        self.ingredientes = ingredientes
+        self.lote = lote
+        self.aleatorio = random.Random(semilla)
+        self.tipos = [tipo for tipo, peso in MEZCLA for _ in range(peso)]
+
+    def _recetas(self):
+        return self.aleatorio.sample(self.receta_ids, min(self.lote, len(self.receta_ids)))
+
+    def siguiente(self):
+        """(tipo, ruta, cuerpo)"""
+        tipo = self.aleatorio.choice(self.tipos)
+        if tipo == 'buscar':
+            despensa = self.aleatorio.sample(self.ingredientes, min(8, len(self.ingredientes)))
+            return tipo, '/buscar', {'ingredientes': despensa, 'faltantes': 1, 'limite': 20}
+        if tipo == 'detalle':
+            return tipo, '/recetas/detalle', {'ids': self._recetas()}
+        if tipo == 'nutricion':
+            return tipo, '/nutricion', {'ids': self._recetas()}
+        despensa = {nombre: 200 for nombre in self.aleatorio.sample(self.ingredientes, min(5, len(self.ingredientes)))}
+        return tipo, '/lista-compras', {'porciones': self._recetas()[:5], 'despensa': despensa}
+
+
+def _cliente(host, puerto, generador, hasta, resultados):
+    """Peticiones seguidas por una conexión persistente hasta `hasta`; acumula (tipo, segundos, correcta)"""
+    conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+    while time.perf_counter() < hasta:
+        tipo, ruta, cuerpo = generador.siguiente()
+        datos = json.dumps(cuerpo).encode('utf-8')
+        inicio = time.perf_counter()
+        try:
+            conexion.request('POST', ruta, datos, {'Content-Type': 'application/json'})
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            correcta = respuesta.status == 200
+        except (OSError, http.client.HTTPException):
+            conexion.close()
+            conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+            correcta = False
+        resultados.append((tipo, time.perf_counter() - inicio, correcta))
+    conexion.close()
+
+
+def _resumen(tiempos, segundos):
+    tiempos = sorted(tiempos)
+    if not tiempos:
+        return {'peticiones': 0}
+    return {
+        'peticiones': len(tiempos),
+        'por_segundo': round(len(tiempos) / segundos, 1),
+        'p50_ms': round(percentil(tiempos, 50) * 1000, 3),
+        'p99_ms': round(percentil(tiempos, 99) * 1000, 3),
+    }
+
+
+def medir_nivel(host, puerto, clientes, duracion, muestras, semilla=42):
+    """Rendimiento con `clientes` terminales simultáneos durante `duracion` segundos"""
+    receta_ids, ingredientes = muestras
+    resultados = [[] for _ in range(clientes)]
+    hasta = time.perf_counter() + duracion
+    hilos = [
+        threading.Thread(target=_cliente, args=(
+            host, puerto, GeneradorPeticiones(receta_ids, ingredientes, semilla + i), hasta, resultados[i]))
+        for i in range(clientes)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    todas = [resultado for resultados_cliente in resultados for resultado in resultados_cliente]
+    informe = dict(clientes=clientes, segundos=round(segundos, 2),
+                   errores=sum(1 for _, _, correcta in todas if not correcta),
+                   **_resumen([t for _, t, _ in todas], segundos))
+    informe['por_tipo'] = {
+        tipo: _resumen([t for otro, t, _ in todas if otro == tipo], segundos) for tipo, _ in MEZCLA
+    }
+    return informe
+
+
+def _puerto_libre(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servicio(ruta, lectores, host='127.0.0.1', espera=120):
+    """Lanzar `recetario_cli.py serve` en otro proceso y esperar a que responda a /salud"""
+    puerto = _puerto_libre(host)
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recetario_cli.py')
+    proceso = subprocess.Popen([sys.executable, cli, '--db', ruta, 'serve', '--host', host,
+                                '--puerto', str(puerto), '--lectores', str(lectores)],
+                               stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servicio terminó al arrancar (código {proceso.returncode})")
+        try:
+            conexion = http.client.HTTPConnection(host, puerto, timeout=5)
+            conexion.request('GET', '/salud')
+            if conexion.getresponse().status == 200:
+                conexion.close()
+                return proceso, puerto
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El servicio no respondió a tiempo")
+
+
+def ejecutar(ruta, niveles, duracion=5, lectores=4, url=None, semilla=42, calentar=2):
+    """Informe de rendimiento por nivel de concurrencia"""
+    muestras = cargar_muestras(ruta)
+    proceso = None
+    if url:
+        partes = urlsplit(url)
+        host, puerto = partes.hostname, partes.port or 80
+    else:
+        host = '127.0.0.1'
+        proceso, puerto = arrancar_servicio(ruta, lectores, host)
+
+    try:
+        # Las estructuras de cada lector se cargan al primer uso: calentarlos a todos antes de medir
+        if calentar:
+            medir_nivel(host, puerto, max(lectores, max(niveles)), calentar, muestras, semilla)
+        return {
+            'db': ruta,
+            'lectores': None if url else lectores,
+            'duracion': duracion,
+            'niveles': [medir_nivel(host, puerto, clientes, duracion, muestras, semilla) for clientes in niveles],
+        }
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+
+def _imprimir_informe(informe):
+    print(f"{informe['db']} ({informe['lectores'] or '?'} lectores, {informe['duracion']} s por nivel)")
+    print(f"  {'clientes':>8} {'pet/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errores':>8}")
+    for nivel in informe['niveles']:
+        print(f"  {nivel['clientes']:>8} {nivel.get('por_segundo', 0):>9.1f} {nivel.get('p50_ms', 0):>9.2f} "
+              f"{nivel.get('p99_ms', 0):>9.2f} {nivel['errores']:>8}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio HTTP del recetario")
+    parser.add_argument('--db', default='recetario.db', help="Base de datos (de ella salen las peticiones)")
+    parser.add_argument('--url', help="Servicio ya arrancado; si no, se lanza uno sobre --db")
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="Clientes simultáneos")
+    parser.add_argument('--duracion', type=float, default=5, help="Segundos por nivel")
+    parser.add_argument('--lectores', type=int, default=4, help="Conexiones de lectura del servicio lanzado")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help="Guardar el informe JSON en este archivo")
+    args = parser.parse_args()
+
+    informe = ejecutar(args.db, args.concurrencia, args.duracion, args.lectores, args.url, args.semilla)
+    _imprimir_informe(informe)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,471 @@
+"""Línea de comandos del recetario (sin interfaz gráfica)
+
+Ejemplos:
+    python recetario_cli.py search pollo arroz tomate --faltantes 1
+    python recetario_cli.py ingredients "Tomates, aceite oliva, cebola"
+    python recetario_cli.py nutrition 1 2 3
+    python recetario_cli.py text "arroz al horno" --despensa "pollo, arroz" --faltantes 1
+    python recetario_cli.py filter --max calorias=600 --min proteinas=30
+    python recetario_cli.py similar 42 --limite 5
+    python recetario_cli.py substitute "aceite de oliva" --despensa "pollo, arroz, tomate, mantequilla"
+    python recetario_cli.py plan --dias 7 --comidas 3 --objetivo calorias=1800 --despensa "pollo, arroz" --lista-compras
+    python recetario_cli.py shopping-list 1 2:3 --porciones 4 --despensa "arroz:500, sal" --csv lista.csv
+    python recetario_cli.py import recetas catalogo.jsonl
+    python recetario_cli.py cards --todas --directorio tarjetas --formato svg
+    python recetario_cli.py maintenance
+    python recetario_cli.py snapshot export
+    python recetario_cli.py serve --puerto 8765 --lectores 4
+
+Si existe una instantánea columnar al día junto a la base de datos
+(recetario.db.instantanea), las búsquedas y el cálculo nutricional la usan en
+lugar de leer SQLite; --sin-instantanea lo impide.
+
+Con --tiempos se informa por stderr del tiempo de arranque (hasta tener la
+base de datos abierta) y del tiempo del comando. Con --metricas json|prometheus
+se vuelcan por stderr las latencias por operación y por sentencia, y con
+--consultas-lentas MS se incluyen las sentencias lentas con su plan.
+"""
+import time
+
+_INICIO = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+from instrumentacion import METRICAS, activar_consultas_lentas
+from recetario_core import NUTRIENTES, Recetario, despensa_desde_texto, escribir_lista_compras_csv
+
+
+def _imprimir(datos, como_json, formatear):
+    if como_json:
+        print(json.dumps(datos, ensure_ascii=False, indent=2))
+    else:
+        for linea in formatear(datos):
+            print(linea)
+
+
+def _separar_ingredientes(argumentos):
+    """Aceptar 'pollo arroz' o 'pollo, aceite de oliva' (con comas, cada parte es un ingrediente)"""
+    texto = ' '.join(argumentos)
+    if ',' not in texto:
+        return argumentos
+    return [ing.strip() for ing in texto.split(',') if ing.strip()]
+
+
+def comando_search(recetario, args):
+    """Buscar recetas cocinables con la despensa (o a las que faltan pocos ingredientes)"""
+    recetas = recetario.recetas_por_cobertura(_separar_ingredientes(args.ingredientes), args.dieta, args.faltantes)[:args.limite]
+    datos = [
+        {'id': receta_id, 'nombre': nombre, 'faltantes': faltantes, 'cobertura': round(cobertura, 3)}
+        for receta_id, nombre, _, faltantes, cobertura in recetas
+    ]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['id']:>8}  {fila['nombre']}  (faltan {fila['faltantes']})" for fila in filas
+    ))
+
+
+def comando_ingredients(recetario, args):
+    """Ingredientes conocidos que encajan con lo escrito (con --completar, sugerencias por prefijo)"""
+    if args.completar:
+        datos = recetario.completar_ingrediente(' '.join(args.texto), args.limite)
+        _imprimir(datos, args.json, lambda nombres: nombres)
+        return
+
+    resueltos = recetario.resolver_ingredientes(_separar_ingredientes(args.texto), args.limite)
+    datos = [
+        {'texto': texto, 'candidatos': [
+            {'id': ingrediente_id, 'nombre': nombre, 'puntuacion': puntuacion}
+            for ingrediente_id, nombre, puntuacion in candidatos
+        ]}
+        for texto, candidatos in resueltos.items()
+    ]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['texto']}: " + (', '.join(f"{c['nombre']} ({c['puntuacion']:g})" for c in fila['candidatos']) or '-')
+        for fila in filas
+    ))
+
+
+def comando_nutrition(recetario, args):
+    """Totales nutricionales de una o varias recetas"""
+    totales = recetario.calcular_valor_nutricional_lote(args.recetas)[0]
+    datos = [
+        dict(id=receta_id, **{n: round(v, 2) for n, v in zip(NUTRIENTES, fila)})
+        for receta_id, fila in zip(args.recetas, totales.tolist())
+    ]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['id']:>8}  " + '  '.join(f"{n}={fila[n]:.2f}" for n in NUTRIENTES) for fila in filas
+    ))
+
+
+def comando_text(recetario, args):
+    """Buscar por texto en nombre e instrucciones, con filtros de dieta y despensa"""
+    despensa = list(despensa_desde_texto(args.despensa)) if args.despensa else None
+    recetas = recetario.buscar_texto(args.texto, args.dieta, despensa, args.faltantes, args.limite)
+    datos = [
+        {'id': receta_id, 'nombre': nombre, 'fragmento': fragmento, 'puntuacion': round(puntuacion, 3)}
+        for receta_id, nombre, fragmento, puntuacion in recetas
+    ]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['id']:>8}  {fila['nombre']}  {fila['fragmento']}" for fila in filas
+    ))
+
+
+def _limites(pares):
+    """Convertir ['calorias=600', ...] en {'calorias': 600.0, ...}"""
+    limites = {}
+    for par in pares:
+        nutriente, _, valor = par.partition('=')
+        limites[nutriente.strip()] = float(valor)
+    return limites
+
+
+def comando_filter(recetario, args):
+    """Recetas dentro de rangos de nutrientes (búsqueda por índice)"""
+    recetas = recetario.filtrar_por_nutricion(_limites(args.min), _limites(args.max), args.dieta, args.limite)
+    datos = [
+        dict(id=receta[0], nombre=receta[1], **{n: round(v, 2) for n, v in zip(NUTRIENTES, receta[2:])})
+        for receta in recetas
+    ]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['id']:>8}  {fila['nombre']}  " + '  '.join(f"{n}={fila[n]:.2f}" for n in NUTRIENTES)
+        for fila in filas
+    ))
+
+
+def comando_similar(recetario, args):
+    """Recetas más parecidas a una receta por sus ingredientes (MinHash/LSH)"""
+    recetas = recetario.recetas_similares(args.receta, args.limite)
+    datos = [{'id': receta_id, 'nombre': nombre, 'similitud': round(jaccard, 3)} for receta_id, nombre, jaccard in recetas]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['id']:>8}  {fila['nombre']}  ({fila['similitud']:.0%})" for fila in filas
+    ))
+
+
+def comando_substitute(recetario, args):
+    """Sustitutos de un ingrediente y, con --despensa, las recetas que pasan a ser cocinables"""
+    datos = {'sustitutos': [
+        {'ingrediente': nombre, 'puntuacion': puntuacion}
+        for nombre, puntuacion in recetario.sustitutos(args.ingrediente, args.limite)
+    ]}
+    if args.despensa:
+        recetas = recetario.recetas_con_sustitucion(list(despensa_desde_texto(args.despensa)), args.ingrediente,
+                                                    args.por, args.dieta)
+        datos['recetas'] = [{'id': receta_id, 'nombre': nombre} for receta_id, nombre, _ in recetas]
+
+    def formatear(datos):
+        for sustituto in datos['sustitutos']:
+            yield f"sustituto: {sustituto['ingrediente']}  ({sustituto['puntuacion']:g})"
+        for receta in datos.get('recetas', ()):
+            yield f"{receta['id']:>8}  {receta['nombre']}"
+
+    _imprimir(datos, args.json, formatear)
+
+
+def _porciones(argumentos, multiplicador):
+    """Convertir ['1', '2:3'] en {1: multiplicador, 2: 3 * multiplicador}"""
+    porciones = {}
+    for argumento in argumentos:
+        receta_id, _, cantidad = argumento.partition(':')
+        receta_id = int(receta_id)
+        porciones[receta_id] = porciones.get(receta_id, 0) + (float(cantidad) if cantidad else 1) * multiplicador
+    return porciones
+
+
+def comando_plan(recetario, args):
+    """Menú semanal ajustado a objetivos nutricionales diarios, aprovechando la despensa"""
+    from planificador import OBJETIVOS_DIARIOS, porciones
+
+    objetivos = dict(OBJETIVOS_DIARIOS, **_limites(args.objetivo))
+    despensa = despensa_desde_texto(args.despensa) if args.despensa else None
+    plan = recetario.planificar_semana(args.dias, args.comidas, objetivos, args.dieta, set(despensa or ()),
+                                       semilla=args.semilla)
+    datos = {
+        'dias': [
+            {
+                'comidas': [{'id': receta_id, 'nombre': plan['nombres'].get(receta_id), 'fraccion': fraccion}
+                            for receta_id, fraccion in comidas],
+                'totales': {n: round(v, 2) for n, v in totales.items()},
+            }
+            for comidas, totales in zip(plan['comidas'], plan['totales'])
+        ],
+        'objetivos': plan['objetivos'],
+        'coste': round(plan['coste'], 4),
+        'cobertura_despensa': round(plan['cobertura'], 3),
+        'segundos': plan['segundos'],
+    }
+    if args.lista_compras:
+        datos['lista_compras'] = [
+            {'ingrediente': nombre, 'a_comprar': round(comprar, 2)}
+            for nombre, _, _, comprar, _ in recetario.lista_compras(porciones(plan), despensa)
+            if comprar > 0
+        ]
+
+    def formatear(datos):
+        for numero, dia in enumerate(datos['dias'], 1):
+            yield f"Día {numero}: " + '  '.join(f"{n}={dia['totales'][n]:.0f}" for n in datos['objetivos'])
+            for comida in dia['comidas']:
+                yield f"  {comida['id']:>8}  {comida['nombre']}  (x{comida['fraccion']:g})"
+        for fila in datos.get('lista_compras', ()):
+            yield f"comprar: {fila['ingrediente']}: {fila['a_comprar']:g} gramos"
+
+    _imprimir(datos, args.json, formatear)
+
+
+def comando_shopping_list(recetario, args):
+    """Lista de compras agregada de varias recetas, escalada y descontando la despensa"""
+    despensa = despensa_desde_texto(args.despensa) if args.despensa else None
+    filas = recetario.lista_compras(_porciones(args.recetas, args.porciones), despensa)
+    if not args.todo:
+        filas = [fila for fila in filas if fila[3] > 0]
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as archivo:
+            escribir_lista_compras_csv(filas, archivo)
+
+    datos = [
+        {'ingrediente': nombre, 'necesario': necesario, 'en_despensa': en_despensa, 'a_comprar': comprar,
+         'recetas': recetas}
+        for nombre, necesario, en_despensa, comprar, recetas in filas
+    ]
+    _imprimir(datos, args.json, lambda filas: (
+        f"{fila['ingrediente']}: {fila['a_comprar']:g} gramos" for fila in filas
+    ))
+
+
+def comando_import(recetario, args):
+    """Importar un catálogo CSV/JSONL por bloques, reanudando si se interrumpió"""
+    from importador import ImportadorCatalogo
+
+    def mostrar_progreso(informe):
+        print(f"\r{informe.omitidos + informe.procesados} registros "
+              f"({informe.filas_por_segundo:.0f}/s)", end='', file=sys.stderr)
+
+    importador = ImportadorCatalogo(recetario.conn, args.bloque, mostrar_progreso)
+    if args.tipo == 'ingredientes':
+        informe = importador.importar_ingredientes(args.ruta, not args.desde_cero)
+    else:
+        informe = importador.importar_recetas(args.ruta, not args.desde_cero)
+    recetario.invalidar()
+    print(file=sys.stderr)
+    print(json.dumps(informe.como_dict(), ensure_ascii=False, indent=2))
+
+
+def comando_cards(recetario, args):
+    """Exportar tarjetas nutricionales PNG/SVG de muchas recetas con un pool de procesos"""
+    from graficos import exportar_tarjetas
+
+    if args.todas:
+        receta_ids = [fila[0] for fila in recetario.conn.execute('SELECT id FROM recetas ORDER BY id')]
+    else:
+        receta_ids = args.recetas
+
+    def mostrar_progreso(hechas, total):
+        print(f"\r{hechas}/{total} tarjetas", end='', file=sys.stderr)
+
+    informe = exportar_tarjetas(args.db, receta_ids, args.directorio, args.formato, args.procesos,
+                                progreso=mostrar_progreso)
+    print(file=sys.stderr)
+    print(json.dumps(informe, ensure_ascii=False, indent=2))
+
+
+def _formatear_mantenimiento(informe):
+    espacio = informe['espacio']
+    yield "Huérfanos recolectados: " + ', '.join(f"{k}={v}" for k, v in informe['huerfanos'].items())
+    yield f"Claves foráneas incumplidas: {len(informe['claves_foraneas_incumplidas'])}"
+    yield f"Índice de texto reconstruido: {'sí' if informe['indice_texto_reconstruido'] else 'no'}"
+    yield (f"Espacio: {espacio['antes']['bytes'] + espacio['antes']['bytes_wal']} -> "
+           f"{espacio['despues']['bytes'] + espacio['despues']['bytes_wal']} bytes "
+           f"({espacio['bytes_recuperados']} recuperados, {espacio['bytes_analisis']} añadidos por ANALYZE y reparaciones, "
+           f"compactación: {informe['compactacion'] or 'omitida'})")
+    for latencia in informe['latencias']:
+        yield f"  {latencia['consulta']}: {latencia['antes_ms']:.3f} -> {latencia['despues_ms']:.3f} ms"
+
+
+def comando_maintenance(recetario, args):
+    """Recolectar huérfanos, comprobar claves foráneas, ANALYZE y VACUUM incremental"""
+    from mantenimiento import ejecutar_mantenimiento
+
+    informe = ejecutar_mantenimiento(recetario.conn, vacuum=not args.sin_vacuum)
+    recetario.invalidar()
+    _imprimir(informe, args.json, _formatear_mantenimiento)
+
+
+def comando_snapshot(recetario, args):
+    """Exportar o comprobar la instantánea columnar que acelera el arranque en frío"""
+    from instantanea import comprobar, leer_manifiesto
+
+    directorio = args.directorio or recetario.ruta_instantanea or args.db + '.instantanea'
+    if args.accion == 'export':
+        datos = recetario.exportar_instantanea(directorio)
+    else:
+        motivo = comprobar(directorio, recetario.conn, args.verificar)
+        datos = {'directorio': directorio, 'al_dia': motivo is None, 'motivo': motivo,
+                 'manifiesto': leer_manifiesto(directorio)}
+
+    def formatear(datos):
+        if args.accion == 'export':
+            yield (f"{datos['recetas']} recetas, {datos['ingredientes']} ingredientes y {datos['lineas']} líneas "
+                   f"(versión de datos {datos['version_datos']}) en {datos['segundos']:.2f} s")
+            yield f"{sum(a['bytes'] for a in datos['archivos'].values()) / 1e6:.1f} MB en {directorio}"
+        else:
+            yield f"{datos['directorio']}: " + ('al día' if datos['al_dia'] else datos['motivo'])
+
+    _imprimir(datos, args.json, formatear)
+
+
+def comando_serve(recetario, args):
+    """Servicio HTTP/JSON local para varios terminales, con un pool de conexiones de lectura"""
+    from servicio import servir
+
+    def al_arrancar(servidor):
+        host, puerto = servidor.server_address[:2]
+        print(f"Recetario en http://{host}:{puerto} con {args.lectores} lectores (Ctrl+C para parar)",
+              file=sys.stderr, flush=True)
+
+    servir(args.db, args.host, args.puerto, args.lectores, instantanea=False if args.sin_instantanea else None,
+           registrar_peticiones=args.registro, al_arrancar=al_arrancar)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Recetario Inteligente sin interfaz gráfica")
+    parser.add_argument('--db', default='recetario.db', help="Base de datos SQLite")
+    parser.add_argument('--tiempos', action='store_true', help="Informar de tiempos de arranque y ejecución")
+    parser.add_argument('--sin-instantanea', action='store_true', help="Leer siempre de SQLite aunque haya instantánea")
+    parser.add_argument('--metricas', choices=['json', 'prometheus'], help="Volcar las métricas por stderr al terminar")
+    parser.add_argument('--consultas-lentas', type=float, metavar='MS',
+                        help="Registrar con su plan las sentencias que tarden más de MS milisegundos")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    search = subparsers.add_parser('search', help=comando_search.__doc__)
+    search.add_argument('ingredientes', nargs='+', help="Ingredientes disponibles (separados por espacio o coma)")
+    search.add_argument('--dieta', default='Todos')
+    search.add_argument('--faltantes', type=int, default=0, help="Ingredientes que pueden faltar")
+    search.add_argument('--limite', type=int, default=50)
+    search.add_argument('--json', action='store_true')
+    search.set_defaults(funcion=comando_search)
+
+    ingredients = subparsers.add_parser('ingredients', help=comando_ingredients.__doc__)
+    ingredients.add_argument('texto', nargs='+', help="Nombres escritos a mano (separados por espacio o coma)")
+    ingredients.add_argument('--completar', action='store_true', help="Tratar el texto como el principio de un nombre")
+    ingredients.add_argument('--limite', type=int, default=5)
+    ingredients.add_argument('--json', action='store_true')
+    ingredients.set_defaults(funcion=comando_ingredients)
+
+    nutrition = subparsers.add_parser('nutrition', help=comando_nutrition.__doc__)
+    nutrition.add_argument('recetas', nargs='+', type=int, help="Ids de receta")
+    nutrition.add_argument('--json', action='store_true')
+    nutrition.set_defaults(funcion=comando_nutrition)
+
+    text = subparsers.add_parser('text', help=comando_text.__doc__)
+    text.add_argument('texto')
+    text.add_argument('--dieta', default='Todos')
+    text.add_argument('--despensa', help="Existencias, p. ej. 'arroz:500, sal' (solo cuentan los nombres)")
+    text.add_argument('--faltantes', type=int, default=0, help="Ingredientes que pueden faltar")
+    text.add_argument('--limite', type=int, default=20)
+    text.add_argument('--json', action='store_true')
+    text.set_defaults(funcion=comando_text)
+
+    filtrar = subparsers.add_parser('filter', help=comando_filter.__doc__)
+    filtrar.add_argument('--min', action='append', default=[], metavar='NUTRIENTE=VALOR')
+    filtrar.add_argument('--max', action='append', default=[], metavar='NUTRIENTE=VALOR')
+    filtrar.add_argument('--dieta', default='Todos')
+    filtrar.add_argument('--limite', type=int, default=50)
+    filtrar.add_argument('--json', action='store_true')
+    filtrar.set_defaults(funcion=comando_filter)
+
+    similar = subparsers.add_parser('similar', help=comando_similar.__doc__)
+    similar.add_argument('receta', type=int, help="Id de receta")
+    similar.add_argument('--limite', type=int, default=10)
+    similar.add_argument('--json', action='store_true')
+    similar.set_defaults(funcion=comando_similar)
+
+    substitute = subparsers.add_parser('substitute', help=comando_substitute.__doc__)
+    substitute.add_argument('ingrediente', help="Ingrediente que se quiere sustituir")
+    substitute.add_argument('--por', help="Sustituto concreto (cuenta como disponible)")
+    substitute.add_argument('--despensa', help="Existencias, p. ej. 'arroz:500, sal' (solo cuentan los nombres)")
+    substitute.add_argument('--dieta', default='Todos')
+    substitute.add_argument('--limite', type=int, default=5, help="Número de sustitutos sugeridos")
+    substitute.add_argument('--json', action='store_true')
+    substitute.set_defaults(funcion=comando_substitute)
+
+    plan = subparsers.add_parser('plan', help=comando_plan.__doc__)
+    plan.add_argument('--dias', type=int, default=7)
+    plan.add_argument('--comidas', type=int, default=3, help="Comidas por día")
+    plan.add_argument('--objetivo', action='append', default=[], metavar='NUTRIENTE=VALOR',
+                      help="Objetivo diario (fibra es un mínimo y sodio un máximo)")
+    plan.add_argument('--dieta', default='Todos')
+    plan.add_argument('--despensa', help="Existencias, p. ej. 'arroz:500, sal'")
+    plan.add_argument('--semilla', type=int, help="Variar el plan entre ejecuciones")
+    plan.add_argument('--lista-compras', action='store_true', help="Añadir la lista de compras del plan")
+    plan.add_argument('--json', action='store_true')
+    plan.set_defaults(funcion=comando_plan)
+
+    shopping_list = subparsers.add_parser('shopping-list', help=comando_shopping_list.__doc__)
+    shopping_list.add_argument('recetas', nargs='+', help="Ids de receta, opcionalmente ID:PORCIONES")
+    shopping_list.add_argument('--porciones', type=float, default=1, help="Multiplicador aplicado a todas las recetas")
+    shopping_list.add_argument('--despensa', help="Existencias, p. ej. 'arroz:500, sal' (sin cantidad: hay de sobra)")
+    shopping_list.add_argument('--todo', action='store_true', help="Incluir también lo que no hace falta comprar")
+    shopping_list.add_argument('--csv', metavar='RUTA', help="Guardar además la lista en CSV")
+    shopping_list.add_argument('--json', action='store_true')
+    shopping_list.set_defaults(funcion=comando_shopping_list)
+
+    importar = subparsers.add_parser('import', help=comando_import.__doc__)
+    importar.add_argument('tipo', choices=['ingredientes', 'recetas'])
+    importar.add_argument('ruta', help="Archivo .csv o .jsonl")
+    importar.add_argument('--bloque', type=int, default=5000, help="Registros por transacción")
+    importar.add_argument('--desde-cero', action='store_true', help="Ignorar el progreso guardado")
+    importar.set_defaults(funcion=comando_import)
+
+    cards = subparsers.add_parser('cards', help=comando_cards.__doc__)
+    cards.add_argument('recetas', nargs='*', type=int, help="Ids de receta")
+    cards.add_argument('--todas', action='store_true', help="Todas las recetas del catálogo")
+    cards.add_argument('--directorio', default='tarjetas')
+    cards.add_argument('--formato', choices=['png', 'svg'], default='png')
+    cards.add_argument('--procesos', type=int, help="Procesos del pool (por defecto, uno por CPU)")
+    cards.set_defaults(funcion=comando_cards)
+
+    mantenimiento = subparsers.add_parser('maintenance', help=comando_maintenance.__doc__)
+    mantenimiento.add_argument('--sin-vacuum', action='store_true', help="No compactar el archivo")
+    mantenimiento.add_argument('--json', action='store_true')
+    mantenimiento.set_defaults(funcion=comando_maintenance)
+
+    snapshot = subparsers.add_parser('snapshot', help=comando_snapshot.__doc__)
+    snapshot.add_argument('accion', choices=['export', 'check'])
+    snapshot.add_argument('--directorio', help="Por defecto, junto a la base de datos (<db>.instantanea)")
+    snapshot.add_argument('--verificar', action='store_true', help="Recalcular las sumas SHA-256 de los archivos")
+    snapshot.add_argument('--json', action='store_true')
+    snapshot.set_defaults(funcion=comando_snapshot)
+
+    serve = subparsers.add_parser('serve', help=comando_serve.__doc__)
+    serve.add_argument('--host', default='127.0.0.1', help="Solo local por defecto")
+    serve.add_argument('--puerto', type=int, default=8765, help="0 para elegir uno libre")
+    serve.add_argument('--lectores', type=int, default=4, help="Conexiones de solo lectura del pool")
+    serve.add_argument('--registro', action='store_true', help="Registrar cada petición por stderr")
+    serve.set_defaults(funcion=comando_serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    if args.consultas_lentas is not None:
+        activar_consultas_lentas(args.consultas_lentas)
+    recetario = Recetario(args.db, instantanea=False if args.sin_instantanea else None)
+    arranque = time.perf_counter()
+
+    args.funcion(recetario, args)
+    fin = time.perf_counter()
+
+    if args.tiempos:
+        print(f"arranque: {(arranque - _INICIO) * 1000:.1f} ms, "
+              f"comando: {(fin - arranque) * 1000:.1f} ms", file=sys.stderr)
+    if args.metricas == 'json':
+        print(METRICAS.como_json(), file=sys.stderr)
+    elif args.metricas == 'prometheus':
+        print(METRICAS.como_prometheus(), end='', file=sys.stderr)
+    recetario.cerrar()
+
+
+if __name__ == '__main__':
+    main()
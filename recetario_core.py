@@ -0,0 +1,652 @@
+"""Núcleo del recetario sin dependencias gráficas
+
+Conexión, esquema, búsqueda por despensa, cálculo nutricional, similitud y
+lista de compras. Los nombres de la despensa se resuelven con tolerancia
+("Tomates" -> "tomate"). Si junto a la base de datos hay una instantánea
+columnar al día (módulo `instantanea`), el índice de despensa, el motor
+nutricional y el planificador se cargan de ella con mmap en vez de leer SQLite.
+Se puede importar sin tkinter ni matplotlib; NumPy solo se carga la primera
+vez que se necesita el motor nutricional, el índice de nombres o la instantánea.
+"""
+import csv
+import os
+import pathlib
+import sqlite3
+from bisect import bisect_right
+
+from indice_despensa import IndiceDespensa
+from instrumentacion import ConexionInstrumentada, operacion
+from migraciones import NUTRIENTES, aplicar_migraciones, configurar_conexion
+from similitud import actualizar_recetas
+
+# Longitud de la vista previa de instrucciones en listados
+LONGITUD_VISTA_PREVIA = 200
+
+# Datos de ejemplo: (nombre, calorías, proteínas, carbohidratos, grasas, fibra, sodio) por 100 g
+INGREDIENTES_EJEMPLO = [
+    ("pollo", 165, 31, 0, 3.6, 0, 74),
+    ("arroz", 130, 2.7, 28, 0.3, 0.4, 1),
+    ("tomate", 18, 0.9, 3.9, 0.2, 1.2, 5),
+    ("aceite de oliva", 884, 0, 0, 100, 0, 0),
+    ("cebolla", 40, 1.1, 9.3, 0.1, 1.7, 4),
+    ("ajo", 149, 6.4, 33.1, 0.5, 2.1, 17)
+]
+RECETAS_EJEMPLO = [
+    (
+        "Arroz con Pollo",
+        "Todos",
+        "1. Cortar el pollo\n2. Cocinar arroz\n3. Agregar tomate y cebolla\n4. Mezclar y servir",
+        [
+            {"nombre": "pollo", "cantidad": 200},
+            {"nombre": "arroz", "cantidad": 150},
+            {"nombre": "tomate", "cantidad": 50},
+            {"nombre": "cebolla", "cantidad": 30},
+            {"nombre": "aceite de oliva", "cantidad": 10}
+        ]
+    ),
+]
+
+
+def despensa_desde_texto(texto):
+    """Convertir "arroz:500, pollo, sal" en {'arroz': 500.0, 'pollo': None, 'sal': None}
+
+    Un ingrediente sin cantidad se considera disponible en cantidad suficiente.
+    """
+    despensa = {}
+    for parte in texto.split(','):
+        nombre, _, cantidad = parte.partition(':')
+        if nombre.strip():
+            despensa[nombre.strip()] = float(cantidad) if cantidad.strip() else None
+    return despensa
+
+
+def escribir_lista_compras_csv(filas, archivo):
+    """Escribir filas de `Recetario.lista_compras` en un archivo CSV abierto"""
+    escritor = csv.writer(archivo)
+    escritor.writerow(['ingrediente', 'necesario_g', 'en_despensa_g', 'a_comprar_g', 'recetas'])
+    escritor.writerows(filas)
+
+
+def conectar(ruta='recetario.db', entre_hilos=False):
+    """Abrir la base de datos (instrumentada) con los pragmas de rendimiento y el esquema al día
+
+    Con `entre_hilos`, la conexión se puede usar desde otros hilos siempre que
+    sea de uno en uno (quien la comparta debe serializar el acceso).
+    """
+    conn = configurar_conexion(sqlite3.connect(ruta, factory=ConexionInstrumentada, check_same_thread=not entre_hilos))
+    aplicar_migraciones(conn)
+    return conn
+
+
+def conectar_lectura(ruta='recetario.db'):
+    """Conexión de solo lectura (sin migraciones) que se puede pasar entre hilos, de uno en uno
+
+    En modo WAL puede leer mientras otra conexión escribe; las tablas
+    temporales (lista de compras) siguen funcionando.
+    """
+    uri = pathlib.Path(ruta).resolve().as_uri() + '?mode=ro'
+    return configurar_conexion(sqlite3.connect(uri, uri=True, factory=ConexionInstrumentada, check_same_thread=False))
+
+
+class Recetario:
+    """Operaciones de datos del recetario sobre una conexión SQLite"""
+
+    def __init__(self, ruta='recetario.db', conn=None, instantanea=None):
+        self.conn = conn if conn is not None else conectar(ruta)
+
+        # Directorio de la instantánea columnar: por defecto, junto a la base de datos; False para no usarla
+        if instantanea is None and conn is None:
+            instantanea = ruta + '.instantanea'
+        self.ruta_instantanea = instantanea or None
+
+        # Estructuras en memoria (se cargan al primer uso); la instantánea es False si no sirve
+        self._instantanea = None
+        self._indice = None
+        self._indice_nombres = None
+        self._motor_nutricional = None
+        self._planificador = None
+
+        # Ids de la última búsqueda, para paginarla sin repetirla
+        self._ultima_busqueda = None
+
+        # Tablas temporales de la lista de compras ya creadas en esta conexión
+        self._tablas_temporales = False
+
+    @property
+    def instantanea(self):
+        """Instantánea columnar al día con la base de datos, o None si no hay o está desfasada"""
+        if self._instantanea is None:
+            self._instantanea = False
+            if self.ruta_instantanea and os.path.isdir(self.ruta_instantanea):
+                from instantanea import abrir
+                self._instantanea = abrir(self.ruta_instantanea, self.conn) or False
+        return self._instantanea or None
+
+    @property
+    def indice(self):
+        """Índice en memoria para búsquedas por despensa"""
+        if self._indice is None:
+            instantanea = self.instantanea
+            if instantanea is not None:
+                self._indice = instantanea.indice()
+            else:
+                self._indice = IndiceDespensa.desde_conexion(self.conn)
+        return self._indice
+
+    @property
+    def indice_nombres(self):
+        """Nombres de ingredientes por clave normalizada, trigramas y prefijo"""
+        if self._indice_nombres is None:
+            from autocompletado import IndiceNombres
+            self._indice_nombres = IndiceNombres.desde_conexion(self.conn)
+        return self._indice_nombres
+
+    @property
+    def motor_nutricional(self):
+        """Motor nutricional por lotes"""
+        if self._motor_nutricional is None:
+            instantanea = self.instantanea
+            if instantanea is not None:
+                self._motor_nutricional = instantanea.motor_nutricional()
+            else:
+                from nutricion import MotorNutricional
+                self._motor_nutricional = MotorNutricional.desde_conexion(self.conn)
+        return self._motor_nutricional
+
+    @property
+    def planificador(self):
+        """Vectores nutricionales de todas las recetas para planificar menús"""
+        if self._planificador is None:
+            instantanea = self.instantanea
+            if instantanea is not None:
+                self._planificador = instantanea.planificador()
+            else:
+                from planificador import Planificador
+                self._planificador = Planificador.desde_conexion(self.conn)
+        return self._planificador
+
+    def invalidar(self):
+        """Descartar las estructuras en memoria tras escrituras externas (p. ej. una importación)"""
+        self._instantanea = None
+        self._indice = None
+        self._indice_nombres = None
+        self._motor_nutricional = None
+        self._planificador = None
+        self._ultima_busqueda = None
+
+    def _descartar_instantanea(self):
+        """Tras escribir, lo que venía de la instantánea ya no vale (el índice columnar no se actualiza)"""
+        if self._instantanea:
+            self._instantanea = False
+            self._indice = None
+
+    def exportar_instantanea(self, directorio=None):
+        """Escribir la instantánea columnar del catálogo (por defecto en `ruta_instantanea`) y devolver su manifiesto"""
+        from instantanea import exportar
+
+        directorio = directorio or self.ruta_instantanea
+        if not directorio:
+            raise ValueError("No se ha indicado el directorio de la instantánea")
+        manifiesto = exportar(self.conn, directorio)
+        if directorio == self.ruta_instantanea:
+            self._instantanea = None
+        return manifiesto
+
+    def cerrar(self):
+        self.conn.close()
+
+    @operacion('escritura_ingrediente')
+    def agregar_ingrediente(self, nombre, calorias, proteinas, carbohidratos, grasas, fibra, sodio):
+        """Agregar o actualizar un ingrediente; su id se mantiene estable
+
+        Si el ingrediente ya existe con los mismos valores no se escribe nada.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('''
+            INSERT INTO ingredientes (nombre, {columnas})
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(nombre) DO UPDATE SET {actualizar}
+            WHERE {cambios}
+            '''.format(
+                columnas=', '.join(NUTRIENTES),
+                actualizar=', '.join(f'{n} = excluded.{n}' for n in NUTRIENTES),
+                cambios=' OR '.join(f'{n} IS NOT excluded.{n}' for n in NUTRIENTES)
+            ), (nombre, calorias, proteinas, carbohidratos, grasas, fibra, sodio))
+            cambiado = cursor.rowcount > 0
+
+            cursor.execute('SELECT id FROM ingredientes WHERE nombre = ?', (nombre,))
+            ingrediente_id = cursor.fetchone()[0]
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        if cambiado:
+            self._descartar_instantanea()
+            if self._indice is not None:
+                self._indice.agregar_ingrediente(nombre, ingrediente_id)
+            if self._indice_nombres is not None:
+                self._indice_nombres.agregar(ingrediente_id, nombre)
+            self._motor_nutricional = None
+            self._planificador = None
+            self._ultima_busqueda = None
+        return ingrediente_id
+
+    @operacion('escritura_receta')
+    def agregar_receta(self, nombre, tipo_dieta, instrucciones, ingredientes):
+        """Agregar o actualizar una receta por nombre, sustituyendo sus ingredientes
+
+        El id de una receta existente se conserva y sus líneas se reemplazan en
+        la misma transacción (solo se escriben las que cambian), así que repetir
+        la misma llamada no modifica nada. Las cantidades de un ingrediente
+        repetido se suman.
+        """
+        cantidades = {}
+        for ingrediente in ingredientes:
+            cantidades[ingrediente['nombre']] = cantidades.get(ingrediente['nombre'], 0) + ingrediente['cantidad']
+
+        cursor = self.conn.cursor()
+        try:
+            # Resolver todos los ingredientes antes de escribir
+            ids_por_nombre = {}
+            nombres = list(cantidades)
+            for inicio in range(0, len(nombres), 900):
+                bloque = nombres[inicio:inicio + 900]
+                cursor.execute('SELECT nombre, id FROM ingredientes WHERE nombre IN ({})'.format(
+                    ','.join(['?'] * len(bloque))), bloque)
+                ids_por_nombre.update(cursor.fetchall())
+            for nombre_ingrediente in nombres:
+                if nombre_ingrediente not in ids_por_nombre:
+                    raise ValueError(f"Ingrediente desconocido: {nombre_ingrediente}")
+            lineas = {ids_por_nombre[n]: cantidad for n, cantidad in cantidades.items()}
+
+            cursor.execute('''
+            INSERT INTO recetas (nombre, tipo_dieta, instrucciones) VALUES (?, ?, ?)
+            ON CONFLICT(nombre) DO UPDATE SET tipo_dieta = excluded.tipo_dieta, instrucciones = excluded.instrucciones
+            WHERE tipo_dieta IS NOT excluded.tipo_dieta OR instrucciones IS NOT excluded.instrucciones
+            ''', (nombre, tipo_dieta, instrucciones))
+            cambiado = cursor.rowcount > 0
+
+            cursor.execute('SELECT id FROM recetas WHERE nombre = ?', (nombre,))
+            receta_id = cursor.fetchone()[0]
+
+            # Sustituir las líneas: borrar las que sobran y escribir las nuevas o modificadas
+            cursor.execute('SELECT ingrediente_id, cantidad FROM receta_ingredientes WHERE receta_id = ?', (receta_id,))
+            actuales = dict(cursor.fetchall())
+            sobrantes = [(receta_id, i) for i in actuales if i not in lineas]
+            nuevas = [(receta_id, i, cantidad) for i, cantidad in lineas.items() if actuales.get(i) != cantidad]
+
+            cursor.executemany('DELETE FROM receta_ingredientes WHERE receta_id = ? AND ingrediente_id = ?', sobrantes)
+            cursor.executemany('''
+            INSERT INTO receta_ingredientes (receta_id, ingrediente_id, cantidad) VALUES (?, ?, ?)
+            ON CONFLICT(receta_id, ingrediente_id) DO UPDATE SET cantidad = excluded.cantidad
+            ''', nuevas)
+
+            # Firma de similitud al día en la misma transacción (si solo cambian cantidades no hace falta)
+            if sobrantes or any(i not in actuales for _, i, _ in nuevas):
+                actualizar_recetas(cursor, [receta_id])
+            self.conn.commit()
+        except (sqlite3.Error, ValueError):
+            self.conn.rollback()
+            raise
+
+        if cambiado or sobrantes or nuevas:
+            self._descartar_instantanea()
+            # Actualizar el índice de despensa de forma incremental
+            if self._indice is not None:
+                self._indice.eliminar_receta(receta_id)
+                self._indice.agregar_receta(receta_id, tipo_dieta, list(lineas))
+            self._motor_nutricional = None
+            self._planificador = None
+            self._ultima_busqueda = None
+        return receta_id
+
+    def sembrar_ejemplos(self):
+        """Cargar los ingredientes y la receta de ejemplo; se puede repetir sin efectos"""
+        for ingrediente in INGREDIENTES_EJEMPLO:
+            self.agregar_ingrediente(*ingrediente)
+        for receta in RECETAS_EJEMPLO:
+            self.agregar_receta(*receta)
+
+    def _canonicos(self, nombres):
+        """{nombre escrito: ingrediente conocido con la misma clave, o el nombre tal cual}
+
+        Los nombres exactos se comprueban en SQLite, así que una búsqueda con
+        nombres ya correctos no construye el índice de nombres (ni carga NumPy).
+        """
+        nombres = set(nombres)
+        pendientes = nombres
+        if self._indice_nombres is None:
+            pendientes = nombres - self._nombres_existentes(nombres)
+        resueltos = {nombre: nombre for nombre in nombres - pendientes}
+        for nombre in pendientes:
+            resueltos[nombre] = self.indice_nombres.canonico(nombre)
+        return resueltos
+
+    def _nombres_existentes(self, nombres):
+        cursor = self.conn.cursor()
+        existentes = set()
+        nombres = list(nombres)
+        for inicio in range(0, len(nombres), 900):
+            bloque = nombres[inicio:inicio + 900]
+            cursor.execute('SELECT nombre FROM ingredientes WHERE nombre IN ({})'.format(
+                ','.join(['?'] * len(bloque))), bloque)
+            existentes.update(fila[0] for fila in cursor.fetchall())
+        return existentes
+
+    def resolver_despensa(self, nombres):
+        """Nombres de ingredientes conocidos para lo escrito a mano ("Tomates", "aceite oliva")
+
+        Solo se corrige la forma (mayúsculas, tildes, plurales, palabras vacías);
+        lo que no coincide con ningún ingrediente se deja igual y no coincidirá
+        con nada. Para erratas, `resolver_ingredientes` propone candidatos.
+        """
+        return set(self._canonicos(nombres).values())
+
+    @operacion('resolver_ingredientes')
+    def resolver_ingredientes(self, nombres, limite=5):
+        """Candidatos para cada nombre escrito: {nombre: [(id, ingrediente, puntuación)]}"""
+        return {nombre: self.indice_nombres.resolver(nombre, limite) for nombre in nombres}
+
+    @operacion('autocompletado')
+    def completar_ingrediente(self, texto, limite=8):
+        """Ingredientes que empiezan por `texto` (o, si no hay, los más parecidos)"""
+        return self.indice_nombres.completar(texto, limite)
+
+    @operacion('busqueda')
+    def encontrar_recetas(self, ingredientes_disponibles, tipo_dieta="Todos"):
+        """Encontrar recetas según ingredientes disponibles y tipo de dieta"""
+        ingredientes_disponibles = self.resolver_despensa(ingredientes_disponibles)
+        receta_ids = self.indice.recetas_cocinables(ingredientes_disponibles, tipo_dieta)
+        return self.obtener_recetas(receta_ids)
+
+    @operacion('busqueda_pagina', filas=lambda pagina: len(pagina[0]))
+    def buscar_pagina(self, ingredientes_disponibles, tipo_dieta="Todos", despues_de=None, limite=200):
+        """Una página de recetas cocinables con paginación por clave (ids mayores que `despues_de`)
+
+        Devuelve (filas, hay_mas). Cada fila es (id, nombre, vista previa de las
+        instrucciones, instrucciones truncadas); el texto completo se pide aparte
+        con `obtener_receta`.
+        """
+        ingredientes_disponibles = self.resolver_despensa(ingredientes_disponibles)
+        clave = (frozenset(ingredientes_disponibles), tipo_dieta)
+        if self._ultima_busqueda is None or self._ultima_busqueda[0] != clave:
+            self._ultima_busqueda = (clave, self.indice.recetas_cocinables(ingredientes_disponibles, tipo_dieta))
+        receta_ids = self._ultima_busqueda[1]
+
+        inicio = 0 if despues_de is None else bisect_right(receta_ids, despues_de)
+        pagina = receta_ids[inicio:inicio + limite]
+
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, nombre, substr(instrucciones, 1, ?), length(instrucciones) > ?
+        FROM recetas
+        WHERE id IN ({})
+        ORDER BY id
+        '''.format(','.join(['?'] * len(pagina))), [LONGITUD_VISTA_PREVIA, LONGITUD_VISTA_PREVIA] + pagina)
+
+        filas = [(receta_id, nombre, vista_previa or '', bool(truncada))
+                 for receta_id, nombre, vista_previa, truncada in cursor.fetchall()]
+        return filas, inicio + limite < len(receta_ids)
+
+    @operacion('busqueda_cobertura')
+    def recetas_por_cobertura(self, ingredientes_disponibles, tipo_dieta="Todos", max_faltantes=1):
+        """Recetas a las que les faltan como máximo `max_faltantes` ingredientes, por cobertura"""
+        resultados = self.indice.buscar(self.resolver_despensa(ingredientes_disponibles), tipo_dieta, max_faltantes)
+        recetas = {receta[0]: receta for receta in self.obtener_recetas([r[0] for r in resultados])}
+
+        return [
+            recetas[receta_id] + (total - en_despensa, en_despensa / total)
+            for receta_id, en_despensa, total in resultados
+            if receta_id in recetas
+        ]
+
+    def obtener_recetas(self, receta_ids):
+        """Obtener (id, nombre, instrucciones) de las recetas indicadas, ordenadas por id"""
+        cursor = self.conn.cursor()
+        recetas = []
+
+        # Consultar por bloques para no superar el límite de parámetros de SQLite
+        receta_ids = list(receta_ids)
+        for inicio in range(0, len(receta_ids), 900):
+            bloque = receta_ids[inicio:inicio + 900]
+            cursor.execute(
+                'SELECT id, nombre, instrucciones FROM recetas WHERE id IN ({})'.format(','.join(['?'] * len(bloque))),
+                bloque
+            )
+            recetas.extend(cursor.fetchall())
+
+        recetas.sort()
+        return recetas
+
+    @operacion('detalle_recetas', filas=len)
+    def detalle_recetas(self, receta_ids):
+        """Receta completa de cada id que exista, por id: nombre, dieta, instrucciones e ingredientes"""
+        cursor = self.conn.cursor()
+        recetas = {}
+        receta_ids = list(receta_ids)
+        for inicio in range(0, len(receta_ids), 900):
+            bloque = receta_ids[inicio:inicio + 900]
+            marcadores = ','.join(['?'] * len(bloque))
+            cursor.execute(f'SELECT id, nombre, tipo_dieta, instrucciones FROM recetas WHERE id IN ({marcadores})', bloque)
+            for receta_id, nombre, tipo_dieta, instrucciones in cursor.fetchall():
+                recetas[receta_id] = {'id': receta_id, 'nombre': nombre, 'tipo_dieta': tipo_dieta,
+                                      'instrucciones': instrucciones, 'ingredientes': []}
+            cursor.execute(f'''
+            SELECT ri.receta_id, i.nombre, ri.cantidad
+            FROM receta_ingredientes ri
+            JOIN ingredientes i ON i.id = ri.ingrediente_id
+            WHERE ri.receta_id IN ({marcadores})
+            ORDER BY ri.receta_id, i.nombre
+            ''', bloque)
+            for receta_id, nombre, cantidad in cursor.fetchall():
+                if receta_id in recetas:
+                    recetas[receta_id]['ingredientes'].append({'nombre': nombre, 'cantidad': cantidad})
+        return [recetas[receta_id] for receta_id in sorted(recetas)]
+
+    @operacion('obtener_receta', filas=lambda receta: int(receta is not None))
+    def obtener_receta(self, receta_id):
+        """Nombre e instrucciones completas de una receta, o None si no existe"""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT nombre, instrucciones FROM recetas WHERE id = ?', (receta_id,))
+        return cursor.fetchone()
+
+    @operacion('nutricion_receta', filas=lambda resultado: len(resultado[1]))
+    def calcular_valor_nutricional_receta(self, receta_id):
+        """Calcular valor nutricional total de una receta"""
+        return self.motor_nutricional.calcular_receta(receta_id)
+
+    @operacion('nutricion_lote', filas=lambda resultado: len(resultado[0]))
+    def calcular_valor_nutricional_lote(self, recetas_ids):
+        """Calcular valores nutricionales de muchas recetas con un solo producto matricial"""
+        return self.motor_nutricional.calcular_lote(recetas_ids)
+
+    @operacion('analisis_consolidado', filas=lambda resultado: len(resultado[1]))
+    def analisis_consolidado(self, recetas_ids, top=10):
+        """Totales sumados de varias recetas y las `top` líneas de ingredientes con más calorías"""
+        motor = self.motor_nutricional
+        totales, _, columnas, aportes = motor.calcular_lote(recetas_ids)
+        totales_consolidados = dict(zip(NUTRIENTES, totales.sum(axis=0).tolist()))
+
+        orden = aportes[:, NUTRIENTES.index('calorias')].argsort()[::-1][:top]
+        return totales_consolidados, motor.desglose(columnas[orden], aportes[orden])
+
+    @operacion('busqueda_texto')
+    def buscar_texto(self, texto, tipo_dieta="Todos", ingredientes_disponibles=None, max_faltantes=0, limite=20):
+        """Buscar por texto en nombre e instrucciones (BM25, con fragmento resaltado)
+
+        Si se indican `ingredientes_disponibles`, solo se devuelven recetas a
+        las que les faltan como máximo `max_faltantes` ingredientes.
+        """
+        from busqueda_texto import buscar_texto
+
+        permitidas = None
+        if ingredientes_disponibles is not None:
+            despensa = self.resolver_despensa(ingredientes_disponibles)
+            permitidas = {r[0] for r in self.indice.buscar(despensa, tipo_dieta, max_faltantes)}
+        return buscar_texto(self.conn, texto, tipo_dieta, permitidas, limite)
+
+    @operacion('similitud')
+    def recetas_similares(self, receta_id, k=10):
+        """Las `k` recetas con más ingredientes en común con `receta_id` (Jaccard): (id, nombre, similitud)"""
+        from similitud import actualizar_pendientes, similares
+
+        actualizar_pendientes(self.conn)
+        # El índice de despensa ahorra leer las líneas de las candidatas, pero no se construye solo para esto
+        conjuntos = self._indice.ingredientes_por_receta if self._indice is not None else None
+        parecidas = similares(self.conn, receta_id, k, conjuntos)
+        nombres = {receta[0]: receta[1] for receta in self.obtener_recetas([r for r, _ in parecidas])}
+        return [(r, nombres[r], jaccard) for r, jaccard in parecidas if r in nombres]
+
+    @operacion('sustitutos')
+    def sustitutos(self, ingrediente, k=5):
+        """Ingredientes que suelen ocupar el lugar de `ingrediente` en recetas parecidas: (nombre, puntuación)"""
+        from similitud import actualizar_pendientes, sugerir_sustitutos
+
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id FROM ingredientes WHERE nombre = ?', (self._canonicos([ingrediente])[ingrediente],))
+        fila = cursor.fetchone()
+        if fila is None:
+            return []
+
+        actualizar_pendientes(self.conn)
+        conjuntos = self._indice.ingredientes_por_receta if self._indice is not None else None
+        sugeridos = sugerir_sustitutos(self.conn, fila[0], k, ingredientes_por_receta=conjuntos)
+        cursor.execute('SELECT id, nombre FROM ingredientes WHERE id IN ({})'.format(
+            ','.join(['?'] * len(sugeridos))), [i for i, _ in sugeridos])
+        nombres = dict(cursor.fetchall())
+        return [(nombres[i], puntuacion) for i, puntuacion in sugeridos]
+
+    @operacion('busqueda_sustitucion')
+    def recetas_con_sustitucion(self, ingredientes_disponibles, ingrediente, sustituto=None, tipo_dieta="Todos"):
+        """Recetas que pasan a ser cocinables sustituyendo `ingrediente` (por `sustituto`, si se indica)"""
+        canonicos = self._canonicos([ingrediente] + ([sustituto] if sustituto else []))
+        receta_ids = self.indice.recetas_con_sustitucion(
+            self.resolver_despensa(ingredientes_disponibles), canonicos[ingrediente],
+            canonicos[sustituto] if sustituto else None, tipo_dieta)
+        return self.obtener_recetas(receta_ids)
+
+    @operacion('plan_semanal', filas=lambda plan: sum(len(dia) for dia in plan['comidas']))
+    def planificar_semana(self, dias=7, comidas=3, objetivos=None, tipo_dieta="Todos", ingredientes_disponibles=None,
+                          **opciones):
+        """Plan de `dias` x `comidas` recetas distintas ajustado a los objetivos diarios
+
+        Favorece las recetas con más ingredientes en la despensa. Además de lo
+        que devuelve `Planificador.planificar`, el plan incluye el nombre de
+        cada receta en 'nombres'.
+        """
+        cobertura = None
+        if ingredientes_disponibles:
+            cobertura = self.indice.cobertura(self.resolver_despensa(ingredientes_disponibles), tipo_dieta)
+        plan = self.planificador.planificar(dias, comidas, objetivos, tipo_dieta, cobertura, **opciones)
+        receta_ids = [receta_id for dia in plan['comidas'] for receta_id, _ in dia]
+        plan['nombres'] = {receta[0]: receta[1] for receta in self.obtener_recetas(receta_ids)}
+        return plan
+
+    @operacion('filtro_nutricional')
+    def filtrar_por_nutricion(self, minimos=None, maximos=None, tipo_dieta="Todos", limite=100):
+        """Recetas cuyos totales están dentro de los rangos dados, p. ej. maximos={'calorias': 600}
+
+        Usa la tabla materializada receta_nutricion, así que cada rango es una
+        búsqueda por índice. Devuelve (id, nombre, *totales) ordenado por calorías.
+        """
+        condiciones = []
+        parametros = []
+        for operador, limites in (('>=', minimos or {}), ('<=', maximos or {})):
+            for nutriente, valor in limites.items():
+                if nutriente not in NUTRIENTES:
+                    raise ValueError(f"Nutriente desconocido: {nutriente}")
+                condiciones.append(f'n.{nutriente} {operador} ?')
+                parametros.append(valor)
+        if tipo_dieta != 'Todos':
+            condiciones.append('r.tipo_dieta = ?')
+            parametros.append(tipo_dieta)
+
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT r.id, r.nombre, {columnas}
+        FROM receta_nutricion n
+        JOIN recetas r ON r.id = n.receta_id
+        WHERE {condiciones}
+        ORDER BY n.calorias
+        LIMIT ?
+        '''.format(
+            columnas=', '.join(f'n.{n}' for n in NUTRIENTES),
+            condiciones=' AND '.join(condiciones) or '1'
+        ), parametros + [limite])
+        return cursor.fetchall()
+
+    @operacion('lista_compras')
+    def lista_compras(self, porciones, despensa=None):
+        """Lista de compras agregada con una sola consulta sobre tablas temporales
+
+        `porciones` es {receta_id: multiplicador} o una lista de ids (cada
+        aparición cuenta como una porción). `despensa` es {ingrediente: gramos
+        en casa}; None como cantidad significa que hay de sobra. Devuelve filas
+        (ingrediente, necesario, en despensa, a comprar, nº de recetas) por nombre.
+        """
+        if despensa:
+            # Dos entradas que resuelven al mismo ingrediente se suman ("tomate:100, tomates:50")
+            resuelta = {}
+            canonicos = self._canonicos(despensa)
+            for nombre, cantidad in despensa.items():
+                nombre = canonicos[nombre]
+                if nombre not in resuelta:
+                    resuelta[nombre] = cantidad
+                elif cantidad is None or resuelta[nombre] is None:
+                    resuelta[nombre] = None
+                else:
+                    resuelta[nombre] += cantidad
+            despensa = resuelta
+
+        if not isinstance(porciones, dict):
+            ids = porciones
+            porciones = {}
+            for receta_id in ids:
+                porciones[receta_id] = porciones.get(receta_id, 0) + 1
+
+        cursor = self.conn.cursor()
+        # Fuera de una transacción, CREATE se confirma en el acto y basta con hacerlo una vez por
+        # conexión; dentro de una del llamador, su rollback las borraría, así que se comprueban cada vez
+        if not self._tablas_temporales or self.conn.in_transaction:
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS lista_porciones (receta_id INTEGER PRIMARY KEY, multiplicador REAL)')
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS lista_despensa (nombre TEXT PRIMARY KEY, cantidad REAL)')
+            self._tablas_temporales = not self.conn.in_transaction
+
+        # Las filas temporales se insertan dentro de un savepoint que se deshace al final: las tablas
+        # quedan vacías y la transacción del llamador (escrituras pendientes o la instantánea de
+        # lectura del servicio) sigue como estaba
+        cursor.execute('SAVEPOINT lista_compras')
+        try:
+            cursor.executemany('INSERT INTO temp.lista_porciones VALUES (?, ?)', porciones.items())
+            cursor.executemany('INSERT OR REPLACE INTO temp.lista_despensa VALUES (?, ?)', (despensa or {}).items())
+
+            # Primero se agregan las líneas por ingrediente; nombres y despensa se cruzan solo con el resultado
+            cursor.execute('''
+            SELECT i.nombre, t.necesario, COALESCE(d.cantidad, 0),
+                   CASE WHEN d.nombre IS NOT NULL AND d.cantidad IS NULL THEN 0
+                        ELSE MAX(t.necesario - COALESCE(d.cantidad, 0), 0) END,
+                   t.recetas
+            FROM (
+                SELECT ri.ingrediente_id, SUM(ri.cantidad * p.multiplicador) AS necesario, COUNT(*) AS recetas
+                FROM temp.lista_porciones p
+                CROSS JOIN receta_ingredientes ri ON ri.receta_id = p.receta_id  -- CROSS fija el orden: se parte de las porciones
+                GROUP BY ri.ingrediente_id
+            ) t
+            JOIN ingredientes i ON i.id = t.ingrediente_id
+            LEFT JOIN temp.lista_despensa d ON d.nombre = i.nombre
+            ORDER BY i.nombre
+            ''')
+            return cursor.fetchall()
+        finally:
+            cursor.execute('ROLLBACK TO lista_compras')
+            cursor.execute('RELEASE lista_compras')
+
+    def generar_lista_compras(self, recetas, despensa=None):
+        """Generar lista de compras basada en recetas seleccionadas: {ingrediente: gramos a comprar}"""
+        return {
+            nombre: comprar
+            for nombre, _, _, comprar, _ in self.lista_compras(recetas, despensa)
+            if comprar > 0
+        }
@@ -0,0 +1,420 @@
+"""Servicio HTTP/JSON local para consultar el recetario desde varios terminales a la vez
+
+Cada petición de lectura toma prestado un `Recetario` de un pool de conexiones
+de solo lectura (en modo WAL se lee mientras otra conexión escribe) y las
+escrituras pasan por un único `Recetario` de escritura, de una en una. Los
+lectores notan las escrituras por el contador `version_datos` y descartan sus
+estructuras en memoria antes de la siguiente consulta. Si hay una instantánea
+columnar al día, todos los lectores la proyectan con mmap y comparten sus
+páginas; sin ella, cada lector construye su propio índice al primer uso.
+
+Cada escritura obliga a todos los lectores a recargar sus estructuras desde
+SQLite (y deja desfasada la instantánea): el servicio está pensado para
+consultas con ediciones esporádicas. Las cargas masivas van mejor con
+`recetario_cli.py import` seguido de `snapshot export`.
+
+    python recetario_cli.py serve --puerto 8765 --lectores 4
+
+Rutas (las POST reciben y todas devuelven JSON; los lotes admiten muchos ids por llamada):
+    GET  /salud
+    GET  /metricas                      métricas en formato Prometheus
+    GET  /recetas/<id>                  detalle de una receta con sus ingredientes
+    POST /recetas/detalle               {"ids": [1, 2, 3]}
+    POST /buscar                        {"ingredientes": [...], "dieta": "Todos", "faltantes": 0, "limite": 50}
+                                        o {"consultas": [{...}, {...}]} para varias búsquedas
+    POST /nutricion                     {"ids": [...], "desglose": false}
+    POST /lista-compras                 {"porciones": {"id": multiplicador} o [ids], "despensa": {"arroz": 500}}
+    POST /ingredientes                  {"ingredientes": [{"nombre": ..., "calorias": ..., ...}]}
+    POST /recetas                       {"recetas": [{"nombre", "tipo_dieta", "instrucciones", "ingredientes"}]}
+
+Los errores se devuelven como {"error": mensaje} con 400 (petición mal
+formada), 404, 413 (lote demasiado grande) o 503 (ningún lector libre a tiempo).
+"""
+import json
+import math
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from instrumentacion import METRICAS
+from migraciones import version_datos
+from recetario_core import NUTRIENTES, Recetario, conectar, conectar_lectura
+
+# Ids por lote y tamaño del cuerpo de una petición
+MAX_IDS = 5000
+MAX_CUERPO = 8 * 1024 * 1024
+
+# Segundos que una petición espera a que quede libre un lector
+ESPERA_LECTOR = 10
+
+RUTA_RECETA = re.compile(r'^/recetas/(\d+)$')
+
+# Rango de INTEGER en SQLite: un id fuera de él no puede existir
+MIN_ENTERO = -2 ** 63
+MAX_ENTERO = 2 ** 63 - 1
+
+
+class ErrorPeticion(Exception):
+    """Error que se devuelve al cliente con su código HTTP"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class PoolLectura:
+    """Recetarios sobre conexiones de solo lectura que se prestan a una petición cada vez"""
+
+    def __init__(self, ruta, tamano=4, instantanea=None):
+        if instantanea is None:
+            instantanea = ruta + '.instantanea'
+        self.tamano = tamano
+        self._libres = queue.LifoQueue()
+        # Versión de los datos con la que se cargó cada lector
+        self._versiones = {}
+        for _ in range(tamano):
+            lector = Recetario(ruta, conn=conectar_lectura(ruta), instantanea=instantanea)
+            self._versiones[id(lector)] = version_datos(lector.conn)
+            self._libres.put(lector)
+
+    @contextmanager
+    def prestar(self, espera=ESPERA_LECTOR):
+        """Lector libre (el último devuelto, que tiene la caché más caliente), al día con las escrituras"""
+        try:
+            lector = self._libres.get(timeout=espera)
+        except queue.Empty:
+            raise ErrorPeticion(503, "No hay lectores libres") from None
+        # Toda la petición lee dentro de una transacción: sus consultas y las estructuras
+        # que cargue (varias sentencias) ven la misma versión de los datos aunque se escriba a la vez
+        lector.conn.execute('BEGIN')
+        try:
+            version = version_datos(lector.conn)
+            if version != self._versiones[id(lector)]:
+                lector.invalidar()
+                self._versiones[id(lector)] = version
+            yield lector
+        finally:
+            lector.conn.rollback()
+            self._libres.put(lector)
+
+    def cerrar(self):
+        for _ in range(self.tamano):
+            self._libres.get().cerrar()
+
+
+def _entero(valor, campo):
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise ErrorPeticion(400, f"'{campo}' debe ser un entero")
+    if not MIN_ENTERO <= valor <= MAX_ENTERO:
+        raise ErrorPeticion(400, f"'{campo}' está fuera del rango de los enteros de SQLite")
+    return valor
+
+
+def _numero(valor, campo):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+        raise ErrorPeticion(400, f"'{campo}' debe ser un número")
+    return float(valor)
+
+
+def _texto(valor, campo):
+    if not isinstance(valor, str) or not valor.strip():
+        raise ErrorPeticion(400, f"'{campo}' debe ser un texto no vacío")
+    return valor
+
+
+def _objeto(valor, campo):
+    if not isinstance(valor, dict):
+        raise ErrorPeticion(400, f"'{campo}' debe ser un objeto")
+    return valor
+
+
+def _lista(datos, campo, maximo=MAX_IDS):
+    valores = datos.get(campo)
+    if not isinstance(valores, list):
+        raise ErrorPeticion(400, f"Falta la lista '{campo}'")
+    if len(valores) > maximo:
+        raise ErrorPeticion(413, f"'{campo}' admite como máximo {maximo} elementos")
+    return valores
+
+
+def _ids(datos, campo='ids'):
+    return [_entero(valor, campo) for valor in _lista(datos, campo)]
+
+
+class ServicioRecetario:
+    """Operaciones del servicio: las lecturas usan el pool y las escrituras el único recetario de escritura
+
+    El escritor se abre primero (aplica las migraciones que falten) y lo usa
+    un hilo cada vez, bajo `_bloqueo_escritura`.
+    """
+
+    def __init__(self, ruta, lectores=4, instantanea=None):
+        self.ruta = ruta
+        self.escritor = Recetario(ruta, conn=conectar(ruta, entre_hilos=True))
+        self._bloqueo_escritura = threading.Lock()
+        self.lectores = PoolLectura(ruta, lectores, instantanea)
+        self.inicio = time.time()
+
+        self.rutas = {
+            ('GET', '/salud'): self.salud,
+            ('POST', '/recetas/detalle'): self.detalle,
+            ('POST', '/buscar'): self.buscar,
+            ('POST', '/nutricion'): self.nutricion,
+            ('POST', '/lista-compras'): self.lista_compras,
+            ('POST', '/ingredientes'): self.agregar_ingredientes,
+            ('POST', '/recetas'): self.agregar_recetas,
+        }
+
+    def despachar(self, metodo, ruta, datos):
+        """Nombre de la operación y respuesta JSON de una petición"""
+        funcion = self.rutas.get((metodo, ruta))
+        if funcion is not None:
+            return funcion.__name__, funcion(datos)
+
+        coincidencia = RUTA_RECETA.match(ruta)
+        if metodo == 'GET' and coincidencia:
+            receta_id = int(coincidencia.group(1))
+            recetas = self.detalle({'ids': [receta_id]})['recetas'] if receta_id <= MAX_ENTERO else []
+            if not recetas:
+                raise ErrorPeticion(404, "Receta no encontrada")
+            return 'receta', recetas[0]
+
+        if any(r == ruta for _, r in self.rutas) or coincidencia:
+            raise ErrorPeticion(405, "Método no permitido")
+        raise ErrorPeticion(404, "Ruta desconocida")
+
+    def salud(self, datos):
+        with self.lectores.prestar() as lector:
+            return {
+                'estado': 'ok',
+                'version_datos': version_datos(lector.conn),
+                'instantanea': lector.instantanea is not None,
+                'lectores': self.lectores.tamano,
+                'segundos_activo': round(time.time() - self.inicio, 1),
+            }
+
+    def detalle(self, datos):
+        ids = _ids(datos)
+        with self.lectores.prestar() as lector:
+            recetas = lector.detalle_recetas(ids)
+        encontradas = {receta['id'] for receta in recetas}
+        return {'recetas': recetas, 'no_encontradas': [i for i in ids if i not in encontradas]}
+
+    def _buscar_una(self, lector, consulta):
+        if not isinstance(consulta, dict):
+            raise ErrorPeticion(400, "Cada consulta debe ser un objeto")
+        ingredientes = consulta.get('ingredientes')
+        if not isinstance(ingredientes, list) or not all(isinstance(i, str) for i in ingredientes):
+            raise ErrorPeticion(400, "'ingredientes' debe ser una lista de nombres")
+        faltantes = _entero(consulta.get('faltantes', 0), 'faltantes')
+        limite = _entero(consulta.get('limite', 50), 'limite')
+        dieta = consulta.get('dieta', 'Todos')
+        if not isinstance(dieta, str):
+            raise ErrorPeticion(400, "'dieta' debe ser un texto")
+
+        recetas = lector.recetas_por_cobertura(ingredientes, dieta, faltantes)[:limite]
+        return [
+            {'id': receta_id, 'nombre': nombre, 'faltantes': faltan, 'cobertura': round(cobertura, 3)}
+            for receta_id, nombre, _, faltan, cobertura in recetas
+        ]
+
+    def buscar(self, datos):
+        if 'consultas' in datos:
+            consultas = _lista(datos, 'consultas', maximo=100)
+            with self.lectores.prestar() as lector:
+                return {'resultados': [self._buscar_una(lector, consulta) for consulta in consultas]}
+        with self.lectores.prestar() as lector:
+            return {'recetas': self._buscar_una(lector, datos)}
+
+    def nutricion(self, datos):
+        ids = _ids(datos)
+        with self.lectores.prestar() as lector:
+            nombres = {receta[0]: receta[1] for receta in lector.obtener_recetas(ids)}
+            existentes = [i for i in ids if i in nombres]
+            totales, posicion, columnas, aportes = lector.calcular_valor_nutricional_lote(existentes)
+            motor = lector.motor_nutricional
+
+            recetas = []
+            for fila, (receta_id, valores) in enumerate(zip(existentes, totales.tolist())):
+                receta = {'id': receta_id, 'nombre': nombres[receta_id],
+                          'totales': {n: round(v, 2) for n, v in zip(NUTRIENTES, valores)}}
+                if datos.get('desglose'):
+                    propias = posicion == fila
+                    receta['desglose'] = motor.desglose(columnas[propias], aportes[propias])
+                recetas.append(receta)
+        return {'recetas': recetas, 'no_encontradas': [i for i in ids if i not in nombres]}
+
+    def lista_compras(self, datos):
+        porciones = datos.get('porciones')
+        if isinstance(porciones, dict):
+            if len(porciones) > MAX_IDS:
+                raise ErrorPeticion(413, f"'porciones' admite como máximo {MAX_IDS} recetas")
+            try:
+                porciones = {_entero(int(receta_id), 'porciones'): float(multiplicador)
+                             for receta_id, multiplicador in porciones.items()}
+            except (TypeError, ValueError):
+                raise ErrorPeticion(400, "'porciones' debe ser {id de receta: multiplicador}") from None
+        else:
+            porciones = _ids(datos, 'porciones')
+
+        despensa = datos.get('despensa') or None
+        if despensa is not None and (not isinstance(despensa, dict) or not all(
+                isinstance(nombre, str) and (cantidad is None or isinstance(cantidad, (int, float))
+                                             and not isinstance(cantidad, bool))
+                for nombre, cantidad in despensa.items())):
+            raise ErrorPeticion(400, "'despensa' debe ser {ingrediente: gramos o null}")
+
+        with self.lectores.prestar() as lector:
+            filas = lector.lista_compras(porciones, despensa)
+        if not datos.get('todo'):
+            filas = [fila for fila in filas if fila[3] > 0]
+        return {'lista': [
+            {'ingrediente': nombre, 'necesario': necesario, 'en_despensa': en_despensa, 'a_comprar': comprar,
+             'recetas': recetas}
+            for nombre, necesario, en_despensa, comprar, recetas in filas
+        ]}
+
+    def _escribir(self, elementos, escribir, que):
+        """Escribir elementos ya validados, uno por transacción; si uno falla, los anteriores quedan guardados"""
+        ids = []
+        with self._bloqueo_escritura:
+            for posicion, argumentos in enumerate(elementos):
+                try:
+                    ids.append(escribir(*argumentos))
+                except sqlite3.OperationalError:
+                    # Base de datos bloqueada, disco...: no es culpa de la petición
+                    raise
+                except (sqlite3.Error, ValueError) as error:
+                    raise ErrorPeticion(400, f"{que} {posicion}: {error}") from None
+        return {'ids': ids}
+
+    def agregar_ingredientes(self, datos):
+        """Se valida el lote entero antes de escribir nada"""
+        elementos = []
+        for posicion, ingrediente in enumerate(_lista(datos, 'ingredientes')):
+            campo = f'ingredientes[{posicion}]'
+            ingrediente = _objeto(ingrediente, campo)
+            elementos.append([_texto(ingrediente.get('nombre'), f'{campo}.nombre')] + [
+                _numero(ingrediente.get(nutriente), f'{campo}.{nutriente}') for nutriente in NUTRIENTES
+            ])
+        return self._escribir(elementos, self.escritor.agregar_ingrediente, 'Ingrediente')
+
+    def agregar_recetas(self, datos):
+        """Se valida el lote entero antes de escribir nada"""
+        elementos = []
+        for posicion, receta in enumerate(_lista(datos, 'recetas')):
+            campo = f'recetas[{posicion}]'
+            receta = _objeto(receta, campo)
+            instrucciones = receta.get('instrucciones', '')
+            if not isinstance(instrucciones, str):
+                raise ErrorPeticion(400, f"'{campo}.instrucciones' debe ser un texto")
+            lineas = []
+            for linea_posicion, linea in enumerate(_lista(receta, 'ingredientes')):
+                campo_linea = f'{campo}.ingredientes[{linea_posicion}]'
+                linea = _objeto(linea, campo_linea)
+                lineas.append({'nombre': _texto(linea.get('nombre'), f'{campo_linea}.nombre'),
+                               'cantidad': _numero(linea.get('cantidad'), f'{campo_linea}.cantidad')})
+            elementos.append((_texto(receta.get('nombre'), f'{campo}.nombre'),
+                              _texto(receta.get('tipo_dieta'), f'{campo}.tipo_dieta'), instrucciones, lineas))
+        return self._escribir(elementos, self.escritor.agregar_receta, 'Receta')
+
+    def cerrar(self):
+        self.lectores.cerrar()
+        self.escritor.cerrar()
+
+
+class ManejadorPeticiones(BaseHTTPRequestHandler):
+    """Una petición JSON; las conexiones se mantienen abiertas entre peticiones (HTTP/1.1)"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Recetario'
+    # Cabeceras y cuerpo se escriben por separado: con Nagle y el ACK retardado cada respuesta esperaría ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+    def _leer_json(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        if longitud > MAX_CUERPO:
+            raise ErrorPeticion(413, "Cuerpo demasiado grande")
+        if not longitud:
+            return {}
+        try:
+            datos = json.loads(self.rfile.read(longitud))
+        except ValueError:
+            raise ErrorPeticion(400, "El cuerpo no es JSON válido") from None
+        if not isinstance(datos, dict):
+            raise ErrorPeticion(400, "El cuerpo debe ser un objeto JSON")
+        return datos
+
+    def _atender(self, metodo):
+        inicio = time.perf_counter()
+        ruta = urlsplit(self.path).path.rstrip('/') or '/'
+        servicio = self.server.servicio
+        nombre = 'desconocida'
+        estado = 200
+        try:
+            if metodo == 'GET' and ruta == '/metricas':
+                nombre = 'metricas'
+                self._responder(200, METRICAS.como_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+                return
+            datos = self._leer_json() if metodo == 'POST' else {}
+            nombre, respuesta = servicio.despachar(metodo, ruta, datos)
+        except ErrorPeticion as error:
+            estado, respuesta = error.estado, {'error': str(error)}
+        except Exception as error:
+            estado, respuesta = 500, {'error': f"{type(error).__name__}: {error}"}
+            self.log_error("Error en %s %s: %r", metodo, ruta, error)
+
+        cuerpo = json.dumps(respuesta, ensure_ascii=False, default=float).encode('utf-8')
+        self._responder(estado, cuerpo, 'application/json; charset=utf-8')
+        METRICAS.registrar_operacion(f'http_{nombre}', time.perf_counter() - inicio, error=estado >= 500)
+
+    def _responder(self, estado, cuerpo, tipo):
+        self.send_response(estado)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        if self.server.registrar_peticiones:
+            super().log_message(formato, *args)
+
+
+class ServidorRecetario(ThreadingHTTPServer):
+    """Un hilo por conexión; los hilos comparten el servicio (y su pool de lectores)"""
+
+    daemon_threads = True
+    # Muchos terminales conectando a la vez no deben ver conexiones rechazadas
+    request_queue_size = 128
+
+    def __init__(self, direccion, servicio, registrar_peticiones=False):
+        super().__init__(direccion, ManejadorPeticiones)
+        self.servicio = servicio
+        self.registrar_peticiones = registrar_peticiones
+
+
+def servir(ruta, host='127.0.0.1', puerto=8765, lectores=4, instantanea=None, registrar_peticiones=False,
+           al_arrancar=None):
+    """Atender peticiones hasta Ctrl+C; `al_arrancar(servidor)` se llama con el socket ya escuchando"""
+    servicio = ServicioRecetario(ruta, lectores, instantanea)
+    servidor = ServidorRecetario((host, puerto), servicio, registrar_peticiones)
+    if al_arrancar:
+        al_arrancar(servidor)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
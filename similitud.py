@@ -0,0 +1,292 @@
+"""Similitud entre recetas por su conjunto de ingredientes (MinHash + LSH)
+
+Cada receta se resume en una firma MinHash de NUM_HASHES valores, que se parte
+en BANDAS bandas de FILAS_POR_BANDA valores; cada banda se guarda como una
+clave en `similitud_bandas`. Dos recetas con Jaccard J comparten alguna banda
+con probabilidad 1 - (1 - J^FILAS_POR_BANDA)^BANDAS (un 63 % con J = 0.5, un
+99 % con J = 0.75), así que las candidatas salen de unas pocas búsquedas por
+clave primaria sin recorrer el catálogo, y después se ordenan por Jaccard exacto.
+
+Las tablas las crea una migración y sus triggers apuntan en
+`similitud_pendientes` las recetas cuyas líneas cambian; `actualizar_pendientes`
+recalcula solo esas, o lo reconstruye todo por bloques con NumPy si son muchas.
+"""
+import random
+import time
+from array import array
+from collections import Counter
+
+NUM_HASHES = 64
+FILAS_POR_BANDA = 4
+BANDAS = NUM_HASHES // FILAS_POR_BANDA
+
+# Con más pendientes que esto (y más de la mitad de las firmas) se reconstruye todo
+MINIMO_RECONSTRUIR = 1000
+
+# Hashes universales h(x) = (a·x + b) mod p. La semilla es fija: las claves se guardan en la base de datos
+_PRIMO = (1 << 31) - 1
+_aleatorio = random.Random(8)
+_A = [_aleatorio.randrange(1, _PRIMO) for _ in range(NUM_HASHES)]
+_B = [_aleatorio.randrange(0, _PRIMO) for _ in range(NUM_HASHES)]
+# Multiplicadores impares de 64 bits que combinan los valores de una banda en una sola clave
+_MULTIPLICADORES = [_aleatorio.getrandbits(64) | 1 for _ in range(FILAS_POR_BANDA)]
+_MASCARA = (1 << 64) - 1
+
+
+def claves_bandas(ingrediente_ids):
+    """Claves LSH (enteros de 64 bits con signo, una por banda) de un conjunto de ingredientes"""
+    if not ingrediente_ids:
+        return []
+    firma = [min((a * x + b) % _PRIMO for x in ingrediente_ids) for a, b in zip(_A, _B)]
+
+    claves = []
+    for inicio in range(0, NUM_HASHES, FILAS_POR_BANDA):
+        clave = sum(v * m for v, m in zip(firma[inicio:inicio + FILAS_POR_BANDA], _MULTIPLICADORES)) & _MASCARA
+        # SQLite guarda enteros con signo
+        claves.append(clave - (1 << 64) if clave >> 63 else clave)
+    return claves
+
+
+def claves_lote(offsets, columnas):
+    """Las mismas claves para muchas recetas en CSR (offsets, ids de ingrediente): matriz recetas x BANDAS"""
+    import numpy as np
+
+    # Hashes de cada ingrediente distinto y, por indexación, de cada línea
+    ingredientes, posicion = np.unique(columnas, return_inverse=True)
+    a = np.array(_A, dtype=np.uint64)
+    b = np.array(_B, dtype=np.uint64)
+    hashes = ((ingredientes.astype(np.uint64)[:, None] * a + b) % np.uint64(_PRIMO)).astype(np.uint32)
+
+    firmas = np.minimum.reduceat(hashes[posicion], offsets[:-1], axis=0)
+    # El producto y la suma en uint64 desbordan igual que `& _MASCARA`
+    bandas = firmas.reshape(-1, BANDAS, FILAS_POR_BANDA).astype(np.uint64)
+    claves = (bandas * np.array(_MULTIPLICADORES, dtype=np.uint64)).sum(axis=2, dtype=np.uint64)
+    return claves.view(np.int64)
+
+
+def _bloques(valores, tamano=900):
+    """Trocear para no superar el límite de parámetros de SQLite"""
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+
+def _conjuntos(cursor, receta_ids, ingredientes_por_receta=None):
+    """Conjunto de ingredientes de cada receta, del índice en memoria si se tiene o de la base de datos"""
+    if ingredientes_por_receta is not None:
+        return {r: ingredientes_por_receta[r] for r in receta_ids if r in ingredientes_por_receta}
+
+    conjuntos = {}
+    for bloque in _bloques(list(receta_ids)):
+        cursor.execute('SELECT receta_id, ingrediente_id FROM receta_ingredientes WHERE receta_id IN ({})'.format(
+            ','.join(['?'] * len(bloque))), bloque)
+        for receta_id, ingrediente_id in cursor:
+            conjuntos.setdefault(receta_id, set()).add(ingrediente_id)
+    return conjuntos
+
+
+def actualizar_recetas(cursor, receta_ids):
+    """Recalcular las claves de unas recetas dentro de la transacción en curso"""
+    for bloque in _bloques(list(receta_ids)):
+        marcadores = ','.join(['?'] * len(bloque))
+
+        # Sacar las recetas de sus cubetas anteriores
+        cursor.execute(f'SELECT receta_id, claves FROM similitud_firmas WHERE receta_id IN ({marcadores})', bloque)
+        anteriores = [
+            (banda, clave, receta_id)
+            for receta_id, guardadas in cursor.fetchall()
+            for banda, clave in enumerate(array('q', guardadas))
+        ]
+        cursor.executemany('DELETE FROM similitud_bandas WHERE banda = ? AND clave = ? AND receta_id = ?', anteriores)
+        cursor.execute(f'DELETE FROM similitud_firmas WHERE receta_id IN ({marcadores})', bloque)
+
+        # Las recetas borradas o sin líneas no tienen firma
+        firmas = []
+        bandas = []
+        for receta_id, ingredientes in _conjuntos(cursor, bloque).items():
+            claves = claves_bandas(ingredientes)
+            firmas.append((receta_id, array('q', claves).tobytes()))
+            bandas.extend((banda, clave, receta_id) for banda, clave in enumerate(claves))
+        cursor.executemany('INSERT INTO similitud_firmas (receta_id, claves) VALUES (?, ?)', firmas)
+        cursor.executemany('INSERT INTO similitud_bandas (banda, clave, receta_id) VALUES (?, ?, ?)', bandas)
+        cursor.execute(f'DELETE FROM similitud_pendientes WHERE receta_id IN ({marcadores})', bloque)
+
+
+def reconstruir(conn, tam_bloque=20000):
+    """Recalcular todas las firmas por bloques de recetas con NumPy
+
+    Las claves de todo el catálogo se reúnen en memoria (BANDAS enteros por
+    receta) para insertar cada banda ya ordenada, que en un índice de clave
+    primaria es mucho más rápido que insertar en orden aleatorio.
+    """
+    import numpy as np
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM recetas ORDER BY id')
+    receta_ids = [fila[0] for fila in cursor.fetchall()]
+
+    ids_con_firma = []
+    claves = []
+    with conn:
+        cursor.execute('DELETE FROM similitud_bandas')
+        cursor.execute('DELETE FROM similitud_firmas')
+        cursor.execute('DELETE FROM similitud_pendientes')
+
+        for inicio in range(0, len(receta_ids), tam_bloque):
+            bloque = receta_ids[inicio:inicio + tam_bloque]
+            cursor.execute('''
+            SELECT receta_id, ingrediente_id FROM receta_ingredientes
+            WHERE receta_id BETWEEN ? AND ?
+            ORDER BY receta_id
+            ''', (bloque[0], bloque[-1]))
+            lineas = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+            if not len(lineas):
+                continue
+
+            ids, inicios = np.unique(lineas[:, 0], return_index=True)
+            offsets = np.append(inicios, len(lineas))
+            claves_bloque = claves_lote(offsets, lineas[:, 1])
+            cursor.executemany('INSERT INTO similitud_firmas (receta_id, claves) VALUES (?, ?)',
+                               zip(ids.tolist(), (fila.tobytes() for fila in claves_bloque)))
+            ids_con_firma.append(ids)
+            claves.append(claves_bloque)
+
+        if claves:
+            ids = np.concatenate(ids_con_firma)
+            claves = np.concatenate(claves)
+            for banda in range(BANDAS):
+                orden = np.lexsort((ids, claves[:, banda]))
+                cursor.executemany('INSERT INTO similitud_bandas (banda, clave, receta_id) VALUES (?, ?, ?)',
+                                   ((banda, clave, receta_id) for clave, receta_id
+                                    in zip(claves[orden, banda].tolist(), ids[orden].tolist())))
+    return len(receta_ids)
+
+
+def actualizar_pendientes(conn):
+    """Poner al día las firmas de las recetas que han cambiado; devuelve cuántas había pendientes"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM similitud_pendientes')
+    pendientes = cursor.fetchone()[0]
+    if not pendientes:
+        return 0
+
+    cursor.execute('SELECT COUNT(*) FROM similitud_firmas')
+    if pendientes >= MINIMO_RECONSTRUIR and pendientes > cursor.fetchone()[0] // 2:
+        reconstruir(conn)
+        return pendientes
+
+    with conn:
+        cursor.execute('SELECT receta_id FROM similitud_pendientes')
+        actualizar_recetas(cursor, [fila[0] for fila in cursor.fetchall()])
+    return pendientes
+
+
+def _vecinas(cursor, receta_id, ingredientes_por_receta=None, max_por_cubeta=500, max_candidatas=200):
+    """Ingredientes de la receta y sus candidatas (jaccard, id, ingredientes), de más a menos parecida
+
+    Cada cubeta se limita a `max_por_cubeta` recetas para que las de
+    ingredientes muy comunes no disparen el coste, y solo se calcula el
+    Jaccard exacto de las `max_candidatas` que comparten más bandas (el
+    número esperado de bandas compartidas crece con la similitud).
+    """
+    cursor.execute('SELECT claves FROM similitud_firmas WHERE receta_id = ?', (receta_id,))
+    fila = cursor.fetchone()
+    if fila is None:
+        return set(), []
+
+    bandas_compartidas = Counter()
+    for banda, clave in enumerate(array('q', fila[0])):
+        cursor.execute('SELECT receta_id FROM similitud_bandas WHERE banda = ? AND clave = ? LIMIT ?',
+                       (banda, clave, max_por_cubeta))
+        bandas_compartidas.update(receta for receta, in cursor.fetchall())
+    del bandas_compartidas[receta_id]
+    candidatas = [receta for receta, _ in bandas_compartidas.most_common(max_candidatas)]
+
+    conjuntos = _conjuntos(cursor, [receta_id, *candidatas], ingredientes_por_receta)
+    propios = conjuntos.pop(receta_id, set())
+    vecinas = [
+        (len(propios & ingredientes) / len(propios | ingredientes), candidata, ingredientes)
+        for candidata, ingredientes in conjuntos.items()
+    ]
+    vecinas.sort(key=lambda v: (-v[0], v[1]))
+    return propios, vecinas
+
+
+def similares(conn, receta_id, k=10, ingredientes_por_receta=None, max_por_cubeta=500, max_candidatas=200):
+    """Las `k` recetas más parecidas a `receta_id`: tuplas (receta_id, jaccard) de mayor a menor"""
+    _, vecinas = _vecinas(conn.cursor(), receta_id, ingredientes_por_receta, max_por_cubeta, max(k, max_candidatas))
+    return [(candidata, jaccard) for jaccard, candidata, _ in vecinas[:k]]
+
+
+def sugerir_sustitutos(conn, ingrediente_id, k=5, muestra=30, vecinas=20, ingredientes_por_receta=None):
+    """Ingredientes que suelen ocupar el lugar de `ingrediente_id`: tuplas (ingrediente_id, puntuación)
+
+    Para una muestra de recetas con el ingrediente se buscan sus vecinas que
+    no lo llevan pero conservan el resto de la receta; lo que esas vecinas
+    añaden a cambio vota como sustituto, con el peso de su Jaccard.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT receta_id FROM receta_ingredientes WHERE ingrediente_id = ? LIMIT ?',
+                   (ingrediente_id, muestra))
+
+    votos = Counter()
+    for receta_id, in cursor.fetchall():
+        propios, parecidas = _vecinas(cursor, receta_id, ingredientes_por_receta)
+        for jaccard, _, ingredientes in parecidas[:vecinas]:
+            if ingrediente_id in ingredientes or propios - ingredientes != {ingrediente_id}:
+                continue
+            nuevos = ingredientes - propios
+            for sustituto in nuevos:
+                votos[sustituto] += jaccard / len(nuevos)
+
+    return [(sustituto, round(puntuacion, 4)) for sustituto, puntuacion in votos.most_common(k)]
+
+
+def medir_latencia(conn, receta_ids, k=10, **opciones):
+    """Latencias p50/p99 (ms) de `similares` sobre varias recetas"""
+    tiempos = []
+    for receta_id in receta_ids:
+        inicio = time.perf_counter()
+        similares(conn, receta_id, k, **opciones)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'consultas': len(tiempos),
+        'p50_ms': round(tiempos[len(tiempos) // 2], 3),
+        'p99_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))], 3),
+    }
+
+
+def main():
+    import argparse
+    import json
+
+    from recetario_core import conectar
+
+    parser = argparse.ArgumentParser(description="Poner al día el índice de similitud y medir su latencia")
+    parser.add_argument('--db', default='recetario.db')
+    parser.add_argument('--reconstruir', action='store_true', help="Recalcular todas las firmas")
+    parser.add_argument('--consultas', type=int, default=200, help="Recetas al azar sobre las que medir")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    conn = conectar(args.db)
+    inicio = time.perf_counter()
+    actualizadas = reconstruir(conn) if args.reconstruir else actualizar_pendientes(conn)
+    segundos = time.perf_counter() - inicio
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT receta_id FROM similitud_firmas')
+    receta_ids = [fila[0] for fila in cursor.fetchall()]
+    muestra = random.Random(args.semilla).sample(receta_ids, min(args.consultas, len(receta_ids)))
+
+    informe = {
+        'recetas': len(receta_ids),
+        'actualizadas': actualizadas,
+        'segundos_actualizacion': round(segundos, 3),
+        'similares': medir_latencia(conn, muestra),
+    }
+    print(json.dumps(informe, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EjecutorTareas:
+    """Ejecuta consultas y cálculos fuera del hilo de Tk
+
+    Todas las tareas corren en un único hilo de trabajo que tiene su propio
+    `Recetario` (y por tanto su propia conexión SQLite). Los resultados vuelven
+    al hilo de la interfaz a través de una cola que se revisa con `root.after`,
+    de modo que los callbacks siempre se ejecutan en el hilo de Tk.
+
+    Las tareas enviadas con la misma `clave` se sustituyen entre sí: al enviar
+    una nueva, la anterior se cancela si aún no empezó, se interrumpe su
+    consulta SQLite si está en curso, y su resultado se descarta si llega tarde.
+    """
+
+    def __init__(self, root, crear_recetario, al_cambiar_ocupado=None, intervalo_ms=30):
+        self.root = root
+        self.al_cambiar_ocupado = al_cambiar_ocupado
+        self.intervalo_ms = intervalo_ms
+
+        self._resultados = queue.Queue()
+        self._generaciones = {}
+        self._futuros = {}
+        self._pendientes = 0
+        self._recetario = None
+
+        # Clave y generación de la tarea que se está ejecutando en el hilo de trabajo
+        self._bloqueo = threading.Lock()
+        self._en_curso = None
+
+        def inicializar():
+            self._recetario = crear_recetario()
+
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recetario', initializer=inicializar)
+        self._id_after = self.root.after(self.intervalo_ms, self._procesar_resultados)
+
+    def enviar(self, funcion, *args, al_terminar=None, al_fallar=None, clave=None):
+        """Ejecutar `funcion(recetario, *args)` en segundo plano
+
+        `al_terminar(resultado)` o `al_fallar(excepcion)` se llaman después en el
+        hilo de Tk. Con `clave`, una tarea nueva reemplaza a la anterior de esa clave.
+        """
+        generacion = None
+        if clave is not None:
+            generacion = self._generaciones.get(clave, 0) + 1
+            self._generaciones[clave] = generacion
+            self._cancelar_anterior(clave)
+
+        futuro = self._ejecutor.submit(self._ejecutar, clave, generacion, funcion, args)
+        if clave is not None:
+            self._futuros[clave] = futuro
+
+        self._pendientes += 1
+        if self._pendientes == 1 and self.al_cambiar_ocupado:
+            self.al_cambiar_ocupado(True)
+
+        futuro.add_done_callback(
+            lambda f: self._resultados.put((clave, generacion, f, al_terminar, al_fallar))
+        )
+        return futuro
+
+    def _cancelar_anterior(self, clave):
+        """Cancelar o interrumpir la tarea anterior con la misma clave"""
+        anterior = self._futuros.pop(clave, None)
+        if anterior is None or anterior.cancel():
+            return
+
+        # Ya está en marcha: interrumpir la consulta SQLite si sigue siendo esa tarea
+        with self._bloqueo:
+            if self._en_curso is not None and self._en_curso[0] == clave and self._recetario is not None:
+                self._recetario.conn.interrupt()
+
+    def _ejecutar(self, clave, generacion, funcion, args):
+        """Cuerpo de la tarea en el hilo de trabajo"""
+        # Si ya se envió otra más nueva, no merece la pena empezar
+        if clave is not None and self._generaciones.get(clave) != generacion:
+            return None
+
+        with self._bloqueo:
+            self._en_curso = (clave, generacion)
+        try:
+            return funcion(self._recetario, *args)
+        finally:
+            with self._bloqueo:
+                self._en_curso = None
+
+    def _procesar_resultados(self):
+        """Entregar en el hilo de Tk los resultados terminados"""
+        try:
+            while True:
+                try:
+                    mensaje = self._resultados.get_nowait()
+                except queue.Empty:
+                    break
+                self._entregar(*mensaje)
+        finally:
+            self._id_after = self.root.after(self.intervalo_ms, self._procesar_resultados)
+
+    def _entregar(self, clave, generacion, futuro, al_terminar, al_fallar):
+        """Llamar al callback de una tarea terminada, salvo que esté obsoleta"""
+        self._pendientes -= 1
+        if self._pendientes == 0 and self.al_cambiar_ocupado:
+            self.al_cambiar_ocupado(False)
+
+        # Resultado obsoleto o tarea cancelada: se descarta
+        if futuro.cancelled() or (clave is not None and self._generaciones.get(clave) != generacion):
+            return
+        if self._futuros.get(clave) is futuro:
+            del self._futuros[clave]
+
+        error = futuro.exception()
+        if error is None:
+            if al_terminar:
+                al_terminar(futuro.result())
+        elif isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error):
+            return
+        elif al_fallar:
+            al_fallar(error)
+        else:
+            raise error
+
+    def cerrar(self):
+        """Detener la revisión de resultados y cerrar el hilo de trabajo y su conexión
+
+        Las búsquedas pendientes se cancelan; las escrituras ya enviadas terminan.
+        """
+        self.root.after_cancel(self._id_after)
+        for futuro in self._futuros.values():
+            futuro.cancel()
+        self._ejecutor.submit(lambda: self._recetario and self._recetario.cerrar())
+        self._ejecutor.shutdown(wait=False)
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del recetario están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recetario_core import Recetario  # noqa: E402
+
+# (nombre, calorías, proteínas, carbohidratos, grasas, fibra, sodio) por 100 g
+INGREDIENTES = [
+    ("pollo", 165, 31, 0, 3.6, 0, 74),
+    ("arroz", 130, 2.7, 28, 0.3, 0.4, 1),
+    ("tomate", 18, 0.9, 3.9, 0.2, 1.2, 5),
+    ("aceite de oliva", 884, 0, 0, 100, 0, 0),
+    ("mantequilla", 717, 0.9, 0.1, 81, 0, 11),
+    ("cebolla", 40, 1.1, 9.3, 0.1, 1.7, 4),
+    ("lenteja", 116, 9, 20, 0.4, 7.9, 2),
+]
+RECETAS = [
+    ("Arroz con pollo", "Todos", "Cocinar el arroz con el pollo",
+     [{"nombre": "pollo", "cantidad": 200}, {"nombre": "arroz", "cantidad": 150},
+      {"nombre": "tomate", "cantidad": 50}]),
+    ("Arroz con tomate", "Vegana", "Sofreír el tomate en aceite y añadir el arroz",
+     [{"nombre": "arroz", "cantidad": 100}, {"nombre": "tomate", "cantidad": 80},
+      {"nombre": "aceite de oliva", "cantidad": 10}]),
+    ("Pollo a la mantequilla", "Todos", "Dorar el pollo en mantequilla con cebolla",
+     [{"nombre": "pollo", "cantidad": 250}, {"nombre": "mantequilla", "cantidad": 20},
+      {"nombre": "cebolla", "cantidad": 40}]),
+    ("Lentejas", "Vegana", "Cocer las lentejas con cebolla y tomate",
+     [{"nombre": "lenteja", "cantidad": 120}, {"nombre": "cebolla", "cantidad": 30},
+      {"nombre": "tomate", "cantidad": 60}]),
+]
+
+
+@pytest.fixture
+def ruta_db(tmp_path):
+    """Base de datos nueva con el catálogo de prueba"""
+    ruta = str(tmp_path / 'recetario.db')
+    recetario = Recetario(ruta)
+    for ingrediente in INGREDIENTES:
+        recetario.agregar_ingrediente(*ingrediente)
+    for receta in RECETAS:
+        recetario.agregar_receta(*receta)
+    recetario.cerrar()
+    return ruta
+
+
+@pytest.fixture
+def recetario(ruta_db):
+    recetario = Recetario(ruta_db)
+    yield recetario
+    recetario.cerrar()
+
+
+@pytest.fixture
+def ids(recetario):
+    """{nombre de receta: id}"""
+    return {nombre: receta_id for receta_id, nombre in recetario.conn.execute('SELECT id, nombre FROM recetas')}
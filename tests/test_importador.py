@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from importador import ImportadorCatalogo
+
+
+def escribir_jsonl(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        for registro in registros:
+            archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+def recetas_de_prueba(cantidad):
+    return [{'nombre': f'Receta {i}', 'tipo_dieta': 'Todos', 'instrucciones': '',
+             'ingredientes': [{'nombre': 'arroz', 'cantidad': 100 + i}, {'nombre': 'tomate', 'cantidad': 20}]}
+            for i in range(cantidad)]
+
+
+def contar(conn, tabla):
+    return conn.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+
+
+class Interrupcion(Exception):
+    pass
+
+
+def test_reanuda_tras_una_interrupcion(recetario, tmp_path):
+    ruta = str(tmp_path / 'recetas.jsonl')
+    escribir_jsonl(ruta, recetas_de_prueba(25))
+    antes = contar(recetario.conn, 'recetas')
+
+    def cortar_tras_el_primer_bloque(informe):
+        raise Interrupcion
+
+    with pytest.raises(Interrupcion):
+        ImportadorCatalogo(recetario.conn, tam_bloque=10, progreso=cortar_tras_el_primer_bloque).importar_recetas(ruta)
+    assert contar(recetario.conn, 'recetas') == antes + 10
+
+    informe = ImportadorCatalogo(recetario.conn, tam_bloque=10).importar_recetas(ruta)
+
+    assert informe.omitidos == 10
+    assert (informe.procesados, informe.importados, informe.rechazados) == (15, 15, 0)
+    assert contar(recetario.conn, 'recetas') == antes + 25
+    assert not (tmp_path / 'recetas.jsonl.progreso').exists()
+
+
+def test_no_reanuda_si_el_archivo_cambio(recetario, tmp_path):
+    ruta = str(tmp_path / 'recetas.jsonl')
+    escribir_jsonl(ruta, recetas_de_prueba(5))
+    with open(ruta + '.progreso', 'w', encoding='utf-8') as archivo:
+        json.dump({'firma': ['otro archivo', 0, 0], 'procesados': 3}, archivo)
+
+    informe = ImportadorCatalogo(recetario.conn).importar_recetas(ruta)
+
+    assert (informe.omitidos, informe.importados) == (0, 5)
+
+
+def test_rechaza_recetas_con_ingredientes_desconocidos(recetario):
+    registros = recetas_de_prueba(2) + [
+        {'nombre': 'Con trufa', 'ingredientes': [{'nombre': 'arroz', 'cantidad': 100}, {'nombre': 'trufa', 'cantidad': 5}]},
+        {'nombre': 'Con azafrán', 'ingredientes': 'azafrán:1;trufa:2'},
+    ]
+
+    informe = ImportadorCatalogo(recetario.conn).cargar_recetas(registros)
+
+    assert (informe.importados, informe.rechazados) == (2, 2)
+    assert informe.desconocidos == {'trufa': 2, 'azafrán': 1}
+    assert recetario.conn.execute("SELECT COUNT(*) FROM recetas WHERE nombre LIKE 'Con %'").fetchone() == (0,)
+
+
+def test_cuenta_valores_invalidos_por_campo(recetario):
+    registros = [
+        {'nombre': 'Buena', 'ingredientes': 'arroz:100;tomate:50'},
+        {'nombre': 'Gramos con unidad', 'ingredientes': 'arroz:12g'},
+        {'nombre': 'Sin cantidad', 'ingredientes': [{'nombre': 'arroz'}]},
+        {'nombre': '  ', 'ingredientes': 'arroz:100'},
+        {'ingredientes': 'arroz:100'},
+        {'nombre': 'Línea sin nombre', 'ingredientes': [{'cantidad': 10}]},
+        {'nombre': 'Ingredientes raros', 'ingredientes': 42},
+    ]
+
+    informe = ImportadorCatalogo(recetario.conn).cargar_recetas(registros)
+
+    assert (informe.procesados, informe.importados, informe.rechazados) == (7, 1, 6)
+    assert informe.invalidos == {'cantidad': 2, 'nombre': 3, 'ingredientes': 1}
+    assert informe.como_dict()['invalidos'] == {'cantidad': 2, 'nombre': 3, 'ingredientes': 1}
+
+
+def test_ingredientes_desde_csv(recetario, tmp_path):
+    ruta = tmp_path / 'ingredientes.csv'
+    ruta.write_text('nombre,calorias,proteinas,carbohidratos,grasas,fibra,sodio\n'
+                    'garbanzo,364,19,61,6,17,24\n'
+                    'pollo,170,31,0,4,0,70\n'
+                    'sal,n/a,0,0,0,0,38758\n'
+                    ',1,1,1,1,1,1\n', encoding='utf-8')
+
+    informe = ImportadorCatalogo(recetario.conn).importar_ingredientes(str(ruta))
+
+    assert (informe.importados, informe.rechazados) == (2, 2)
+    assert informe.invalidos == {'calorias': 1, 'nombre': 1}
+    assert recetario.conn.execute("SELECT calorias FROM ingredientes WHERE nombre = 'pollo'").fetchone() == (170,)
+    assert recetario.conn.execute("SELECT COUNT(*) FROM ingredientes WHERE nombre = 'sal'").fetchone() == (0,)
@@ -0,0 +1,65 @@
+from indice_despensa import IndiceDespensa
+
+
+def test_cocinables_con_la_despensa_completa(recetario, ids):
+    indice = IndiceDespensa.desde_conexion(recetario.conn)
+
+    cocinables = indice.recetas_cocinables(['pollo', 'arroz', 'tomate', 'aceite de oliva'])
+
+    assert cocinables == sorted([ids['Arroz con pollo'], ids['Arroz con tomate']])
+
+
+def test_buscar_ordena_por_faltantes_y_cobertura(recetario, ids):
+    indice = IndiceDespensa.desde_conexion(recetario.conn)
+
+    resultados = indice.buscar(['pollo', 'arroz', 'cebolla'], max_faltantes=1)
+
+    assert resultados == [
+        (ids['Arroz con pollo'], 2, 3),
+        (ids['Pollo a la mantequilla'], 2, 3),
+    ]
+
+
+def test_cobertura_y_filtro_de_dieta(recetario, ids):
+    indice = IndiceDespensa.desde_conexion(recetario.conn)
+
+    cobertura = indice.cobertura(['tomate', 'cebolla'], 'Vegana')
+
+    assert cobertura == {ids['Arroz con tomate']: 1 / 3, ids['Lentejas']: 2 / 3}
+
+
+def test_ingredientes_desconocidos_no_cuentan(recetario):
+    indice = IndiceDespensa.desde_conexion(recetario.conn)
+
+    assert indice.buscar(['trufa', 'azafrán'], max_faltantes=3) == []
+
+
+def test_sustitucion_solo_con_el_resto_de_la_receta(recetario, ids):
+    indice = IndiceDespensa.desde_conexion(recetario.conn)
+    despensa = ['arroz', 'tomate', 'pollo', 'cebolla']
+
+    # Sin aceite, "Arroz con tomate" se puede hacer si se sustituye
+    assert indice.recetas_con_sustitucion(despensa, 'aceite de oliva') == [ids['Arroz con tomate']]
+    # Con un sustituto concreto, solo si está en el catálogo
+    assert indice.recetas_con_sustitucion(despensa, 'mantequilla', 'aceite de oliva') == [ids['Pollo a la mantequilla']]
+    assert indice.recetas_con_sustitucion(despensa, 'mantequilla', 'margarina') == []
+    assert indice.recetas_con_sustitucion(despensa, 'trufa') == []
+
+
+def test_agregar_y_eliminar_receta_sin_reconstruir(recetario, ids):
+    indice = IndiceDespensa.desde_conexion(recetario.conn)
+    arroz, pollo = indice.ingrediente_ids['arroz'], indice.ingrediente_ids['pollo']
+
+    indice.agregar_receta(999, 'Todos', [arroz, pollo])
+    assert indice.recetas_cocinables(['arroz', 'pollo']) == [999]
+
+    indice.eliminar_receta(999)
+    indice.eliminar_receta(ids['Arroz con pollo'])
+    assert indice.recetas_cocinables(['arroz', 'pollo', 'tomate']) == []
+
+
+def test_recetario_resuelve_la_forma_de_los_nombres(recetario, ids):
+
+    recetas = recetario.encontrar_recetas(['Pollo', 'ARROZ', 'Tomates'])
+
+    assert [receta[0] for receta in recetas] == [ids['Arroz con pollo']]
@@ -0,0 +1,59 @@
+import pytest
+
+
+def por_nombre(filas):
+    return {nombre: (necesario, en_despensa, comprar, recetas) for nombre, necesario, en_despensa, comprar, recetas in filas}
+
+
+def test_agrega_y_escala_las_porciones(recetario, ids):
+    filas = por_nombre(recetario.lista_compras({ids['Arroz con pollo']: 2, ids['Arroz con tomate']: 1}))
+
+    assert filas['arroz'] == (400, 0, 400, 2)
+    assert filas['tomate'] == (180, 0, 180, 2)
+    assert filas['pollo'] == (400, 0, 400, 1)
+
+
+def test_lista_de_ids_cuenta_cada_aparicion(recetario, ids):
+    filas = por_nombre(recetario.lista_compras([ids['Lentejas'], ids['Lentejas']]))
+
+    assert filas['lenteja'] == (240, 0, 240, 1)
+
+
+def test_descuenta_la_despensa(recetario, ids):
+    despensa = {'arroz': 100, 'Tomates': 30, 'tomate': 40, 'pollo': None, 'azafrán': 5}
+
+    filas = por_nombre(recetario.lista_compras([ids['Arroz con pollo'], ids['Arroz con tomate']], despensa))
+
+    assert filas['arroz'] == (250, 100, 150, 2)
+    # Dos entradas que resuelven al mismo ingrediente se suman
+    assert filas['tomate'] == (130, 70, 60, 2)
+    # Sin cantidad: hay de sobra
+    assert filas['pollo'] == (200, 0, 0, 1)
+    assert 'azafrán' not in filas
+
+
+def test_sobra_en_despensa_no_da_cantidades_negativas(recetario, ids):
+    compras = recetario.generar_lista_compras([ids['Lentejas']], {'lenteja': 500, 'cebolla': 10})
+
+    assert compras == {'cebolla': 20, 'tomate': 60}
+
+
+def test_no_toca_la_transaccion_del_llamador(recetario, ids):
+    recetario.conn.execute('BEGIN')
+    recetario.conn.execute("UPDATE recetas SET instrucciones = 'pendiente' WHERE id = ?", (ids['Lentejas'],))
+
+    for _ in range(2):
+        recetario.lista_compras([ids['Lentejas']], {'tomate': 10})
+
+    assert recetario.conn.in_transaction
+    assert recetario.conn.execute('SELECT instrucciones FROM recetas WHERE id = ?', (ids['Lentejas'],)).fetchone() == ('pendiente',)
+    recetario.conn.rollback()
+    # El rollback del llamador deshace también las tablas temporales: se vuelven a crear
+    assert recetario.generar_lista_compras([ids['Lentejas']]) == {'cebolla': 30, 'lenteja': 120, 'tomate': 60}
+
+
+def test_ingrediente_sin_nombre_conocido_en_despensa(recetario, ids):
+    filas = recetario.lista_compras([ids['Lentejas']], {'sal': None})
+
+    assert [fila[0] for fila in filas] == ['cebolla', 'lenteja', 'tomate']
+    assert sum(fila[3] for fila in filas) == pytest.approx(210)
@@ -0,0 +1,91 @@
+import sqlite3
+
+import pytest
+
+from migraciones import MIGRACIONES, NUTRIENTES, aplicar_migraciones, version_actual, version_datos
+from recetario_core import Recetario, conectar
+
+
+def crear_base_original(ruta):
+    """Base de datos con el esquema y los datos que dejaba la versión original de la aplicación"""
+    conn = sqlite3.connect(ruta)
+    conn.executescript('''
+    CREATE TABLE ingredientes (
+        id INTEGER PRIMARY KEY, nombre TEXT UNIQUE,
+        calorias REAL, proteinas REAL, carbohidratos REAL, grasas REAL, fibra REAL, sodio REAL
+    );
+    CREATE TABLE recetas (id INTEGER PRIMARY KEY, nombre TEXT UNIQUE, tipo_dieta TEXT, instrucciones TEXT);
+    CREATE TABLE receta_ingredientes (
+        receta_id INTEGER, ingrediente_id INTEGER, cantidad REAL,
+        FOREIGN KEY(receta_id) REFERENCES recetas(id),
+        FOREIGN KEY(ingrediente_id) REFERENCES ingredientes(id)
+    );
+    INSERT INTO ingredientes VALUES (1, 'pollo', 165, 31, 0, 3.6, 0, 74);
+    INSERT INTO ingredientes VALUES (2, 'arroz', 130, 2.7, 28, 0.3, 0.4, 1);
+    INSERT INTO recetas VALUES (1, 'Arroz con Pollo', 'Todos', 'Cocinar el arroz con el pollo');
+    INSERT INTO receta_ingredientes VALUES (1, 1, 200);
+    INSERT INTO receta_ingredientes VALUES (1, 2, 100);
+    -- Línea repetida de la misma receta e ingrediente
+    INSERT INTO receta_ingredientes VALUES (1, 2, 50);
+    -- Líneas huérfanas de una receta reemplazada con INSERT OR REPLACE
+    INSERT INTO receta_ingredientes VALUES (7, 1, 80);
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def test_actualiza_una_base_original(tmp_path):
+    ruta = str(tmp_path / 'original.db')
+    crear_base_original(ruta)
+
+    conn = conectar(ruta)
+
+    assert version_actual(conn) == MIGRACIONES[-1][0]
+    assert conn.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    assert sorted(conn.execute('SELECT receta_id, ingrediente_id, cantidad FROM receta_ingredientes')) == [
+        (1, 1, 200), (1, 2, 150)]
+    calorias = conn.execute('SELECT calorias FROM receta_nutricion WHERE receta_id = 1').fetchone()[0]
+    assert calorias == pytest.approx(165 * 2 + 130 * 1.5)
+    assert conn.execute("SELECT rowid FROM recetas_fts WHERE recetas_fts MATCH 'pollo'").fetchall() == [(1,)]
+    conn.close()
+
+
+def test_migraciones_idempotentes(tmp_path):
+    ruta = str(tmp_path / 'original.db')
+    crear_base_original(ruta)
+    conectar(ruta).close()
+
+    conn = conectar(ruta)
+
+    assert aplicar_migraciones(conn) == []
+    assert conn.execute('SELECT COUNT(*) FROM esquema_version').fetchone() == (len(MIGRACIONES),)
+    conn.close()
+
+
+def test_base_original_usable_desde_el_recetario(tmp_path):
+    ruta = str(tmp_path / 'original.db')
+    crear_base_original(ruta)
+    recetario = Recetario(ruta)
+
+    assert [receta[1] for receta in recetario.encontrar_recetas(['pollo', 'arroz'])] == ['Arroz con Pollo']
+    totales = recetario.calcular_valor_nutricional_lote([1])[0][0].tolist()
+    esperados = recetario.conn.execute(
+        'SELECT {} FROM receta_nutricion WHERE receta_id = 1'.format(', '.join(NUTRIENTES))).fetchone()
+    assert totales == pytest.approx(list(esperados))
+    recetario.cerrar()
+
+
+def test_version_de_datos_sube_con_cada_escritura(tmp_path):
+    ruta = str(tmp_path / 'original.db')
+    crear_base_original(ruta)
+    recetario = Recetario(ruta)
+    antes = version_datos(recetario.conn)
+
+    recetario.agregar_ingrediente('tomate', 18, 0.9, 3.9, 0.2, 1.2, 5)
+    despues = version_datos(recetario.conn)
+    # Repetir la misma escritura no cambia nada
+    recetario.agregar_ingrediente('tomate', 18, 0.9, 3.9, 0.2, 1.2, 5)
+
+    assert despues > antes
+    assert version_datos(recetario.conn) == despues
+    recetario.cerrar()
@@ -0,0 +1,66 @@
+import pytest
+
+from nutricion import MotorNutricional
+from recetario_core import NUTRIENTES
+
+
+def totales_sql(conn, receta_id):
+    """Totales de una receta con la consulta y el cálculo por líneas de la versión original"""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT i.nombre, ri.cantidad,
+        i.calorias, i.proteinas, i.carbohidratos, i.grasas, i.fibra, i.sodio
+    FROM receta_ingredientes ri
+    JOIN ingredientes i ON ri.ingrediente_id = i.id
+    WHERE ri.receta_id = ?
+    ''', (receta_id,))
+    totales = dict.fromkeys(NUTRIENTES, 0)
+    for _, cantidad, *valores in cursor.fetchall():
+        for nutriente, valor in zip(NUTRIENTES, valores):
+            totales[nutriente] += valor * cantidad / 100
+    return totales
+
+
+def test_lote_igual_que_la_consulta_por_receta(recetario, ids):
+    motor = MotorNutricional.desde_conexion(recetario.conn)
+    receta_ids = sorted(ids.values())
+
+    totales = motor.totales(receta_ids)
+
+    for fila, receta_id in zip(totales.tolist(), receta_ids):
+        assert fila == pytest.approx([totales_sql(recetario.conn, receta_id)[n] for n in NUTRIENTES])
+
+
+def test_orden_repeticiones_y_recetas_inexistentes(recetario, ids):
+    motor = MotorNutricional.desde_conexion(recetario.conn)
+    lentejas, arroz_con_pollo = ids['Lentejas'], ids['Arroz con pollo']
+
+    totales = motor.totales([lentejas, 12345, arroz_con_pollo, lentejas])
+
+    assert totales[0].tolist() == pytest.approx(list(totales_sql(recetario.conn, lentejas).values()))
+    assert totales[1].tolist() == [0.0] * len(NUTRIENTES)
+    assert totales[2].tolist() == pytest.approx(list(totales_sql(recetario.conn, arroz_con_pollo).values()))
+    assert totales[3].tolist() == totales[0].tolist()
+
+
+def test_desglose_de_una_receta(recetario, ids):
+    totales, desglose = recetario.calcular_valor_nutricional_receta(ids['Arroz con pollo'])
+
+    assert totales == pytest.approx(totales_sql(recetario.conn, ids['Arroz con pollo']))
+    assert sorted(linea['nombre'] for linea in desglose) == ['arroz', 'pollo', 'tomate']
+    pollo = next(linea for linea in desglose if linea['nombre'] == 'pollo')
+    assert pollo['calorias'] == pytest.approx(165 * 2)
+
+
+def test_tabla_materializada_al_dia_tras_editar(recetario, ids):
+    receta_id = ids['Arroz con pollo']
+    recetario.agregar_ingrediente('pollo', 200, 30, 0, 5, 0, 80)
+    recetario.agregar_receta('Arroz con pollo', 'Todos', '', [
+        {'nombre': 'pollo', 'cantidad': 100}, {'nombre': 'arroz', 'cantidad': 100}])
+
+    materializados = recetario.conn.execute(
+        'SELECT {} FROM receta_nutricion WHERE receta_id = ?'.format(', '.join(NUTRIENTES)), (receta_id,)).fetchone()
+    esperados = totales_sql(recetario.conn, receta_id)
+
+    assert list(materializados) == pytest.approx([esperados[n] for n in NUTRIENTES])
+    assert recetario.calcular_valor_nutricional_lote([receta_id])[0][0].tolist() == pytest.approx(list(materializados))
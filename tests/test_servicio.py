@@ -0,0 +1,112 @@
+import pytest
+
+from servicio import MAX_IDS, ErrorPeticion, ServicioRecetario
+
+
+@pytest.fixture
+def servicio(ruta_db):
+    servicio = ServicioRecetario(ruta_db, lectores=2, instantanea=False)
+    yield servicio
+    servicio.cerrar()
+
+
+def rechazada(servicio, metodo, ruta, datos=None):
+    """Estado y mensaje del error de una petición que debe fallar"""
+    with pytest.raises(ErrorPeticion) as error:
+        servicio.despachar(metodo, ruta, datos or {})
+    return error.value.estado, str(error.value)
+
+
+def test_busqueda_y_detalle(servicio):
+    _, respuesta = servicio.despachar('POST', '/buscar', {'ingredientes': ['pollo', 'arroz', 'tomate']})
+    receta = respuesta['recetas'][0]
+    assert (receta['nombre'], receta['faltantes']) == ('Arroz con pollo', 0)
+
+    operacion, detalle = servicio.despachar('GET', f"/recetas/{receta['id']}", None)
+    assert operacion == 'receta'
+    assert [linea['nombre'] for linea in detalle['ingredientes']] == ['arroz', 'pollo', 'tomate']
+
+
+def test_lista_compras_con_despensa(servicio):
+    _, respuesta = servicio.despachar('POST', '/buscar', {'ingredientes': ['lenteja', 'cebolla', 'tomate']})
+    receta_id = respuesta['recetas'][0]['id']
+
+    _, respuesta = servicio.despachar('POST', '/lista-compras', {'porciones': {str(receta_id): 2},
+                                                                 'despensa': {'lenteja': 100, 'tomate': None}})
+
+    assert {fila['ingrediente']: fila['a_comprar'] for fila in respuesta['lista']} == {'lenteja': 140, 'cebolla': 60}
+
+
+@pytest.mark.parametrize('ruta, datos, estado', [
+    ('/buscar', {'ingredientes': 'pollo'}, 400),
+    ('/buscar', {'ingredientes': ['pollo'], 'faltantes': True}, 400),
+    ('/buscar', {'ingredientes': ['pollo'], 'dieta': 3}, 400),
+    ('/recetas/detalle', {'ids': [1, '2']}, 400),
+    ('/recetas/detalle', {'ids': [2 ** 63]}, 400),
+    ('/recetas/detalle', {'ids': list(range(MAX_IDS + 1))}, 413),
+    ('/nutricion', {}, 400),
+    ('/lista-compras', {'porciones': {'uno': 1}}, 400),
+    ('/lista-compras', {'porciones': [1], 'despensa': {'arroz': '500'}}, 400),
+    ('/lista-compras', {'porciones': [1], 'despensa': ['arroz']}, 400),
+])
+def test_peticiones_mal_formadas(servicio, ruta, datos, estado):
+    assert rechazada(servicio, 'POST', ruta, datos)[0] == estado
+
+
+def test_rutas_desconocidas(servicio):
+    assert rechazada(servicio, 'GET', '/recetas/99999')[0] == 404
+    assert rechazada(servicio, 'GET', f'/recetas/{2 ** 64}')[0] == 404
+    assert rechazada(servicio, 'GET', '/buscar')[0] == 405
+    assert rechazada(servicio, 'POST', '/otra')[0] == 404
+
+
+def test_escrituras_validan_el_lote_entero_antes_de_escribir(servicio):
+    valido = {'nombre': 'garbanzo', 'calorias': 364, 'proteinas': 19, 'carbohidratos': 61,
+              'grasas': 6, 'fibra': 17, 'sodio': 24}
+
+    estado, mensaje = rechazada(servicio, 'POST', '/ingredientes', {'ingredientes': [
+        valido, dict(valido, nombre='sal', calorias='n/a')]})
+
+    assert estado == 400
+    assert 'ingredientes[1].calorias' in mensaje
+    assert servicio.escritor.conn.execute("SELECT COUNT(*) FROM ingredientes WHERE nombre = 'garbanzo'").fetchone() == (0,)
+
+
+@pytest.mark.parametrize('receta, campo', [
+    ('no es un objeto', 'recetas[0]'),
+    ({'nombre': '', 'tipo_dieta': 'Todos', 'ingredientes': []}, 'recetas[0].nombre'),
+    ({'nombre': 'X', 'tipo_dieta': 'Todos', 'instrucciones': 5, 'ingredientes': []}, 'recetas[0].instrucciones'),
+    ({'nombre': 'X', 'tipo_dieta': 'Todos', 'ingredientes': [{'nombre': 'arroz', 'cantidad': True}]},
+     'recetas[0].ingredientes[0].cantidad'),
+    ({'nombre': 'X', 'tipo_dieta': 'Todos', 'ingredientes': ['arroz']}, 'recetas[0].ingredientes[0]'),
+])
+def test_recetas_mal_formadas(servicio, receta, campo):
+    estado, mensaje = rechazada(servicio, 'POST', '/recetas', {'recetas': [receta]})
+
+    assert estado == 400
+    assert campo in mensaje
+
+
+def test_receta_con_ingrediente_desconocido(servicio):
+    estado, mensaje = rechazada(servicio, 'POST', '/recetas', {'recetas': [
+        {'nombre': 'Con trufa', 'tipo_dieta': 'Todos', 'ingredientes': [{'nombre': 'trufa', 'cantidad': 5}]}]})
+
+    assert estado == 400
+    assert 'trufa' in mensaje
+
+
+def test_los_lectores_ven_las_escrituras(servicio):
+    servicio.despachar('POST', '/ingredientes', {'ingredientes': [
+        {'nombre': 'garbanzo', 'calorias': 364, 'proteinas': 19, 'carbohidratos': 61,
+         'grasas': 6, 'fibra': 17, 'sodio': 24}]})
+    _, respuesta = servicio.despachar('POST', '/recetas', {'recetas': [
+        {'nombre': 'Hummus', 'tipo_dieta': 'Vegana', 'instrucciones': 'Triturar',
+         'ingredientes': [{'nombre': 'garbanzo', 'cantidad': 200}]}]})
+    receta_id = respuesta['ids'][0]
+
+    _, busqueda = servicio.despachar('POST', '/buscar', {'ingredientes': ['garbanzo']})
+    _, nutricion = servicio.despachar('POST', '/nutricion', {'ids': [receta_id, 424242]})
+
+    assert [receta['nombre'] for receta in busqueda['recetas']] == ['Hummus']
+    assert nutricion['recetas'][0]['totales']['calorias'] == 728
+    assert nutricion['no_encontradas'] == [424242]